@@ -1,80 +1,104 @@
-import boto3
 import json
 import time
-import csv
-from io import StringIO
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
 
-# AWS Service Initialization
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
+from accuracy_models import accuracy_from_state, apply_answer, determine_user_profile, state_from_history
+from aws_runtime import lazy_client, prewarm_on_init
+from feedback_store import FeedbackStore
+from metrics import instrumented, stage
+from topic_mastery import SERVED_TAGS_ATTRIBUTE, answer_updates
+from user_profile_store import DynamoUserProfileStore
 
-# Table names and S3 Bucket details
+# AWS Clients, created on first use
+dynamodb = lazy_client('dynamodb')
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+# Table names
 USER_STATE_TABLE = "UserQuestionState"
-USER_FEEDBACK_TABLE = "UserFeedback"
-USERS_DATASET_BUCKET = "realtimerecommendation"
-USERS_DATASET_KEY = "updated_usersmnew.csv"
 
-# Initialize DynamoDB Tables
-user_state_table = dynamodb.Table(USER_STATE_TABLE)
-feedback_table = dynamodb.Table(USER_FEEDBACK_TABLE)
+feedback_store = FeedbackStore(dynamodb)
+profile_store = DynamoUserProfileStore(dynamodb)
 
-def calculate_user_accuracy(user_id):
-    """Calculate accuracy based on feedback data stored in DynamoDB."""
-    try:
-        response = feedback_table.scan()
-        feedback_data = response.get('Items', [])
-        
-        # Filter feedback for the current user
-        user_feedback = [fb for fb in feedback_data if fb['user_id'] == user_id]
-        
-        if not user_feedback:
-            return 0.0
-        
-        # Calculate accuracy
-        correct_count = sum(1 for feedback in user_feedback if feedback['feedback'].lower() == 'correct')
-        total_count = len(user_feedback)
-        accuracy = correct_count / total_count
-        return accuracy
-    except Exception as e:
-        print(f"Error calculating accuracy: {e}")
-        return 0.0
-
-def determine_user_profile(accuracy):
-    """Determine user profile based on accuracy with numeric values."""
-    if accuracy > 0.8:
-        return 3  # Expert = 3
-    elif accuracy > 0.5:
-        return 2  # Intermediate = 2
-    else:
-        return 1  # Beginner = 1
-
-def update_user_metadata_in_s3(user_id, updated_profile):
-    """Update the user profile in the S3 dataset with numeric profile values."""
+# Retries of the accuracy state update when another answer lands concurrently
+MAX_STATE_UPDATE_ATTEMPTS = 3
+
+def get_user_state(user_id, consistent_read=False):
+    """The user's state item as plain values, or None if there is none."""
+    response = dynamodb.get_item(
+        TableName=USER_STATE_TABLE, Key={'user_id': {'S': str(user_id)}}, ConsistentRead=consistent_read
+    )
+    item = response.get('Item')
+    return {name: deserializer.deserialize(value) for name, value in item.items()} if item else None
+
+def update_user_state(user_id, **request):
+    """update_item on the user's state with plain expression values; returns the plain Attributes."""
+    request['ExpressionAttributeValues'] = {
+        name: serializer.serialize(value) for name, value in request['ExpressionAttributeValues'].items()
+    }
+    response = dynamodb.update_item(TableName=USER_STATE_TABLE, Key={'user_id': {'S': str(user_id)}}, **request)
+    return {name: deserializer.deserialize(value) for name, value in response.get('Attributes', {}).items()}
+
+def backfill_accuracy_state(user_id, user_state):
+    """Seed the accuracy state of a user whose answers predate it from their feedback history."""
+    answers = [
+        (item['feedback'].lower() == 'correct', item['timestamp'])
+        for item in feedback_store.query_user_feedback(user_id)
+    ]
+    if not answers:
+        return user_state
+    seeded = state_from_history(answers)
     try:
-        response = s3.get_object(Bucket=USERS_DATASET_BUCKET, Key=USERS_DATASET_KEY)
-        content = response['Body'].read().decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(content))
-        
-        # Prepare updated content
-        updated_rows = []
-        for row in csv_reader:
-            if row['user_id'] == user_id:
-                row['user_level'] = updated_profile  # Numeric Profile Value Updated Here
-            updated_rows.append(row)
-        
-        # Write back to S3
-        csv_output = StringIO()
-        csv_writer = csv.DictWriter(csv_output, fieldnames=updated_rows[0].keys())
-        csv_writer.writeheader()
-        csv_writer.writerows(updated_rows)
-        
-        # Upload updated dataset back to S3
-        s3.put_object(Bucket=USERS_DATASET_BUCKET, Key=USERS_DATASET_KEY, Body=csv_output.getvalue())
-        print(f"S3 user profile updated for user: {user_id}")
-        
-    except Exception as e:
-        print(f"Error updating S3 user metadata: {e}")
+        return update_user_state(
+            user_id,
+            UpdateExpression="SET " + ", ".join(f"{name} = :{name}" for name in seeded),
+            ConditionExpression="attribute_not_exists(total_count)",
+            ExpressionAttributeValues={f":{name}": value for name, value in seeded.items()},
+            ReturnValues="ALL_NEW"
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Another invocation seeded it first
+        return get_user_state(user_id, consistent_read=True)
+
+def fetch_user_level(user_id):
+    """The user's level from the profile store, as the ratings of unrated topics start from (1 if unknown)."""
+    profile = profile_store.get_profile(user_id)
+    return profile['user_level'] if profile else 1
+
+def record_answer(user_id, feedback, user_state, timestamp, user_level=1):
+    """Add the answer to the user's accuracy state and return the updated state item.
 
+    The lifetime counters are plain atomic ADDs. The window and decayed models and
+    the topic mastery ratings are derived from the state that was read, so they
+    are only written if no other answer was counted in between; otherwise the
+    state is re-read and retried. Topics not yet rated start from ``user_level``.
+    """
+    is_correct = feedback.lower() == 'correct'
+    for _ in range(MAX_STATE_UPDATE_ATTEMPTS):
+        model_updates = apply_answer(user_state, is_correct, timestamp)
+        model_updates.update(answer_updates(user_state, feedback, user_level))
+        request = {
+            'UpdateExpression': "ADD correct_count :correct, total_count :one",
+            'ExpressionAttributeValues': {':correct': int(is_correct), ':one': 1},
+            'ReturnValues': "ALL_NEW"
+        }
+        if model_updates:
+            request['UpdateExpression'] += " SET " + ", ".join(f"{name} = :{name}" for name in model_updates)
+            request['ExpressionAttributeValues'].update({f":{name}": value for name, value in model_updates.items()})
+            request['ConditionExpression'] = "attribute_not_exists(total_count) OR total_count = :seen_total"
+            request['ExpressionAttributeValues'][':seen_total'] = user_state.get('total_count', 0)
+        try:
+            return update_user_state(user_id, **request)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            user_state = get_user_state(user_id, consistent_read=True)
+    raise RuntimeError(f"Too many concurrent answers while updating state for user {user_id}")
+
+@instrumented
 def lambda_handler(event, context):
     """Main Lambda function to handle user feedback and update profiles."""
     user_id = event.get('user_id')
@@ -88,13 +112,21 @@ def lambda_handler(event, context):
 
     # Step 1: Fetch current question from UserQuestionState Table
     try:
-        user_state_response = user_state_table.get_item(Key={'user_id': user_id})
-        if 'Item' not in user_state_response:
+        with stage("state_read"):
+            user_state = get_user_state(user_id)
+        if user_state is None:
             return {
                 "statusCode": 404,
                 "body": json.dumps({"message": f"No state found for user_id: {user_id}"})
             }
-        current_question = user_state_response['Item']['current_question']
+        current_question = user_state['current_question']
+        if 'total_count' not in user_state:
+            user_state = backfill_accuracy_state(user_id, user_state)
+        # Only answers to questions served with their tags move topic ratings
+        user_level = 1
+        if user_state.get(SERVED_TAGS_ATTRIBUTE):
+            with stage("profile_read"):
+                user_level = fetch_user_level(user_id)
     except Exception as e:
         print(f"Error fetching user state: {e}")
         return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
@@ -102,34 +134,45 @@ def lambda_handler(event, context):
     # Step 2: Store Feedback in DynamoDB (Timestamp Corrected)
     try:
         timestamp = int(time.time())  # Ensuring timestamp is stored as Number
-        feedback_table.put_item(
-            Item={
-                'user_id': user_id,
-                'question_id': current_question,
-                'feedback': feedback,
-                'timestamp': timestamp  # FIXED: Number instead of string
-            }
-        )
+        with stage("feedback_write"):
+            feedback_store.put_feedback(user_id, current_question, feedback, timestamp)
         print(f"Feedback recorded for user {user_id}")
     except Exception as e:
         print(f"Error storing feedback: {str(e)}")
         return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
 
-    # Step 3: Calculate Accuracy and Check Profile Upgrade
-    accuracy = calculate_user_accuracy(user_id)
+    # Step 3: Update Accuracy State, Calculate Accuracy and Check Profile Upgrade
+    try:
+        with stage("state_update"):
+            user_state = record_answer(user_id, feedback, user_state, timestamp, user_level)
+    except Exception as e:
+        print(f"Error updating accuracy state: {str(e)}")
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+    accuracy = accuracy_from_state(user_state)
     new_profile = determine_user_profile(accuracy)
 
-    # Step 4: Update Profile in DynamoDB and S3
+    # Step 4: Update Profile and Last Interaction in the user state, and the user profile store
     try:
-        # Update User Profile in DynamoDB
-        user_state_table.update_item(
-            Key={'user_id': user_id},
-            UpdateExpression="SET current_profile = :profile",
-            ExpressionAttributeValues={':profile': new_profile}
-        )
+        # Update User Profile and the last answer getRecommendation logs with the next interaction
+        state_updates = {'current_profile': new_profile, 'last_feedback': feedback.lower()}
+        # Advance through a session prefetched by getRecommendation's batch mode
+        queued_questions = user_state.get('queued_questions') or []
+        if queued_questions:
+            state_updates['current_question'] = queued_questions[0]['question_id']
+            state_updates['current_difficulty'] = queued_questions[0]['difficulty']
+            if 'tags' in queued_questions[0]:
+                state_updates[SERVED_TAGS_ATTRIBUTE] = queued_questions[0]['tags']
+            state_updates['queued_questions'] = queued_questions[1:]
+        with stage("state_update"):
+            update_user_state(
+                user_id,
+                UpdateExpression="SET " + ", ".join(f"{name} = :{name}" for name in state_updates),
+                ExpressionAttributeValues={f":{name}": value for name, value in state_updates.items()}
+            )
         
-        # Update User Metadata in S3 Dataset
-        update_user_metadata_in_s3(user_id, new_profile)
+        # Update User Level in the Profile Store (exported to S3 for Personalize imports)
+        with stage("profile_update"):
+            profile_store.update_level(user_id, new_profile)
     except Exception as e:
         print(f"Error updating user profile: {str(e)}")
         return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
@@ -141,3 +184,6 @@ def lambda_handler(event, context):
             "accuracy": accuracy
         })
     }
+
+
+prewarm_on_init()
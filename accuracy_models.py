@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+# Accuracy model used for profile leveling:
+#   "lifetime" - correct_count / total_count over the user's whole history
+#   "window"   - share of correct answers among the last WINDOW_SIZE answers
+#   "decayed"  - exponentially time-decayed share of correct answers
+ACCURACY_MODE = "lifetime"
+ACCURACY_MODES = ("lifetime", "window", "decayed")
+
+# Last-N window, kept as a shift register of answer bits (1 = correct) so the
+# whole ring buffer is a single number in the user's state item.
+WINDOW_SIZE = 20
+
+# An answer's weight halves after this many seconds.
+DECAY_HALF_LIFE_SECONDS = 7 * 24 * 3600
+
+
+def update_window(recent_answers, recent_count, is_correct, size=WINDOW_SIZE):
+    """Push one answer into the window, dropping the oldest once it is full."""
+    recent_answers = ((recent_answers << 1) | int(is_correct)) & ((1 << size) - 1)
+    return recent_answers, min(recent_count + 1, size)
+
+
+def window_accuracy(recent_answers, recent_count):
+    """Share of correct answers in the window."""
+    if not recent_count:
+        return 0.0
+    return bin(recent_answers).count('1') / recent_count
+
+
+def update_decayed(decayed_correct, decayed_total, last_answer_at, is_correct, timestamp,
+                   half_life=DECAY_HALF_LIFE_SECONDS):
+    """Decay the running sums to ``timestamp`` and add one answer."""
+    decay = 0.5 ** (max(timestamp - last_answer_at, 0) / half_life) if decayed_total else 0.0
+    return decayed_correct * decay + int(is_correct), decayed_total * decay + 1
+
+
+def decayed_accuracy(decayed_correct, decayed_total):
+    """Time-decayed share of correct answers."""
+    if not decayed_total:
+        return 0.0
+    return decayed_correct / decayed_total
+
+
+def apply_answer(state, is_correct, timestamp, mode=ACCURACY_MODE):
+    """Return the state attributes the given mode needs after one more answer.
+
+    ``state`` is the user's state item (missing attributes count as zero). The
+    lifetime counters are maintained separately with atomic ADDs, so that mode
+    has nothing extra to store.
+    """
+    if mode == "window":
+        recent_answers, recent_count = update_window(
+            int(state.get('recent_answers', 0)), int(state.get('recent_count', 0)), is_correct
+        )
+        return {'recent_answers': recent_answers, 'recent_count': recent_count}
+    if mode == "decayed":
+        decayed_correct, decayed_total = update_decayed(
+            float(state.get('decayed_correct', 0)), float(state.get('decayed_total', 0)),
+            int(state.get('last_answer_at', 0)), is_correct, timestamp
+        )
+        # DynamoDB rejects floats, so the running sums are stored as Decimals.
+        return {
+            'decayed_correct': Decimal(str(round(decayed_correct, 6))),
+            'decayed_total': Decimal(str(round(decayed_total, 6))),
+            'last_answer_at': timestamp,
+        }
+    return {}
+
+
+def accuracy_from_state(state, mode=ACCURACY_MODE):
+    """Accuracy of a user state item under the given mode."""
+    if mode == "window":
+        return window_accuracy(int(state.get('recent_answers', 0)), int(state.get('recent_count', 0)))
+    if mode == "decayed":
+        return decayed_accuracy(float(state.get('decayed_correct', 0)), float(state.get('decayed_total', 0)))
+    total_count = int(state.get('total_count', 0))
+    return int(state.get('correct_count', 0)) / total_count if total_count else 0.0
+
+
+def determine_user_profile(accuracy):
+    """Determine user profile based on accuracy with numeric values."""
+    if accuracy > 0.8:
+        return 3  # Expert = 3
+    elif accuracy > 0.5:
+        return 2  # Intermediate = 2
+    else:
+        return 1  # Beginner = 1
+
+
+def state_from_history(answers, mode=ACCURACY_MODE):
+    """Rebuild the counters and model state from ordered (is_correct, timestamp) answers."""
+    state = {'correct_count': 0, 'total_count': 0}
+    for is_correct, timestamp in answers:
+        state['correct_count'] += int(is_correct)
+        state['total_count'] += 1
+        state.update(apply_answer(state, is_correct, timestamp, mode))
+    return state
+
+
+def accuracy_from_history(answers, mode=ACCURACY_MODE):
+    """Accuracy of an ordered iterable of (is_correct, timestamp) answers."""
+    return accuracy_from_state(state_from_history(answers, mode), mode)
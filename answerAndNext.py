@@ -0,0 +1,236 @@
+import json
+import time
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from accuracy_models import accuracy_from_state, apply_answer, determine_user_profile, state_from_history
+from aws_runtime import lazy_client, prewarm_on_init
+from dynamo_batch import batch_get
+from feedback_store import FeedbackStore
+from getRecommendation import (
+    USER_STATE_TABLE, build_interaction_entry, fetch_questions, select_question
+)
+from interaction_log import write_interaction_part
+from metrics import instrumented, stage
+from personalize_engine import RECOMMENDATION_ENGINE, select_personalized_question
+from precomputed_recommendations import SERVED_AT_ATTRIBUTE
+from seen_questions import SEEN_ATTRIBUTE, as_bytes, mark_seen
+from topic_mastery import MASTERY_ATTRIBUTE, SERVED_TAGS_ATTRIBUTE, answer_updates, target_difficulty
+from user_profile_store import USER_PROFILE_TABLE, DynamoUserProfileStore, profile_from_item
+
+# AWS Clients
+dynamodb = lazy_client('dynamodb')
+s3 = lazy_client('s3')
+feedback_store = FeedbackStore(dynamodb)
+profile_store = DynamoUserProfileStore(dynamodb)
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+# Rounds are re-read and recomputed when another answer for the same user commits first
+MAX_ROUND_ATTEMPTS = 3
+
+
+def read_round(user_id):
+    """Read the user's state (consistently) and profile with a single BatchGetItem."""
+    key = {'user_id': {'S': str(user_id)}}
+    request = {
+        USER_STATE_TABLE: {'Keys': [key], 'ConsistentRead': True},
+        USER_PROFILE_TABLE: {'Keys': [key]}
+    }
+    found = {table_name: items[0] for table_name, items in batch_get(dynamodb, request).items() if items}
+    state_item = found.get(USER_STATE_TABLE)
+    user_state = {name: deserializer.deserialize(value) for name, value in state_item.items()} if state_item else None
+    profile_item = found.get(USER_PROFILE_TABLE)
+    return user_state, profile_from_item(profile_item) if profile_item else None
+
+
+def seed_accuracy_state(user_id, user_state):
+    """Counters and model state for a user whose answers predate them, from their feedback history."""
+    answers = [
+        (item['feedback'].lower() == 'correct', item['timestamp'])
+        for item in feedback_store.query_user_feedback(user_id)
+    ]
+    return dict(user_state, **state_from_history(answers))
+
+
+def pick_next_question(user_id, profile, user_state, engine):
+    """Next question and its difficulty: the head of a prefetched queue, otherwise a fresh selection.
+
+    Fresh selections target the user's mastery in ``user_state``, which should
+    already include the answer just given.
+    """
+    questions = fetch_questions()
+    queued_questions = user_state.get('queued_questions') or []
+    if queued_questions:
+        position = questions['by_id'].get(queued_questions[0]['question_id'])
+        if position is not None:
+            return questions['questions'][position], queued_questions[0]['difficulty'], queued_questions[1:]
+
+    seen = as_bytes(user_state.get(SEEN_ATTRIBUTE))
+    ratings = user_state.get(MASTERY_ATTRIBUTE) or {}
+    if engine == "personalize":
+        next_difficulty = target_difficulty(ratings, profile['preferences'], profile['user_level'])
+        question = select_personalized_question(user_id, next_difficulty, questions, seen)
+        if question:
+            return question, next_difficulty, []
+    question = select_question(profile['preferences'], ratings, profile['user_level'], questions, seen)
+    return question, question['difficulty'].lower() if question else None, []
+
+
+def state_update(user_id, seen_total, updates, removes):
+    """update_item arguments for the state item, conditional on no other answer having been counted.
+
+    ``seen_total`` is the total_count that was read, or None for a state item
+    that had no counters yet.
+    """
+    request = {
+        'TableName': USER_STATE_TABLE,
+        'Key': {'user_id': {'S': str(user_id)}},
+        'UpdateExpression': "SET " + ", ".join(f"{name} = :{name}" for name in updates),
+        'ExpressionAttributeValues': {f":{name}": serializer.serialize(value) for name, value in updates.items()}
+    }
+    if removes:
+        request['UpdateExpression'] += " REMOVE " + ", ".join(removes)
+    if seen_total is not None:
+        request['ConditionExpression'] = "total_count = :seen_total"
+        request['ExpressionAttributeValues'][':seen_total'] = {'N': str(int(seen_total))}
+    else:
+        request['ConditionExpression'] = "attribute_exists(user_id) AND attribute_not_exists(total_count)"
+    return request
+
+
+def is_conflict(error):
+    """True when a transaction was cancelled because the state changed since it was read."""
+    if error.response['Error']['Code'] != 'TransactionCanceledException':
+        return False
+    return any(
+        reason.get('Code') == 'ConditionalCheckFailed'
+        for reason in error.response.get('CancellationReasons', [])
+    )
+
+
+def answer_and_next(user_id, feedback, engine=RECOMMENDATION_ENGINE):
+    """Record an answer, relevel the user and move them to their next question.
+
+    Costs one BatchGetItem and one TransactWriteItems (feedback put, conditional
+    state update, profile level update). Returns None when the user has no state,
+    otherwise (question or None, difficulty, accuracy, level).
+    """
+    for _ in range(MAX_ROUND_ATTEMPTS):
+        with stage("read"):
+            user_state, profile = read_round(user_id)
+        if user_state is None or 'current_question' not in user_state:
+            return None
+        profile = profile or {'preferences': [], 'user_level': 1}
+        seen_total = user_state.get('total_count')
+        if seen_total is None:
+            with stage("read"):
+                user_state = seed_accuracy_state(user_id, user_state)
+
+        # Score the answer against the state that was read
+        timestamp = int(time.time())
+        is_correct = feedback.lower() == 'correct'
+        updates = {
+            'correct_count': int(user_state.get('correct_count', 0)) + int(is_correct),
+            'total_count': int(user_state.get('total_count', 0)) + 1,
+        }
+        updates.update(apply_answer(user_state, is_correct, timestamp))
+        accuracy = accuracy_from_state(dict(user_state, **updates))
+        new_level = determine_user_profile(accuracy)
+        updates.update({
+            'current_profile': new_level,
+            'last_feedback': feedback.lower(),
+        })
+
+        # Rate the answer against the question's topics and pick the next question from the new ratings
+        updates.update(answer_updates(user_state, feedback, profile['user_level']))
+        with stage("select"):
+            question, difficulty, queued = pick_next_question(
+                user_id, profile, dict(user_state, **updates), engine
+            )
+        removes = []
+        if question:
+            updates.update({
+                'current_question': question['ITEM_INT_ID'],
+                'current_difficulty': difficulty,
+                SERVED_TAGS_ATTRIBUTE: question['tags'],
+                SEEN_ATTRIBUTE: mark_seen(as_bytes(user_state.get(SEEN_ATTRIBUTE)), question['ITEM_INT_ID']),
+                SERVED_AT_ATTRIBUTE: timestamp,
+            })
+            if queued:
+                updates['queued_questions'] = queued
+            elif 'queued_questions' in user_state:
+                removes.append('queued_questions')
+
+        try:
+            with stage("transact"):
+                dynamodb.transact_write_items(TransactItems=[
+                    {'Put': feedback_store.feedback_put(user_id, user_state['current_question'], feedback, timestamp)},
+                    {'Update': state_update(user_id, seen_total, updates, removes)},
+                    {'Update': profile_store.level_update(user_id, new_level)},
+                ])
+        except ClientError as e:
+            if not is_conflict(e):
+                raise
+            continue
+
+        if question:
+            try:
+                with stage("dataset_append"):
+                    write_interaction_part(s3, [
+                        build_interaction_entry(user_id, question, difficulty, feedback.lower(), new_level)
+                    ])
+            except Exception as e:
+                print(f"Error appending to interaction log in S3: {e}")
+        return question, difficulty, accuracy, new_level
+    raise RuntimeError(f"Too many concurrent answers for user {user_id}")
+
+
+@instrumented
+def lambda_handler(event, context):
+    """Record the user's answer and return their next question in one round trip."""
+    user_id = event.get('user_id')
+    feedback = event.get('feedback')
+
+    if not user_id or not feedback:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({"message": "Missing user_id or feedback in request"})
+        }
+
+    try:
+        result = answer_and_next(str(user_id), feedback, event.get('engine', RECOMMENDATION_ENGINE))
+    except Exception as e:
+        print(f"Error recording answer: {e}")
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+    if result is None:
+        return {
+            "statusCode": 404,
+            "body": json.dumps({"message": f"No state found for user_id: {user_id}"})
+        }
+
+    question, difficulty, accuracy, new_level = result
+    if not question:
+        return {
+            "statusCode": 404,
+            "body": json.dumps({
+                "message": f"Answer recorded, but no questions found for user_id: {user_id}",
+                "accuracy": accuracy,
+                "user_level": new_level
+            })
+        }
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "question_id": question['ITEM_INT_ID'],
+            "difficulty": difficulty,
+            "tags": question['tags'],
+            "accuracy": accuracy,
+            "user_level": new_level
+        })
+    }
+
+
+prewarm_on_init()
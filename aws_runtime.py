@@ -0,0 +1,113 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+from metrics import instrument_client
+
+# Low-level clients shared by every handler in the process, created on first
+# use rather than at import. A handler that returns before touching AWS (a
+# validation error) never pays for loading a service model, and the boto3
+# resource layer is not used at all.
+#
+# Modules take a LazyClient at import time:
+#
+#     dynamodb = lazy_client('dynamodb')
+#
+# and tests or offline runs swap in a fake with set_client('dynamodb', fake).
+
+# Enough pooled connections for getRecommendation's fetch threads, kept alive
+# between warm invocations.
+DEFAULT_CLIENT_CONFIG = Config(max_pool_connections=10, tcp_keepalive=True)
+
+# Lambda reports how the execution environment is being initialized; clients are
+# built during init when nobody is waiting on it.
+INITIALIZATION_TYPE_VARIABLE = "AWS_LAMBDA_INITIALIZATION_TYPE"
+PREWARM_INITIALIZATION_TYPES = ("provisioned-concurrency", "snap-start")
+
+try:
+    # Lambda SnapStart runtime hooks, only present in SnapStart-enabled functions
+    from snapshot_restore_py import register_before_snapshot
+except ImportError:
+    register_before_snapshot = None
+
+_clients = {}
+_configs = {}  # service -> Config to create it with (or None), for every service a module declared
+_prewarm_hooks = []
+_prewarm_scheduled = False
+_lock = threading.Lock()  # Clients are also first used from fetch threads
+
+
+def get_client(service, config=None):
+    """The process-wide instrumented client for a service, created on first use.
+
+    The first ``config`` registered for a service wins; DEFAULT_CLIENT_CONFIG
+    is used when none is given.
+    """
+    client = _clients.get(service)
+    if client is None:
+        with _lock:
+            client = _clients.get(service)
+            if client is None:
+                config = config or _configs.get(service) or DEFAULT_CLIENT_CONFIG
+                client = _clients[service] = instrument_client(boto3.client(service, config=config))
+    return client
+
+
+def set_client(service, client):
+    """Use ``client`` for a service from now on, e.g. a stub in offline tests."""
+    with _lock:
+        _clients[service] = client
+
+
+class LazyClient:
+    """Stands in for a service client and creates the real one on first attribute access."""
+
+    def __init__(self, service, config=None):
+        self.service = service
+        if _configs.get(service) is None:
+            _configs[service] = config
+
+    def __getattr__(self, name):
+        return getattr(get_client(self.service), name)
+
+    def __repr__(self):
+        return f"LazyClient({self.service!r})"
+
+
+def lazy_client(service, config=None):
+    return LazyClient(service, config)
+
+
+def register_prewarm(hook):
+    """Run ``hook`` (no arguments) when the environment is prewarmed, e.g. to load datasets."""
+    _prewarm_hooks.append(hook)
+    return hook
+
+
+def prewarm(services=None):
+    """Create the clients of ``services`` (every registered one by default) and run prewarm hooks."""
+    for service in services or list(_configs):
+        get_client(service)
+    for hook in _prewarm_hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"Prewarm hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+
+def prewarm_on_init(services=None):
+    """Prewarm now under provisioned concurrency, or just before a SnapStart snapshot.
+
+    On-demand cold starts stay lazy, so they only build what the request uses.
+    Call at the end of a handler module; only the first call in a process counts.
+    """
+    global _prewarm_scheduled
+    if _prewarm_scheduled:
+        return
+    _prewarm_scheduled = True
+    if register_before_snapshot is not None:
+        register_before_snapshot(prewarm, services)
+    elif os.environ.get(INITIALIZATION_TYPE_VARIABLE) in PREWARM_INITIALIZATION_TYPES:
+        prewarm(services)
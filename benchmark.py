@@ -0,0 +1,307 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import boto3
+import numpy as np
+import pandas as pd
+
+from dynamo_batch import batch_write
+from generate_synthetic_data import (
+    PROFILE_NAMES, generate_interaction_chunks, generate_items, generate_user_chunks
+)
+from simulatingInteractions import event_types, profiles
+
+# Offline benchmark of the Lambda handlers against moto's in-process S3 and
+# DynamoDB. Synthetic catalogs, users and interaction histories are generated
+# with generate_synthetic_data, loaded into the fake services, and a weighted mix
+# of requests is replayed against the handlers. Reports latency percentiles,
+# peak traced memory and AWS calls per request; --output keeps them as JSON to
+# compare later runs against.
+#
+#   python benchmark.py --users 1000 --interactions 100000 --requests 2000
+
+DATASET_BUCKET = "realtimerecommendation"
+ITEMS_KEY = "updated_items (1).csv"
+INTERACTIONS_KEY = "updated_interactions_with_profiles_and_scores.csv"
+
+# Tables the handlers use: (name, hash key, range key)
+TABLES = [
+    ("UserQuestionState", "user_id", None),
+    ("UserProfiles", "user_id", None),
+    ("UserFeedback", "user_id", "timestamp"),
+    ("EnrichmentCheckpoint", "job_name", None),
+    ("DatasetWriteLeases", "dataset", None),
+    ("PrecomputedRecommendations", "user_id", None),
+]
+
+# Share of requests per handler
+DEFAULT_MIX = {"getRecommendation": 0.6, "StoreUserFeedback": 0.35, "enrichingFunction": 0.05}
+
+# Requests that answer a question; users are only picked for them once they have been served one
+ANSWER_HANDLERS = ("StoreUserFeedback", "answerAndNext")
+
+
+def create_tables(dynamodb):
+    for name, hash_key, range_key in TABLES:
+        key_schema = [{'AttributeName': hash_key, 'KeyType': 'HASH'}]
+        attributes = [{'AttributeName': hash_key, 'AttributeType': 'S'}]
+        extra = {}
+        if range_key:
+            key_schema.append({'AttributeName': range_key, 'KeyType': 'RANGE'})
+            attributes.append({'AttributeName': range_key, 'AttributeType': 'N'})
+        if name == "UserFeedback":
+            attributes.append({'AttributeName': 'feedback_day', 'AttributeType': 'S'})
+            extra['GlobalSecondaryIndexes'] = [{
+                'IndexName': 'FeedbackByDay',
+                'KeySchema': [
+                    {'AttributeName': 'feedback_day', 'KeyType': 'HASH'},
+                    {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            }]
+        dynamodb.create_table(
+            TableName=name, KeySchema=key_schema, AttributeDefinitions=attributes,
+            BillingMode='PAY_PER_REQUEST', **extra
+        )
+
+
+def load_profiles(dynamodb, users):
+    """BatchWriteItem the synthetic users into UserProfiles."""
+    items = [
+        {'PutRequest': {'Item': {
+            'user_id': {'S': str(row.user_id)},
+            'preferences': {'L': [{'S': pref} for pref in row.preferences.split(', ')]},
+            'user_level': {'N': str(row.user_level)},
+        }}}
+        for row in users.itertuples()
+    ]
+    for start in range(0, len(items), 25):
+        batch_write(dynamodb, {"UserProfiles": items[start:start + 25]})
+
+
+def setup_environment(num_items, num_users, num_interactions, seed):
+    """Start moto, create the tables and buckets, and load generated datasets."""
+    from moto import mock_aws
+
+    # Never let a benchmark reach a real account
+    os.environ.update(AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='benchmark',
+                      AWS_SECRET_ACCESS_KEY='benchmark')
+    os.environ.pop('AWS_PROFILE', None)
+    mock = mock_aws()
+    mock.start()
+    boto3.setup_default_session()
+
+    rng = np.random.default_rng(seed)
+    items, difficulty_codes = generate_items(rng, num_items)
+    levels = rng.integers(1, 4, num_users).astype(np.int8)
+    users = pd.concat(list(generate_user_chunks(rng, levels)), ignore_index=True)
+    user_profiles = {str(user_id): PROFILE_NAMES[level - 1] for user_id, level in zip(users['user_id'], levels)}
+    interactions = io.StringIO()
+    for chunk in generate_interaction_chunks(rng, items, difficulty_codes, levels, num_interactions,
+                                             start_time=datetime.now() - timedelta(days=1)):
+        chunk.to_csv(interactions, header=interactions.tell() == 0, index=False)
+
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket=DATASET_BUCKET)
+    s3.put_object(Bucket=DATASET_BUCKET, Key=ITEMS_KEY, Body=items.to_csv(index=False))
+    s3.put_object(Bucket=DATASET_BUCKET, Key=INTERACTIONS_KEY, Body=interactions.getvalue())
+    dynamodb = boto3.client('dynamodb')
+    create_tables(dynamodb)
+    load_profiles(dynamodb, users)
+    return mock, users, user_profiles
+
+
+class CallCounter:
+    """Counts AWS API calls per operation for the request in progress."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def __call__(self, event_name='', **kwargs):
+        operation = ".".join(event_name.split('.')[1:3])
+        self.counts[operation] = self.counts.get(operation, 0) + 1
+
+    def take(self):
+        counts, self.counts = self.counts, {}
+        return counts
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def answer_for(profile, difficulty):
+    """Draw an answer the way the simulation does for this profile and difficulty."""
+    probabilities = profiles[profile]
+    if difficulty == 'hard':
+        correct, other = probabilities['hard_correct'], probabilities['hard_skipped_or_incorrect']
+    else:
+        correct, other = probabilities[f'{difficulty}_correct'], probabilities[f'{difficulty}_skipped']
+    return random.choices(event_types, weights=[correct, 1 - correct - other, other])[0]
+
+
+def replay(mix, users, user_profiles, num_requests, trace_memory, precompute=False):
+    """Send a weighted mix of requests; returns per-handler samples."""
+    counter = CallCounter()
+    boto3.DEFAULT_SESSION.events.register('after-call', counter)
+    # Handlers are imported only now, so their clients are created against moto
+    modules = {name: importlib.import_module(name) for name in set(mix) | {'getRecommendation'}}
+    if 'enrichingFunction' in modules:
+        modules['enrichingFunction'].SETTLE_SECONDS = 0  # Enrich the feedback of this run too
+    if precompute:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scanned, refreshed = importlib.import_module('precomputeRecommendations').precompute_recommendations(True)
+        print(f"Precomputed recommendations for {refreshed} of {scanned} users")
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    user_ids = [str(user_id) for user_id in users['user_id']]
+    served = {}  # user_id -> difficulty of the question they were served
+    samples = {name: [] for name in names}
+
+    for _ in range(num_requests):
+        name = random.choices(names, weights=weights)[0]
+        if name in ANSWER_HANDLERS and not served:
+            name = 'getRecommendation'
+            samples.setdefault(name, [])
+        if name in ANSWER_HANDLERS:
+            user_id = random.choice(list(served))
+            event = {'user_id': user_id, 'feedback': answer_for(user_profiles[user_id], served[user_id])}
+        elif name == 'enrichingFunction':
+            user_id, event = None, {}
+        else:
+            user_id = random.choice(user_ids)
+            event = {'user_id': user_id}
+
+        counter.take()
+        if trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started_at = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = modules[name].lambda_handler(event, None)
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        peak = tracemalloc.get_traced_memory()[1] - baseline if trace_memory else 0
+
+        body = json.loads(response.get('body') or '{}')
+        if response.get('statusCode') == 200 and 'difficulty' in body and user_id:
+            served[user_id] = body['difficulty']
+        samples[name].append({
+            'ms': elapsed_ms, 'status': response.get('statusCode'),
+            'calls': counter.take(), 'peak_bytes': peak,
+        })
+    return samples
+
+
+def summarize(samples):
+    report = {}
+    for name, runs in samples.items():
+        if not runs:
+            continue
+        # The first request of each handler pays for loading and indexing the datasets
+        warm = sorted(run['ms'] for run in runs[1:]) or [runs[0]['ms']]
+        calls = {}
+        for run in runs:
+            for operation, count in run['calls'].items():
+                calls[operation] = calls.get(operation, 0) + count
+        statuses = {}
+        for run in runs:
+            statuses[str(run['status'])] = statuses.get(str(run['status']), 0) + 1
+        report[name] = {
+            'requests': len(runs),
+            'statuses': statuses,
+            'cold_ms': round(runs[0]['ms'], 3),
+            'p50_ms': round(percentile(warm, 0.50), 3),
+            'p90_ms': round(percentile(warm, 0.90), 3),
+            'p99_ms': round(percentile(warm, 0.99), 3),
+            'max_ms': round(warm[-1], 3),
+            'peak_kib': round(max(run['peak_bytes'] for run in runs) / 1024, 1),
+            'calls_per_request': {
+                operation: round(count / len(runs), 3) for operation, count in sorted(calls.items())
+            },
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'handler':<20}{'requests':>9}{'cold ms':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}"
+          f"{'max ms':>9}{'peak KiB':>10}")
+    for name, row in report.items():
+        print(f"{name:<20}{row['requests']:>9}{row['cold_ms']:>10.1f}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}"
+              f"{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}{row['peak_kib']:>10.1f}")
+    for name, row in report.items():
+        calls = ", ".join(f"{operation} {count}" for operation, count in row['calls_per_request'].items())
+        print(f"{name} statuses {row['statuses']}; AWS calls per request: {calls}")
+
+
+def parse_mix(value):
+    """Parse "handler=weight,..." into a mix dict."""
+    mix = {}
+    for part in value.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a request mix against the handlers on moto.")
+    parser.add_argument('--items', type=int, default=1000, help="catalog size")
+    parser.add_argument('--users', type=int, default=200, help="number of users")
+    parser.add_argument('--interactions', type=int, default=1000, help="interaction history rows (1k-1M)")
+    parser.add_argument('--requests', type=int, default=500, help="requests to replay")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="handler=weight pairs, e.g. getRecommendation=0.6,StoreUserFeedback=0.4")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc, which slows every request")
+    parser.add_argument('--precompute', action='store_true',
+                        help="build PrecomputedRecommendations first, so session starts are served from it")
+    parser.add_argument('--output', help="write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    started_at = time.perf_counter()
+    mock, users, user_profiles = setup_environment(args.items, args.users, args.interactions, args.seed)
+    setup_seconds = time.perf_counter() - started_at
+    print(f"Loaded {args.items} items, {args.users} users and {args.interactions} interactions "
+          f"in {setup_seconds:.1f}s")
+
+    trace_memory = not args.no_memory
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        samples = replay(args.mix, users, user_profiles, args.requests, trace_memory, args.precompute)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        mock.stop()
+
+    report = summarize(samples)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'parameters': {
+                    'items': args.items, 'users': args.users, 'interactions': args.interactions,
+                    'requests': args.requests, 'mix': args.mix, 'seed': args.seed,
+                    'memory_traced': trace_memory, 'precomputed': args.precompute,
+                },
+                'handlers': report,
+            }, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
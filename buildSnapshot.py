@@ -0,0 +1,56 @@
+import codecs
+import csv
+import json
+import tempfile
+from urllib.parse import unquote_plus
+
+from aws_runtime import lazy_client
+from columnar_snapshot import DICTIONARY_COLUMNS, SNAPSHOT_SUFFIX, snapshot_key, write_snapshot
+from metrics import instrumented
+
+# AWS Clients
+s3 = lazy_client('s3')
+
+
+def build_dataset_snapshot(bucket, key):
+    """Stream a dataset CSV from S3 and upload its columnar snapshot next to it.
+
+    The snapshot records the CSV's ETag, so readers ignore it once the CSV changes.
+    """
+    response = s3.get_object(Bucket=bucket, Key=key)
+    reader = csv.reader(codecs.getreader('utf-8')(response['Body']))
+    fieldnames = next(reader)
+    with tempfile.NamedTemporaryFile(suffix=SNAPSHOT_SUFFIX) as output:
+        rows = write_snapshot(output, fieldnames, reader, DICTIONARY_COLUMNS.get(key, ()), response['ETag'])
+        output.flush()
+        s3.upload_file(output.name, bucket, snapshot_key(key))
+    return rows
+
+
+@instrumented
+def lambda_handler(event, context):
+    """Rebuild snapshots for dataset CSVs named in an S3 ObjectCreated event.
+
+    A manual rebuild can be requested with {"bucket": ..., "key": ...}.
+    """
+    if 'key' in event:
+        targets = [(event['bucket'], event['key'])]
+    else:
+        targets = [
+            (record['s3']['bucket']['name'], unquote_plus(record['s3']['object']['key']))
+            for record in event.get('Records', [])
+        ]
+
+    built = {}
+    for bucket, key in targets:
+        if key not in DICTIONARY_COLUMNS:
+            print(f"Skipping {key}: not a snapshotted dataset")
+            continue
+        try:
+            built[key] = build_dataset_snapshot(bucket, key)
+            print(f"Snapshot rebuilt for {key} ({built[key]} rows)")
+        except Exception as e:
+            print(f"Error building snapshot for {key}: {e}")
+            return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+    return {"statusCode": 200, "body": json.dumps({"snapshots": built})}
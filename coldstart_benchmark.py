@@ -0,0 +1,163 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start benchmark for the request handlers. Every sample is a fresh Python
+# process that imports boto3, imports the handler module, optionally prewarms
+# its clients the way provisioned concurrency or SnapStart would, and then
+# serves two requests against moto. Reports the median of each phase:
+#
+#   boto3_import_ms  importing boto3 itself
+#   import_ms        importing the handler module (the Lambda init phase)
+#   prewarm_ms       aws_runtime.prewarm(): building clients and loading datasets
+#   first_ms         the first request, which builds whatever is still lazy
+#   second_ms        the next, warm request
+#
+#   python coldstart_benchmark.py --repeat 10
+
+HANDLERS = ["getRecommendation", "answerAndNext", "StoreUserFeedback"]
+MODES = ["lazy", "prewarm"]
+PHASES = ["boto3_import_ms", "import_ms", "prewarm_ms", "first_ms", "second_ms"]
+
+USER_ID = "1"
+EVENTS = {
+    "getRecommendation": {"user_id": USER_ID},
+    "answerAndNext": {"user_id": USER_ID, "feedback": "correct"},
+    "StoreUserFeedback": {"user_id": USER_ID, "feedback": "correct"},
+}
+
+
+def seed_environment(num_items):
+    """Start moto and load a catalog, one profile and one state item.
+
+    Seeding uses its own boto3 session, so the handler's clients still load
+    their service models from scratch on the default session.
+    """
+    import boto3
+    import numpy as np
+    from moto import mock_aws
+
+    from benchmark import DATASET_BUCKET, INTERACTIONS_KEY, ITEMS_KEY, create_tables
+    from generate_synthetic_data import generate_items
+
+    mock = mock_aws()
+    mock.start()
+    session = boto3.session.Session()
+    s3 = session.client('s3')
+    s3.create_bucket(Bucket=DATASET_BUCKET)
+    items, _ = generate_items(np.random.default_rng(42), num_items)
+    s3.put_object(Bucket=DATASET_BUCKET, Key=ITEMS_KEY, Body=items.to_csv(index=False))
+    s3.put_object(Bucket=DATASET_BUCKET, Key=INTERACTIONS_KEY, Body="user_id,item_id\n")
+    dynamodb = session.client('dynamodb')
+    create_tables(dynamodb)
+    first = items.iloc[0]
+    dynamodb.put_item(TableName="UserProfiles", Item={
+        'user_id': {'S': USER_ID},
+        'preferences': {'L': [{'S': tag} for tag in first['tags'].split(', ')]},
+        'user_level': {'N': '1'},
+    })
+    dynamodb.put_item(TableName="UserQuestionState", Item={
+        'user_id': {'S': USER_ID},
+        'current_question': {'S': str(first['ITEM_INT_ID'])},
+        'current_difficulty': {'S': first['difficulty']},
+        'current_tags': {'S': first['tags']},
+    })
+    return mock
+
+
+def measure(handler_name, prewarm, num_items):
+    """One cold start in this process; returns {phase: milliseconds}."""
+    os.environ.update(AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='benchmark',
+                      AWS_SECRET_ACCESS_KEY='benchmark')
+    os.environ.pop('AWS_PROFILE', None)
+    timings = {}
+
+    started_at = time.perf_counter()
+    import boto3  # noqa: F401
+    timings['boto3_import_ms'] = (time.perf_counter() - started_at) * 1000
+
+    mock = seed_environment(num_items)
+    try:
+        started_at = time.perf_counter()
+        module = importlib.import_module(handler_name)
+        timings['import_ms'] = (time.perf_counter() - started_at) * 1000
+
+        timings['prewarm_ms'] = 0.0
+        if prewarm:
+            import aws_runtime
+            started_at = time.perf_counter()
+            aws_runtime.prewarm()
+            timings['prewarm_ms'] = (time.perf_counter() - started_at) * 1000
+
+        for phase in ('first_ms', 'second_ms'):
+            started_at = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = module.lambda_handler(dict(EVENTS[handler_name]), None)
+            timings[phase] = (time.perf_counter() - started_at) * 1000
+            timings[phase.replace('_ms', '_status')] = response.get('statusCode')
+    finally:
+        mock.stop()
+    return timings
+
+
+def run_sample(handler_name, mode, num_items):
+    """Measure one cold start in a fresh interpreter."""
+    command = [sys.executable, os.path.abspath(__file__), '--child', handler_name, '--items', str(num_items)]
+    if mode == 'prewarm':
+        command.append('--prewarm')
+    output = subprocess.run(
+        command, check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    report = {}
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples]
+        report[phase] = round(statistics.median(values), 2)
+    report['cold_start_ms'] = round(report['import_ms'] + report['prewarm_ms'] + report['first_ms'], 2)
+    report['statuses'] = sorted({(sample['first_status'], sample['second_status']) for sample in samples})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure handler import, init and first-request time.")
+    parser.add_argument('--handlers', default=",".join(HANDLERS), help="comma-separated handler modules")
+    parser.add_argument('--modes', default=",".join(MODES), help="lazy, prewarm or both")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh processes per handler and mode")
+    parser.add_argument('--items', type=int, default=1000, help="catalog size loaded on first use")
+    parser.add_argument('--output', help="write the report as JSON to this path")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--prewarm', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.prewarm, args.items)))
+        return None
+
+    report = {}
+    for handler_name in args.handlers.split(','):
+        for mode in args.modes.split(','):
+            samples = [run_sample(handler_name, mode, args.items) for _ in range(args.repeat)]
+            report[f"{handler_name}/{mode}"] = summarize(samples)
+
+    print(f"{'handler/mode':<28}{'boto3':>8}{'import':>8}{'prewarm':>9}{'first':>8}{'second':>8}{'cold':>8}")
+    for name, row in report.items():
+        print(f"{name:<28}{row['boto3_import_ms']:>8.1f}{row['import_ms']:>8.1f}{row['prewarm_ms']:>9.1f}"
+              f"{row['first_ms']:>8.1f}{row['second_ms']:>8.1f}{row['cold_start_ms']:>8.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'handlers': report}, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import array
+import json
+import mmap
+import sys
+
+# Binary snapshot stored next to each dataset CSV. Layout:
+#   magic | uint32 header length | JSON header | 8-byte aligned column sections
+# Column kinds:
+#   "dict" - uint32 codes into a dictionary kept in the header
+#   "int"  - int64 values (used when every value round-trips through int())
+#   "str"  - uint64 offsets (rows + 1) followed by the UTF-8 bytes of all values
+# Sections are little-endian and read in place from a memory map, so loading a
+# snapshot parses only the header.
+SNAPSHOT_MAGIC = b'DSCOLv1\n'
+SNAPSHOT_SUFFIX = '.colsnap'
+ALIGNMENT = 8
+
+# Columns worth dictionary-encoding, per dataset CSV key.
+DICTIONARY_COLUMNS = {
+    "updated_items (1).csv": ["difficulty", "tags"],
+}
+
+
+def snapshot_key(csv_key):
+    """S3 key of the snapshot that sits next to a dataset CSV."""
+    base = csv_key[:-len('.csv')] if csv_key.endswith('.csv') else csv_key
+    return base + SNAPSHOT_SUFFIX
+
+
+class _ColumnBuilder:
+    """Accumulates one column, as int64 until a value would not round-trip."""
+
+    def __init__(self, dictionary_encoded):
+        self.dictionary = {} if dictionary_encoded else None
+        self.codes = array.array('I')
+        self.ints = None if dictionary_encoded else array.array('q')
+        self.offsets = None
+        self.blob = None
+
+    def _switch_to_strings(self):
+        self.offsets = array.array('Q', [0])
+        self.blob = bytearray()
+        for value in self.ints:
+            self._append_string(str(value))
+        self.ints = None
+
+    def _append_string(self, value):
+        self.blob += value.encode('utf-8')
+        self.offsets.append(len(self.blob))
+
+    def append(self, value):
+        if self.dictionary is not None:
+            self.codes.append(self.dictionary.setdefault(value, len(self.dictionary)))
+            return
+        if self.ints is not None:
+            try:
+                number = int(value)
+                if str(number) == value and -2 ** 63 <= number < 2 ** 63:
+                    self.ints.append(number)
+                    return
+            except ValueError:
+                pass
+            self._switch_to_strings()
+        self._append_string(value)
+
+    def sections(self):
+        """Return (kind, [section bytes], header extras) for the finished column."""
+        if self.dictionary is not None:
+            return "dict", [self.codes.tobytes()], {'dictionary': list(self.dictionary)}
+        if self.ints is not None:
+            return "int", [self.ints.tobytes()], {}
+        return "str", [self.offsets.tobytes(), bytes(self.blob)], {}
+
+
+def write_snapshot(output, fieldnames, rows, dictionary_columns=(), source_etag=None):
+    """Encode ``rows`` (sequences of strings in ``fieldnames`` order) into ``output``.
+
+    Empty rows are skipped, as csv.DictReader skips them; any other row whose
+    length differs from the header is rejected. ``source_etag`` records the
+    version of the CSV the rows came from, so readers can tell a stale snapshot.
+    """
+    if sys.byteorder != 'little':
+        raise RuntimeError("Columnar snapshots are written in little-endian order")
+    builders = [_ColumnBuilder(name in dictionary_columns) for name in fieldnames]
+    row_count = 0
+    for row in rows:
+        if not row:
+            continue
+        if len(row) != len(fieldnames):
+            raise ValueError(f"Row {row_count + 1} has {len(row)} fields, expected {len(fieldnames)}")
+        for builder, value in zip(builders, row):
+            builder.append(value)
+        row_count += 1
+
+    columns = []
+    payload = []
+    position = 0
+    for name, builder in zip(fieldnames, builders):
+        kind, sections, extras = builder.sections()
+        column = {'name': name, 'kind': kind, 'sections': []}
+        column.update(extras)
+        for section in sections:
+            padding = -position % ALIGNMENT
+            payload.append(b'\0' * padding)
+            position += padding
+            column['sections'].append([position, len(section)])
+            payload.append(section)
+            position += len(section)
+        columns.append(column)
+
+    header = json.dumps({'rows': row_count, 'source_etag': source_etag, 'columns': columns}).encode('utf-8')
+    prefix_length = len(SNAPSHOT_MAGIC) + 4 + len(header)
+    header_padding = -prefix_length % ALIGNMENT
+    output.write(SNAPSHOT_MAGIC)
+    output.write((len(header) + header_padding).to_bytes(4, 'little'))
+    output.write(header + b' ' * header_padding)
+    for chunk in payload:
+        output.write(chunk)
+    return row_count
+
+
+class ColumnarSnapshot:
+    """Read-only view over a snapshot buffer; columns are zero-copy memoryviews."""
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if bytes(view[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise ValueError("Not a columnar snapshot")
+        start = len(SNAPSHOT_MAGIC) + 4
+        header_length = int.from_bytes(view[len(SNAPSHOT_MAGIC):start], 'little')
+        header = json.loads(bytes(view[start:start + header_length]))
+        data = view[start + header_length:]
+
+        self._buffer = buffer
+        self.row_count = header['rows']
+        self.source_etag = header.get('source_etag')
+        self.fieldnames = [column['name'] for column in header['columns']]
+        self._columns = {}
+        for column in header['columns']:
+            sections = [data[offset:offset + length] for offset, length in column['sections']]
+            if column['kind'] == 'dict':
+                self._columns[column['name']] = ('dict', sections[0].cast('I'), column['dictionary'])
+            elif column['kind'] == 'int':
+                self._columns[column['name']] = ('int', sections[0].cast('q'), None)
+            else:
+                self._columns[column['name']] = ('str', sections[0].cast('Q'), sections[1])
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a snapshot file."""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return self.row_count
+
+    def codes(self, name):
+        """Dictionary codes of a dictionary-encoded column."""
+        return self._columns[name][1]
+
+    def dictionary(self, name):
+        """Distinct values of a dictionary-encoded column, indexed by code."""
+        return self._columns[name][2]
+
+    def value(self, name, position):
+        """A single value as the string the CSV held."""
+        kind, values, extra = self._columns[name]
+        if kind == 'dict':
+            return extra[values[position]]
+        if kind == 'int':
+            return str(values[position])
+        return str(extra[values[position]:values[position + 1]], 'utf-8')
+
+    def __getitem__(self, position):
+        """Row as a dict, matching what csv.DictReader returns for the same row."""
+        if not 0 <= position < self.row_count:
+            raise IndexError(position)
+        return {name: self.value(name, position) for name in self.fieldnames}
@@ -0,0 +1,46 @@
+import json
+from botocore.exceptions import ClientError
+
+from aws_runtime import lazy_client
+from interaction_log import INTERACTION_DATASET_KEY, compact_interactions
+from metrics import instrumented
+from write_coordinator import run_coalesced
+
+# AWS Clients
+s3 = lazy_client('s3')
+dynamodb = lazy_client('dynamodb')
+
+# Upper bound on parts merged per run so one invocation stays within the Lambda timeout.
+MAX_PARTS_PER_RUN = 5000
+
+
+@instrumented
+def lambda_handler(event, context):
+    """Scheduled job that folds pending interaction parts into the consolidated dataset.
+
+    Overlapping runs are coalesced through the dataset's write lease: a run that
+    finds the lease taken leaves its request to the holder and returns 202.
+    """
+    try:
+        passes = run_coalesced(
+            dynamodb, INTERACTION_DATASET_KEY, lambda: compact_interactions(s3, max_parts=MAX_PARTS_PER_RUN)
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            print(f"Error compacting interaction parts: {e}")
+            return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+        print("Interactions dataset changed during compaction; parts kept for the next run")
+        return {"statusCode": 409, "body": json.dumps({"message": "Interactions dataset changed during compaction"})}
+    except Exception as e:
+        print(f"Error compacting interaction parts: {e}")
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+    if passes is None:
+        return {
+            "statusCode": 202,
+            "body": json.dumps({"message": "Compaction already running; request handed to it"})
+        }
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"message": f"Merged {sum(passes)} interaction parts in {len(passes)} passes"})
+    }
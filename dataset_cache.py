@@ -0,0 +1,129 @@
+import csv
+import os
+import time
+from io import StringIO
+
+from botocore.exceptions import ClientError
+
+from columnar_snapshot import ColumnarSnapshot, snapshot_key
+
+# How long a cached dataset is trusted before S3 is asked whether it changed.
+# Revalidation is a conditional GET, so an unchanged object costs no transfer.
+CACHE_TTL_SECONDS = 60
+
+# Local directory snapshots are downloaded to before being memory-mapped.
+SNAPSHOT_DIR = "/tmp/dataset-snapshots"
+
+# Parsed datasets kept across warm Lambda invocations, keyed by (bucket, key, parser).
+_cache = {}
+
+
+def parse_csv_rows(content):
+    """Parse CSV text into a list of row dicts."""
+    return list(csv.DictReader(StringIO(content)))
+
+
+def _get_cached(s3, bucket, key, cache_tag, load, ttl, missing_ok=False):
+    """Shared conditional-GET cache; ``load`` turns a GetObject response into data."""
+    cache_key = (bucket, key, cache_tag)
+    entry = _cache.get(cache_key)
+    now = time.time()
+
+    if entry and now - entry['checked_at'] < ttl:
+        return entry['data']
+
+    request = {'Bucket': bucket, 'Key': key}
+    if entry and entry['etag']:
+        request['IfNoneMatch'] = entry['etag']
+
+    try:
+        response = s3.get_object(**request)
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if entry and code in ('304', 'NotModified'):
+            entry['checked_at'] = now
+            return entry['data']
+        if missing_ok and code in ('NoSuchKey', '404', 'AccessDenied', '403'):
+            # Remember the miss too, so absent objects are not re-requested every call.
+            # Without s3:ListBucket, S3 reports a missing key as AccessDenied.
+            _cache[cache_key] = {'etag': None, 'checked_at': now, 'data': None}
+            return None
+        raise
+
+    data = load(response)
+    _cache[cache_key] = {'etag': response['ETag'], 'checked_at': now, 'data': data}
+    return data
+
+
+def get_dataset(s3, bucket, key, parser=parse_csv_rows, ttl=CACHE_TTL_SECONDS):
+    """Return the parsed contents of an S3 object, reusing the warm-container copy.
+
+    Within ``ttl`` seconds of the last check the cached value is returned without
+    touching S3. After that the object is revalidated with ``IfNoneMatch`` on the
+    cached ETag and only downloaded and re-parsed if it actually changed.
+    """
+    return _get_cached(
+        s3, bucket, key, parser,
+        lambda response: parser(response['Body'].read().decode('utf-8')),
+        ttl
+    )
+
+
+def _current_etag(s3, bucket, key, ttl):
+    """ETag of an object from a HeadObject, rechecked at most every ``ttl`` seconds."""
+    cache_key = (bucket, key, 'etag')
+    entry = _cache.get(cache_key)
+    now = time.time()
+    if entry and now - entry['checked_at'] < ttl:
+        return entry['data']
+    etag = s3.head_object(Bucket=bucket, Key=key)['ETag']
+    _cache[cache_key] = {'etag': etag, 'checked_at': now, 'data': etag}
+    return etag
+
+
+def get_snapshot_dataset(s3, bucket, csv_key, parser, ttl=CACHE_TTL_SECONDS):
+    """Like get_dataset, but from the columnar snapshot next to ``csv_key``.
+
+    The snapshot is streamed to local disk and memory-mapped; ``parser`` receives
+    the ColumnarSnapshot. Returns None if no snapshot has been built yet, or if
+    it was built from another version of the CSV than the one in S3 now, so the
+    caller can fall back to the CSV.
+    """
+    key = snapshot_key(csv_key)
+
+    def load(response):
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = os.path.join(SNAPSHOT_DIR, key.replace('/', '_'))
+        # Write beside the target and rename, so maps of the previous version stay valid
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            for chunk in response['Body'].iter_chunks(1024 * 1024):
+                f.write(chunk)
+        os.replace(temp_path, path)
+        snapshot = ColumnarSnapshot.open(path)
+        return snapshot.source_etag, parser(snapshot)
+
+    cached = _get_cached(s3, bucket, key, ('snapshot', parser), load, ttl, missing_ok=True)
+    if cached is None:
+        return None
+    source_etag, data = cached
+    if source_etag != _current_etag(s3, bucket, csv_key, ttl):
+        print(f"Snapshot {key} is stale; reading {csv_key} instead")
+        return None
+    return data
+
+
+def get_dataset_preferring_snapshot(s3, bucket, csv_key, snapshot_parser, parser, ttl=CACHE_TTL_SECONDS):
+    """get_snapshot_dataset, falling back to get_dataset on the CSV.
+
+    The CSV is read when the snapshot is missing or stale, and also when reading
+    it fails for any other reason, so a broken snapshot never takes the dataset down.
+    """
+    try:
+        data = get_snapshot_dataset(s3, bucket, csv_key, snapshot_parser, ttl)
+    except Exception as e:
+        print(f"Error reading the snapshot of {csv_key}, reading the CSV instead: {e}")
+        data = None
+    if data is None:
+        data = get_dataset(s3, bucket, csv_key, parser, ttl)
+    return data
@@ -1,31 +1,30 @@
+import sys
+
 import boto3
 
+from personalize_pipeline import IMPORT_STAGES, run_pipeline
+from user_profile_store import USERS_DATASET_KEY, DynamoUserProfileStore, export_profiles_csv
+from write_coordinator import run_coalesced_and_wait
+
 # Initialize Personalize client
 personalize = boto3.client('personalize')
 
-# Replace with your dataset group, schemas, and S3 bucket
-s3_bucket_name = "realtimerecommendation"
-role_arn = "arn:aws:iam::<your-account-id>:role/<your-role-name>"
-
-def import_dataset(dataset_arn, s3_path, role_arn):
-    response = personalize.create_dataset_import_job(
-        jobName=f"import-{dataset_arn.split('/')[-1]}",
-        datasetArn=dataset_arn,
-        dataSource={"dataLocation": s3_path},
-        roleArn=role_arn
+# Regenerate the users CSV from the profile table so the import sees current levels.
+# Concurrent exports are coalesced under the dataset's write lease; when another
+# export holds it, wait for that one to cover this request before importing.
+dynamodb = boto3.client('dynamodb')
+try:
+    exported_users = run_coalesced_and_wait(
+        dynamodb, USERS_DATASET_KEY, lambda: export_profiles_csv(DynamoUserProfileStore(dynamodb), boto3.client('s3'))
     )
-    return response['datasetImportJobArn']
-
-# Replace with actual ARNs for datasets
-interaction_dataset_arn = "arn:aws:personalize:<region>:<account-id>:dataset/InteractionsDataset"
-item_dataset_arn = "arn:aws:personalize:<region>:<account-id>:dataset/ItemsDataset"
-user_dataset_arn = "arn:aws:personalize:<region>:<account-id>:dataset/UsersDataset"
+except TimeoutError as e:
+    sys.exit(f"User profile export did not finish ({e}); retry the import once it has.")
+print("User profiles exported:", exported_users or "by a concurrent export")
 
-# Import datasets
-interaction_job_arn = import_dataset(interaction_dataset_arn, f"s3://{s3_bucket_name}/updated_interactions_with_profiles_and_scores.csv", role_arn)
-item_job_arn = import_dataset(item_dataset_arn, f"s3://{s3_bucket_name}/updated_items (1).csv", role_arn)
-user_job_arn = import_dataset(user_dataset_arn, f"s3://{s3_bucket_name}/updated_usersmnew.csv", role_arn)
+# Import the three datasets in parallel and wait until every job is ACTIVE
+# (dataset ARNs and S3 locations are configured in personalize_pipeline.STAGES)
+job_arns = run_pipeline(personalize, IMPORT_STAGES)
 
-print("Interaction Dataset Import Job ARN:", interaction_job_arn)
-print("Item Dataset Import Job ARN:", item_job_arn)
-print("User Dataset Import Job ARN:", user_job_arn)
+print("Interaction Dataset Import Job ARN:", job_arns['import_interactions'])
+print("Item Dataset Import Job ARN:", job_arns['import_items'])
+print("User Dataset Import Job ARN:", job_arns['import_users'])
@@ -0,0 +1,45 @@
+import random
+import time
+
+# BatchGetItem and BatchWriteItem hand back whatever they could not process
+# (throttling, response size) as UnprocessedKeys / UnprocessedItems. That part
+# is resent after a jittered exponential backoff capped at BACKOFF_CAP_SECONDS;
+# a batch still unfinished after MAX_BATCH_ATTEMPTS calls raises rather than
+# hammering a throttled table.
+MAX_BATCH_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_CAP_SECONDS = 2.0
+
+
+def backoff_delay(attempt):
+    """Full-jitter delay before retry number ``attempt`` (1 for the first retry)."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _until_processed(call, request, unprocessed_key, sleep):
+    """Yield each response of ``call`` while resending what it left unprocessed."""
+    for attempt in range(MAX_BATCH_ATTEMPTS):
+        if attempt:
+            sleep(backoff_delay(attempt))
+        response = call(RequestItems=request)
+        yield response
+        request = response.get(unprocessed_key)
+        if not request:
+            return
+    tables = ", ".join(request)
+    raise RuntimeError(f"Batch request to {tables} still unprocessed after {MAX_BATCH_ATTEMPTS} attempts")
+
+
+def batch_get(client, request, sleep=time.sleep):
+    """BatchGetItem ``request`` to completion; returns {table name: [low-level items]}."""
+    found = {}
+    for response in _until_processed(client.batch_get_item, request, 'UnprocessedKeys', sleep):
+        for table_name, items in response.get('Responses', {}).items():
+            found.setdefault(table_name, []).extend(items)
+    return found
+
+
+def batch_write(client, request, sleep=time.sleep):
+    """BatchWriteItem ``request`` to completion."""
+    for _ in _until_processed(client.batch_write_item, request, 'UnprocessedItems', sleep):
+        pass
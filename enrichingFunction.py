@@ -1,45 +1,78 @@
-import boto3
 import json
 import csv
 import io
+import time
+from botocore.exceptions import ClientError
+
+from accuracy_models import accuracy_from_history
+from aws_runtime import lazy_client
+from dataset_cache import get_dataset_preferring_snapshot
+from feedback_store import FeedbackStore
+from interaction_log import write_interaction_part
+from metrics import instrumented, stage
+from user_profile_store import DynamoUserProfileStore
 
 # Initialize AWS clients
-s3 = boto3.client('s3')
-dynamodb = boto3.client('dynamodb')
+s3 = lazy_client('s3')
+dynamodb = lazy_client('dynamodb')
 
 # Constants
-USER_FEEDBACK_TABLE = 'UserFeedback'
 ITEMS_METADATA_S3_BUCKET = 'realtimerecommendation'
 ITEMS_METADATA_S3_KEY = 'updated_items (1).csv'
-INTERACTIONS_DATASET_S3_BUCKET = 'realtimerecommendation'
-INTERACTIONS_DATASET_S3_KEY = 'updated_interactions_with_profiles_and_scores.csv'
+ENRICHMENT_CHECKPOINT_TABLE = 'EnrichmentCheckpoint'
+ENRICHMENT_JOB_NAME = 'interactions-enrichment'
 
-def fetch_item_metadata(item_int_id):
-    try:
-        # Fetch the items dataset from S3
-        response = s3.get_object(Bucket=ITEMS_METADATA_S3_BUCKET, Key=ITEMS_METADATA_S3_KEY)
-        csv_data = response['Body'].read().decode('utf-8')
-        
-        # Parse CSV to find the matching item
-        csv_reader = csv.DictReader(io.StringIO(csv_data))
-        for row in csv_reader:
-            if row['ITEM_INT_ID'] == str(item_int_id):  # Match using ITEM_INT_ID
-                return {
-                    'difficulty': row.get('difficulty', 'unknown'),
-                    'tags': row.get('tags', 'unknown')  # Use 'tags' as a single string
-                }
-        print(f"Item metadata not found for ITEM_INT_ID: {item_int_id}")
-        return None
-    except Exception as e:
-        print(f"Error fetching item metadata from S3: {e}")
-        return None
+# Feedback younger than this is left for the next run, so answers still being
+# written in the current second are never skipped by the high-water mark.
+SETTLE_SECONDS = 60
+
+PROFILE_NAMES = {1: 'beginner', 2: 'intermediate', 3: 'expert'}
+
+feedback_store = FeedbackStore(dynamodb)
+profile_store = DynamoUserProfileStore(dynamodb)
+
+def index_item_metadata(content):
+    """Parse the items dataset into item metadata keyed by ITEM_INT_ID."""
+    return {
+        row['ITEM_INT_ID']: {
+            'difficulty': row.get('difficulty', 'unknown'),
+            'tags': row.get('tags', 'unknown')  # Use 'tags' as a single string
+        }
+        for row in csv.DictReader(io.StringIO(content))
+    }
+
+def index_item_metadata_from_snapshot(snapshot):
+    """Build the item metadata lookup from the items snapshot."""
+    return {
+        snapshot.value('ITEM_INT_ID', position): {
+            'difficulty': snapshot.value('difficulty', position),
+            'tags': snapshot.value('tags', position)
+        }
+        for position in range(len(snapshot))
+    }
+
+def fetch_item_catalog():
+    """Fetch the item metadata lookup, loaded once per dataset version (snapshot first, then CSV)."""
+    return get_dataset_preferring_snapshot(
+        s3, ITEMS_METADATA_S3_BUCKET, ITEMS_METADATA_S3_KEY,
+        snapshot_parser=index_item_metadata_from_snapshot, parser=index_item_metadata
+    )
+
+def group_feedback_by_user(feedback_items):
+    """Group a stream of feedback items by user_id in a single pass."""
+    feedback_by_user = {}
+    for feedback in feedback_items:
+        feedback_by_user.setdefault(feedback['user_id'], []).append(feedback)
+    return feedback_by_user
 
 def determine_user_profile(user_feedback):
-    correct_count = sum(1 for feedback in user_feedback if feedback['feedback'] == 'correct')
-    total_count = len(user_feedback)
-    if total_count == 0:
+    answers = sorted(
+        (feedback['timestamp'], feedback['feedback'].lower() == 'correct')
+        for feedback in user_feedback
+    )
+    if not answers:
         return 'beginner'
-    accuracy = correct_count / total_count
+    accuracy = accuracy_from_history((is_correct, timestamp) for timestamp, is_correct in answers)
     if accuracy > 0.8:
         return 'expert'
     elif accuracy > 0.5:
@@ -47,73 +80,136 @@ def determine_user_profile(user_feedback):
     else:
         return 'beginner'
 
+def lookup_user_profiles(feedback_by_user):
+    """Use the levels StoreUserFeedback maintains, read in batches.
+
+    Users without a profile are levelled from their whole feedback history,
+    not just this run's window, so one answer cannot make them an expert.
+    """
+    profiles = profile_store.get_profiles(list(feedback_by_user))
+    return {
+        user_id: PROFILE_NAMES.get(profiles[user_id]['user_level'], 'beginner') if user_id in profiles
+        else determine_user_profile(feedback_store.query_user_feedback(user_id))
+        for user_id in feedback_by_user
+    }
+
+def read_checkpoint():
+    """Return (high_water_mark, pending_until); either is None when not set."""
+    response = dynamodb.get_item(
+        TableName=ENRICHMENT_CHECKPOINT_TABLE,
+        Key={'job_name': {'S': ENRICHMENT_JOB_NAME}},
+        ConsistentRead=True
+    )
+    item = response.get('Item', {})
+    high_water_mark = int(item['high_water_mark']['N']) if 'high_water_mark' in item else None
+    pending_until = int(item['pending_until']['N']) if 'pending_until' in item else None
+    return high_water_mark, pending_until
+
+def begin_run(high_water_mark, until):
+    """Record the window's upper bound so a retried run processes exactly the same window."""
+    condition = "attribute_not_exists(pending_until) AND "
+    values = {':until': {'N': str(until)}}
+    if high_water_mark is None:
+        condition += "attribute_not_exists(high_water_mark)"
+    else:
+        condition += "high_water_mark = :hwm"
+        values[':hwm'] = {'N': str(high_water_mark)}
+    dynamodb.update_item(
+        TableName=ENRICHMENT_CHECKPOINT_TABLE,
+        Key={'job_name': {'S': ENRICHMENT_JOB_NAME}},
+        UpdateExpression="SET pending_until = :until",
+        ConditionExpression=condition,
+        ExpressionAttributeValues=values
+    )
+
+def commit_run(until):
+    """Advance the high-water mark once the window's delta has been written."""
+    dynamodb.update_item(
+        TableName=ENRICHMENT_CHECKPOINT_TABLE,
+        Key={'job_name': {'S': ENRICHMENT_JOB_NAME}},
+        UpdateExpression="SET high_water_mark = :until REMOVE pending_until",
+        ConditionExpression="pending_until = :until",
+        ExpressionAttributeValues={':until': {'N': str(until)}}
+    )
+
+def fetch_new_feedback(high_water_mark, until):
+    """Stream feedback recorded after the high-water mark, up to ``until``."""
+    if high_water_mark is None:
+        # First run: feedback written before the by-day index existed is only reachable by scan
+        return (feedback for feedback in feedback_store.iter_feedback() if feedback['timestamp'] <= until)
+    return feedback_store.query_feedback_between(high_water_mark, until)
+
+@instrumented
 def lambda_handler(event, context):
     try:
-        # Fetch feedback from DynamoDB
-        response = dynamodb.scan(TableName=USER_FEEDBACK_TABLE)
-        feedback_data = response.get('Items', [])
-        
-        if not feedback_data:
-            return {
-                'statusCode': 404,
-                'body': json.dumps({'message': 'No feedback available to process.'})
-            }
+        # Resume a window left pending by a failed run, or open a new one
+        high_water_mark, until = read_checkpoint()
+        if until is None:
+            until = int(time.time()) - SETTLE_SECONDS
+            begin_run(high_water_mark, until)
 
-        enriched_feedback = []
-
-        # Enrich feedback
-        for feedback in feedback_data:
-            user_id = feedback['user_id']['S']
-            item_int_id = feedback['question_id']['S']  # Use 'question_id' instead of 'item_id'
-            event_type = feedback['feedback']['S'].lower()
-            timestamp = feedback['timestamp']['N']
-
-            # Fetch item metadata
-            item_metadata = fetch_item_metadata(item_int_id)
-            if not item_metadata:
-                print(f"Item metadata not found for question_id: {item_int_id}")
-                continue
-
-            difficulty = item_metadata['difficulty']
-            tags = item_metadata['tags']
-
-            enriched_feedback.append({
-                'user_id': user_id,
-                'item_id': item_int_id,
-                'event_type': event_type,
-                'timestamp': int(timestamp),
-                'difficulty': difficulty,
-                'topic': tags,  # Keep topics as a single string
-                'user_profile': determine_user_profile(feedback_data),  # Determine user profile dynamically
-                'interaction_score': 1 if event_type == 'correct' else -1 if event_type == 'incorrect' else 0
-            })
-
-        # Load existing interactions dataset
-        s3_object = s3.get_object(Bucket=INTERACTIONS_DATASET_S3_BUCKET, Key=INTERACTIONS_DATASET_S3_KEY)
-        existing_data = s3_object['Body'].read().decode('utf-8')
-        existing_rows = existing_data.splitlines()
+        # Load the item catalog once, then stream new feedback from DynamoDB into per-user groups
+        with stage("fetch"):
+            item_catalog = fetch_item_catalog()
+            feedback_by_user = group_feedback_by_user(fetch_new_feedback(high_water_mark, until))
+            user_profiles = lookup_user_profiles(feedback_by_user)
 
-        # Append enriched feedback to interactions dataset
         enriched_rows = []
-        for feedback in enriched_feedback:
-            enriched_rows.append(
-                f"{feedback['user_id']},{feedback['item_id']},{feedback['event_type']},{feedback['timestamp']},{feedback['difficulty']},\"{feedback['topic']}\",{feedback['user_profile']},{feedback['interaction_score']}"
-            )
-        
-        updated_dataset = '\n'.join(existing_rows + enriched_rows)
-
-        # Upload updated dataset to S3
-        s3.put_object(
-            Bucket=INTERACTIONS_DATASET_S3_BUCKET,
-            Key=INTERACTIONS_DATASET_S3_KEY,
-            Body=updated_dataset
-        )
+
+        # Enrich feedback by joining each item against the catalog
+        for user_id, user_feedback in feedback_by_user.items():
+            user_profile = user_profiles[user_id]
+
+            for feedback in user_feedback:
+                item_int_id = feedback['question_id']  # Use 'question_id' instead of 'item_id'
+                event_type = feedback['feedback'].lower()
+
+                item_metadata = item_catalog.get(str(item_int_id))
+                if not item_metadata:
+                    print(f"Item metadata not found for question_id: {item_int_id}")
+                    continue
+
+                enriched_rows.append({
+                    'user_id': user_id,
+                    'item_id': item_int_id,
+                    'FEEDBACK': event_type,
+                    'timestamp': feedback['timestamp'],
+                    'difficulty': item_metadata['difficulty'],
+                    'topic': item_metadata['tags'],  # Keep topics as a single string
+                    'user_profile': user_profile,
+                    'interaction_score': 1 if event_type == 'correct' else -1 if event_type == 'incorrect' else 0
+                })
+
+        # Write only this window's delta. The part name is fixed by the window, so a
+        # retry overwrites it rather than appending the same rows twice.
+        if enriched_rows:
+            with stage("dataset_append"):
+                write_interaction_part(
+                    s3, enriched_rows, part_name=f"{until * 1000:013d}-enrichment-{high_water_mark or 0}-{until}.csv"
+                )
+        commit_run(until)
 
         return {
             'statusCode': 200,
-            'body': json.dumps({'message': 'Interactions dataset updated successfully.'})
+            'body': json.dumps({
+                'message': 'Interactions dataset updated successfully.',
+                'enriched': len(enriched_rows),
+                'high_water_mark': until
+            })
         }
 
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Error: {e}")
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'message': f'An error occurred: {e}'})
+            }
+        print("Enrichment checkpoint moved during this run; another run is in progress")
+        return {
+            'statusCode': 409,
+            'body': json.dumps({'message': 'Another enrichment run is in progress.'})
+        }
     except Exception as e:
         print(f"Error: {e}")
         return {
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+
+# UserFeedback is keyed by user_id (partition key) and timestamp (sort key), so a
+# user's answers can be read with a query instead of a scan of the whole table.
+USER_FEEDBACK_TABLE = "UserFeedback"
+
+# Global secondary index on (feedback_day, timestamp) for reading everything
+# recorded in a time range, one UTC day partition at a time.
+FEEDBACK_BY_DAY_INDEX = "FeedbackByDay"
+
+
+def feedback_day(timestamp):
+    """UTC day partition ("YYYY-MM-DD") of an epoch-seconds timestamp."""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def _to_feedback(item):
+    """Convert a low-level DynamoDB item into a feedback dict."""
+    return {
+        'user_id': item['user_id']['S'],
+        'question_id': item['question_id']['S'],
+        'feedback': item['feedback']['S'],
+        'timestamp': int(item['timestamp']['N']),
+    }
+
+
+def _paginate(call, request):
+    """Yield items from a query or scan, following LastEvaluatedKey page by page."""
+    request = dict(request)
+    while True:
+        response = call(**request)
+        for item in response.get('Items', []):
+            yield _to_feedback(item)
+        if 'LastEvaluatedKey' not in response:
+            return
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class FeedbackStore:
+    """Access layer for the UserFeedback table over a low-level DynamoDB client."""
+
+    def __init__(self, client, table_name=USER_FEEDBACK_TABLE, page_size=None):
+        self.client = client
+        self.table_name = table_name
+        self.page_size = page_size
+
+    def _request(self, **request):
+        request['TableName'] = self.table_name
+        if self.page_size:
+            request['Limit'] = self.page_size
+        return request
+
+    def feedback_put(self, user_id, question_id, feedback, timestamp):
+        """put_item arguments for one answer, also usable inside a transaction."""
+        return {
+            'TableName': self.table_name,
+            'Item': {
+                'user_id': {'S': str(user_id)},
+                'question_id': {'S': str(question_id)},
+                'feedback': {'S': feedback},
+                'timestamp': {'N': str(int(timestamp))},
+                'feedback_day': {'S': feedback_day(timestamp)}
+            }
+        }
+
+    def put_feedback(self, user_id, question_id, feedback, timestamp):
+        self.client.put_item(**self.feedback_put(user_id, question_id, feedback, timestamp))
+
+    def query_user_feedback(self, user_id, since=None):
+        """Yield one user's feedback in timestamp order, optionally only after ``since``."""
+        key_condition = "user_id = :user_id"
+        values = {':user_id': {'S': str(user_id)}}
+        if since is not None:
+            key_condition += " AND #ts > :since"
+            values[':since'] = {'N': str(int(since))}
+        request = self._request(KeyConditionExpression=key_condition, ExpressionAttributeValues=values)
+        if since is not None:
+            request['ExpressionAttributeNames'] = {'#ts': 'timestamp'}
+        return _paginate(self.client.query, request)
+
+    def query_feedback_between(self, since, until):
+        """Yield all feedback with since < timestamp <= until via the by-day index."""
+        day = datetime.fromtimestamp(int(since), tz=timezone.utc).date()
+        last_day = datetime.fromtimestamp(int(until), tz=timezone.utc).date()
+        while day <= last_day:
+            request = self._request(
+                IndexName=FEEDBACK_BY_DAY_INDEX,
+                KeyConditionExpression="feedback_day = :day AND #ts BETWEEN :from AND :to",
+                ExpressionAttributeNames={'#ts': 'timestamp'},
+                ExpressionAttributeValues={
+                    ':day': {'S': day.isoformat()},
+                    ':from': {'N': str(int(since) + 1)},
+                    ':to': {'N': str(int(until))}
+                }
+            )
+            yield from _paginate(self.client.query, request)
+            day += timedelta(days=1)
+
+    def iter_feedback(self):
+        """Yield every feedback item lazily, one scan page at a time."""
+        return _paginate(self.client.scan, self._request())
+
+
+class InMemoryFeedbackTable:
+    """Local fake of the UserFeedback table for tests.
+
+    Implements just the low-level client calls FeedbackStore makes, including
+    Limit / LastEvaluatedKey pagination, so the store runs unchanged against it.
+    """
+
+    def __init__(self):
+        self.items = {}
+
+    @staticmethod
+    def _key(item):
+        return item['user_id']['S'], int(item['timestamp']['N'])
+
+    def _page(self, keys, request):
+        keys = sorted(keys)
+        start = request.get('ExclusiveStartKey')
+        if start:
+            keys = [key for key in keys if key > self._key(start)]
+        limit = request.get('Limit')
+        page = keys[:limit] if limit else keys
+        response = {'Items': [self.items[key] for key in page], 'Count': len(page)}
+        if limit and len(keys) > limit:
+            last = self.items[page[-1]]
+            response['LastEvaluatedKey'] = {'user_id': last['user_id'], 'timestamp': last['timestamp']}
+        return response
+
+    def put_item(self, TableName, Item, **kwargs):
+        self.items[self._key(Item)] = Item
+        return {}
+
+    def query(self, **request):
+        values = request['ExpressionAttributeValues']
+        if request.get('IndexName') == FEEDBACK_BY_DAY_INDEX:
+            low, high = int(values[':from']['N']), int(values[':to']['N'])
+            keys = [
+                key for key, item in self.items.items()
+                if item.get('feedback_day', {}).get('S') == values[':day']['S'] and low <= key[1] <= high
+            ]
+            return self._page(keys, request)
+        user_id = values[':user_id']['S']
+        since = int(values[':since']['N']) if ':since' in values else None
+        keys = [
+            key for key in self.items
+            if key[0] == user_id and (since is None or key[1] > since)
+        ]
+        return self._page(keys, request)
+
+    def scan(self, **request):
+        return self._page(self.items.keys(), request)
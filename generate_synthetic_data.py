@@ -0,0 +1,165 @@
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from interaction_log import INTERACTION_FIELDS
+from simulatingInteractions import event_types, profiles
+
+# Vectorized version of simulatiguserData.py and simulatingInteractions.py.
+# Every column of a chunk is drawn with one NumPy call instead of one Python
+# call per row, and chunks are appended to the CSVs as they are generated, so
+# memory stays flat at tens of millions of rows. A fixed --seed (and the same
+# --chunk-size and --start-time) reproduces the same files.
+#
+#   python generate_synthetic_data.py --items 50000 --users 1000000 --interactions 10000000
+
+ITEMS_FILE = "updated_items (1).csv"
+USERS_FILE = "updated_usersmnew.csv"
+INTERACTIONS_FILE = "updated_interactions_with_profiles_and_scores.csv"
+
+DEFAULT_CHUNK_SIZE = 250_000
+
+TOPICS = np.array([
+    "java", "python", "loops", "arrays", "recursion", "sorting",
+    "graphs", "strings", "sql", "oop", "trees", "dynamic programming",
+])
+DIFFICULTIES = np.array(["easy", "medium", "hard"])
+PROFILE_NAMES = np.array(["beginner", "intermediate", "expert"])  # user_level 1-3
+INTERACTION_SCORES = np.array([1, -1, 0])  # per event type, as enrichingFunction scores them
+
+# Answers land within this many minutes after the start time, as in the simulation
+TIMESTAMP_SPREAD_MINUTES = 1000
+
+# Fixed rather than the current time, so a seed always produces the same timestamps
+DEFAULT_START_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def outcome_thresholds():
+    """Cumulative outcome probabilities indexed by [profile, difficulty], from the simulation's table."""
+    thresholds = np.zeros((len(PROFILE_NAMES), len(DIFFICULTIES), len(event_types)))
+    for p, profile in enumerate(PROFILE_NAMES):
+        probabilities = profiles[profile]
+        for d, difficulty in enumerate(DIFFICULTIES):
+            if difficulty == 'hard':
+                correct, other = probabilities['hard_correct'], probabilities['hard_skipped_or_incorrect']
+            else:
+                correct, other = probabilities[f'{difficulty}_correct'], probabilities[f'{difficulty}_skipped']
+            thresholds[p, d] = np.cumsum([correct, 1 - correct - other, other])
+    return thresholds
+
+
+def sample_tag_sets(rng, count, low, high):
+    """Join ``low``-``high`` distinct topics per row, using a random ranking of all topics."""
+    sizes = rng.integers(low, high + 1, count)
+    order = np.argsort(rng.random((count, len(TOPICS))), axis=1)
+    chosen = TOPICS[order[:, :high]]
+    return [", ".join(row[:size]) for row, size in zip(chosen, sizes)]
+
+
+def generate_items(rng, num_items):
+    """Item catalog: ids 1..num_items with a difficulty code and one to three topics each."""
+    difficulty_codes = rng.integers(0, len(DIFFICULTIES), num_items)
+    return pd.DataFrame({
+        "ITEM_INT_ID": np.arange(1, num_items + 1),
+        "difficulty": DIFFICULTIES[difficulty_codes],
+        "tags": sample_tag_sets(rng, num_items, 1, 3),
+    }), difficulty_codes
+
+
+def generate_user_chunks(rng, levels, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield user rows with two to five preferred topics; ``levels`` holds each user's level."""
+    for start in range(0, len(levels), chunk_size):
+        chunk_levels = levels[start:start + chunk_size]
+        yield pd.DataFrame({
+            "user_id": np.arange(start + 1, start + len(chunk_levels) + 1),
+            "preferences": sample_tag_sets(rng, len(chunk_levels), 2, 5),
+            "user_level": chunk_levels,
+        })
+
+
+def generate_interaction_chunks(rng, items, difficulty_codes, levels, num_interactions,
+                                start_time=DEFAULT_START_TIME, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield interaction rows in the interactions dataset layout.
+
+    Users and items are drawn uniformly; each outcome is drawn from the
+    profile-by-difficulty probabilities of the simulation with a single
+    uniform draw per row against the cumulative thresholds.
+    """
+    start_time = int(start_time.timestamp())
+    thresholds = outcome_thresholds()
+    item_ids = items["ITEM_INT_ID"].to_numpy()
+    topics = items["tags"].to_numpy()
+    for start in range(0, num_interactions, chunk_size):
+        count = min(chunk_size, num_interactions - start)
+        users = rng.integers(0, len(levels), count)
+        chosen = rng.integers(0, len(item_ids), count)
+        profile_codes = levels[users] - 1
+        difficulty = difficulty_codes[chosen]
+        outcomes = (rng.random(count)[:, None] >= thresholds[profile_codes, difficulty]).sum(axis=1)
+        outcomes = np.minimum(outcomes, len(event_types) - 1)  # Guard against rounding at 1.0
+        timestamps = start_time + 60 * rng.integers(1, TIMESTAMP_SPREAD_MINUTES + 1, count)
+        yield pd.DataFrame({
+            "user_id": users + 1,
+            "item_id": item_ids[chosen],
+            "FEEDBACK": np.asarray(event_types)[outcomes],
+            "timestamp": timestamps,
+            "difficulty": DIFFICULTIES[difficulty],
+            "topic": topics[chosen],
+            "user_profile": PROFILE_NAMES[profile_codes],
+            "interaction_score": INTERACTION_SCORES[outcomes],
+        }, columns=INTERACTION_FIELDS)
+
+
+def write_csv_chunks(chunks, path):
+    """Append DataFrame chunks to a CSV with a single header; returns the row count."""
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=rows == 0, index=False)
+            rows += len(chunk)
+    return rows
+
+
+def parse_start_time(value):
+    """Parse --start-time, reading a datetime without an offset as UTC."""
+    start_time = datetime.fromisoformat(value)
+    return start_time if start_time.tzinfo else start_time.replace(tzinfo=timezone.utc)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic items, users and interactions as CSV.")
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--interactions', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--start-time', type=parse_start_time, default=DEFAULT_START_TIME,
+                        help="ISO date or datetime the interaction timestamps start from (UTC unless given)")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    os.makedirs(args.output_dir, exist_ok=True)
+    started_at = time.perf_counter()
+
+    items, difficulty_codes = generate_items(rng, args.items)
+    items.to_csv(os.path.join(args.output_dir, ITEMS_FILE), index=False)
+    levels = rng.integers(1, 4, args.users).astype(np.int8)
+    users = write_csv_chunks(
+        generate_user_chunks(rng, levels, args.chunk_size), os.path.join(args.output_dir, USERS_FILE)
+    )
+    interactions = write_csv_chunks(
+        generate_interaction_chunks(rng, items, difficulty_codes, levels, args.interactions,
+                                    start_time=args.start_time, chunk_size=args.chunk_size),
+        os.path.join(args.output_dir, INTERACTIONS_FILE)
+    )
+    print(f"Wrote {len(items)} items, {users} users and {interactions} interactions "
+          f"to {args.output_dir} in {time.perf_counter() - started_at:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
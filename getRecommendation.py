@@ -1,59 +1,131 @@
-import boto3
 import json
 import random
 import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from datetime import datetime
+from boto3.dynamodb.types import TypeDeserializer
 
-# AWS Clients
-dynamodb = boto3.client('dynamodb')
-s3 = boto3.client('s3')
+from aws_runtime import lazy_client, prewarm_on_init, register_prewarm
+from dataset_cache import get_dataset_preferring_snapshot
+from dynamo_batch import batch_get
+from interaction_log import write_interaction_part
+from metrics import instrumented, stage
+from personalize_engine import RECOMMENDATION_ENGINE, select_personalized_question
+from precomputed_recommendations import is_mid_session, pop_precomputed
+from seen_questions import SEEN_ATTRIBUTE, as_bytes, is_seen, mark_seen
+from topic_mastery import (
+    MASTERY_ATTRIBUTE, nearest_rated, question_rating, sort_by_rating, split_tags, target_difficulty,
+    target_rating, topic_rating
+)
+from user_profile_store import DynamoUserProfileStore
+
+# Independent fetches of a request run in parallel on this pool
+FETCH_WORKERS = 4
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+
+# AWS Clients, created on first use and shared by the fetch threads
+dynamodb = lazy_client('dynamodb')
+s3 = lazy_client('s3')
+profile_store = DynamoUserProfileStore(dynamodb)
+deserializer = TypeDeserializer()
 
 # DynamoDB and S3 details
 USER_STATE_TABLE = "UserQuestionState"
 USERS_DATASET_BUCKET = "realtimerecommendation"
-USERS_DATASET_KEY = "updated_usersmnew.csv"
 QUESTIONS_DATASET_KEY = "updated_items (1).csv"
-INTERACTION_DATASET_KEY = "updated_interactions_with_profiles_and_scores.csv"
+
+DIFFICULTY_LADDER = ["easy", "medium", "hard"]
+
+# Batch mode limits; DynamoDB caps BatchGetItem at 100 keys and BatchWriteItem at 25 items
+DEFAULT_BATCH_QUESTIONS = 5
+MAX_BATCH_QUESTIONS = 20
+MAX_BATCH_USERS = 500
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
 
 
 def fetch_user_preferences(user_id):
-    """Fetch user preferences from the user dataset in S3."""
+    """Fetch user preferences and level from the user profile store."""
     try:
-        response = s3.get_object(Bucket=USERS_DATASET_BUCKET, Key=USERS_DATASET_KEY)
-        content = response['Body'].read().decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(content))
-        for row in csv_reader:
-            if row['user_id'] == str(user_id):
-                return row['preferences'].split(', '), int(row['user_level'])
+        profile = profile_store.get_profile(user_id)
+        if profile:
+            return profile['preferences'], profile['user_level']
     except Exception as e:
         print(f"Error fetching user preferences: {e}")
     return [], 1  # Default to an empty preference list and beginner level.
 
 
+def index_questions(questions, ids_difficulties_and_tags):
+    """Index questions by ITEM_INT_ID, by difficulty and by individual tag, by position.
+
+    Each tag's questions are also kept sorted by rating, for finding the one
+    nearest a user's mastery of that tag.
+    """
+    ids = []
+    ratings = []
+    by_id = {}
+    by_difficulty = {}
+    by_tag = {}
+    for position, (item_id, difficulty, tags) in enumerate(ids_difficulties_and_tags):
+        ids.append(item_id)
+        ratings.append(question_rating(difficulty))
+        by_id[item_id] = position
+        by_difficulty.setdefault(difficulty, set()).add(position)
+        for tag in tags:
+            by_tag.setdefault(tag, set()).add(position)
+    by_tag_rating = {tag: sort_by_rating(positions, ratings) for tag, positions in by_tag.items()}
+    return {
+        'questions': questions, 'ids': ids, 'by_id': by_id, 'by_difficulty': by_difficulty, 'by_tag': by_tag,
+        'by_tag_rating': by_tag_rating,
+    }
+
+
+def build_question_index(content):
+    """Parse the question dataset CSV and index it."""
+    questions = list(csv.DictReader(StringIO(content)))
+    return index_questions(
+        questions,
+        ((question['ITEM_INT_ID'], question['difficulty'].lower(), split_tags(question['tags']))
+         for question in questions)
+    )
+
+
+def build_question_index_from_snapshot(snapshot):
+    """Index the question snapshot using its dictionary codes; rows stay in the memory map."""
+    difficulties = [difficulty.lower() for difficulty in snapshot.dictionary('difficulty')]
+    tag_lists = [split_tags(tags) for tags in snapshot.dictionary('tags')]
+    item_ids = (snapshot.value('ITEM_INT_ID', position) for position in range(len(snapshot)))
+    return index_questions(
+        snapshot,
+        ((item_id, difficulties[difficulty_code], tag_lists[tags_code])
+         for item_id, difficulty_code, tags_code
+         in zip(item_ids, snapshot.codes('difficulty'), snapshot.codes('tags')))
+    )
+
+
+@register_prewarm
 def fetch_questions():
-    """Fetch all questions from the question dataset in S3."""
+    """Fetch the indexed question dataset, from its snapshot when one has been built."""
     try:
-        response = s3.get_object(Bucket=USERS_DATASET_BUCKET, Key=QUESTIONS_DATASET_KEY)
-        content = response['Body'].read().decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(content))
-        return [row for row in csv_reader]
+        return get_dataset_preferring_snapshot(
+            s3, USERS_DATASET_BUCKET, QUESTIONS_DATASET_KEY,
+            snapshot_parser=build_question_index_from_snapshot, parser=build_question_index
+        )
     except Exception as e:
         print(f"Error fetching questions: {e}")
-    return []
+    return build_question_index('')
 
 
-def fetch_user_interaction_history(user_id):
-    """Fetch user interaction history from the S3 dataset."""
+def fetch_user_state(user_id):
+    """Fetch the user's UserQuestionState item as plain values ({} if there is none)."""
     try:
-        response = s3.get_object(Bucket=USERS_DATASET_BUCKET, Key=INTERACTION_DATASET_KEY)
-        content = response['Body'].read().decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(content))
-        interaction_history = [row for row in csv_reader if row['user_id'] == str(user_id)]
-        return interaction_history
+        response = dynamodb.get_item(TableName=USER_STATE_TABLE, Key={"user_id": {"S": str(user_id)}})
+        return {name: deserializer.deserialize(value) for name, value in response.get('Item', {}).items()}
     except Exception as e:
-        print(f"Error fetching interaction history: {e}")
-        return []
+        print(f"Error fetching user state: {e}")
+        return {}
 
 
 def convert_user_profile(profile):
@@ -71,21 +143,231 @@ def calculate_interaction_score(feedback):
         return 0
 
 
-def select_question(user_id, preferences, difficulty, questions):
-    """Select a question based on user preferences, feedback, and difficulty."""
-    filtered_questions = [
-        question for question in questions
-        if question['difficulty'].lower() == difficulty.lower()
-        and any(pref.lower() in question['tags'].lower() for pref in preferences)
-    ]
-    if filtered_questions:
-        return random.choice(filtered_questions)
+def matching_positions(preferences, questions):
+    """Positions of all questions tagged with any of the preferences."""
+    matching_tags = set()
+    for pref in preferences:
+        matching_tags |= questions['by_tag'].get(pref.strip().lower(), set())
+    return matching_tags
+
+
+def unseen_positions(candidates, questions, seen):
+    """Drop positions the user has already been served; O(1) per candidate."""
+    if not seen:
+        return candidates
+    ids = questions['ids']
+    return {position for position in candidates if not is_seen(seen, ids[position])}
+
+
+def select_question(preferences, ratings, user_level, questions, seen=b''):
+    """Select the question whose rating best matches the user's mastery of one of their preferences.
+
+    Each preferred topic is searched for the questions nearest the target rating
+    for the user's rating in it; the closest match over all topics wins, ties
+    broken at random. Questions in the user's seen bitmap are skipped; repeats
+    are only allowed once every matching question has been served.
+    """
+    ids = questions['ids']
+    for accept in (lambda position: not is_seen(seen, ids[position]), lambda position: True):
+        best_distance, best = None, []
+        for pref in preferences:
+            topic = pref.strip().lower()
+            rated = questions['by_tag_rating'].get(topic)
+            if not rated:
+                continue
+            target = target_rating(topic_rating(ratings, topic, user_level))
+            distance, positions = nearest_rated(rated, target, accept)
+            if distance is None or (best_distance is not None and distance > best_distance):
+                continue
+            if best_distance is None or distance < best_distance:
+                best_distance, best = distance, []
+            best.extend(positions)
+        if best:
+            return questions['questions'][random.choice(best)]
     return None
 
 
+def select_questions(preferences, difficulty, questions, count, seen=b''):
+    """Select up to ``count`` distinct questions as (question, difficulty) pairs.
+
+    Questions at the target difficulty rank first; if there are not enough, the
+    list continues up the ladder from there (wrapping back to easy). Unseen
+    questions are used first, and seen ones only to fill what is left.
+    """
+    matching = matching_positions(preferences, questions)
+    start = DIFFICULTY_LADDER.index(difficulty) if difficulty in DIFFICULTY_LADDER else 0
+    selected = []
+    chosen = set()
+    for skip_seen in (True, False):
+        for offset in range(len(DIFFICULTY_LADDER)):
+            if len(selected) >= count:
+                return selected
+            level = DIFFICULTY_LADDER[(start + offset) % len(DIFFICULTY_LADDER)]
+            candidates = (questions['by_difficulty'].get(level, set()) & matching) - chosen
+            if skip_seen:
+                candidates = unseen_positions(candidates, questions, seen)
+            candidates = tuple(candidates)
+            for position in random.sample(candidates, min(count - len(selected), len(candidates))):
+                chosen.add(position)
+                selected.append((questions['questions'][position], level))
+    return selected
+
+
+def build_interaction_entry(user_id, question, difficulty, last_feedback_type, user_level):
+    """Interaction log row for a served question."""
+    return {
+        "user_id": user_id,
+        "item_id": question['ITEM_INT_ID'],
+        "FEEDBACK": last_feedback_type,
+        "timestamp": str(int(datetime.now().timestamp())),
+        "difficulty": difficulty,
+        "topic": question['tags'],
+        "user_profile": convert_user_profile(user_level),
+        "interaction_score": calculate_interaction_score(last_feedback_type)
+    }
+
+
+def fetch_user_state_items(user_ids):
+    """BatchGetItem the users' state items; returns {user_id: low-level item}."""
+    items = {}
+    for start in range(0, len(user_ids), BATCH_GET_SIZE):
+        keys = [{"user_id": {"S": user_id}} for user_id in user_ids[start:start + BATCH_GET_SIZE]]
+        found = batch_get(dynamodb, {USER_STATE_TABLE: {"Keys": keys}})
+        for item in found.get(USER_STATE_TABLE, []):
+            items[item['user_id']['S']] = item
+    return items
+
+
+def session_update(user_id, selected, seen):
+    """update_item arguments serving ``selected`` to a user: the first as current, the rest queued.
+
+    Only the session fields are set, so answer counters and topic ratings
+    written since the state was read are left alone.
+    """
+    (first, first_difficulty), queued = selected[0], selected[1:]
+    return {
+        'TableName': USER_STATE_TABLE,
+        'Key': {"user_id": {"S": str(user_id)}},
+        'UpdateExpression': (
+            "SET current_question = :question, current_difficulty = :difficulty, current_tags = :tags, "
+            "seen_questions = :seen, last_served_at = :now, queued_questions = :queued"
+        ),
+        'ExpressionAttributeValues': {
+            ":question": {"S": first['ITEM_INT_ID']},
+            ":difficulty": {"S": first_difficulty},
+            ":tags": {"S": first['tags']},
+            ":seen": {"B": seen},
+            ":now": {"N": str(int(time.time()))},
+            ":queued": {"L": [
+                {"M": {
+                    "question_id": {"S": question['ITEM_INT_ID']},
+                    "difficulty": {"S": difficulty},
+                    "tags": {"S": question['tags']},
+                }}
+                for question, difficulty in queued
+            ]},
+        },
+    }
+
+
+def recommend_batch(user_ids, count):
+    """Select ``count`` ranked, non-repeating questions for each user in one pass.
+
+    Each user's first question becomes current_question and the rest are
+    queued for StoreUserFeedback to advance through. The session fields are
+    written with one UpdateItem per user, on the fetch pool, since
+    BatchWriteItem can only replace whole items.
+    This is meant for prefetching a session, while the user is not answering.
+    """
+    user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+    with stage("fetch"):
+        profiles_future = fetch_executor.submit(profile_store.get_profiles, user_ids)
+        state_items_future = fetch_executor.submit(fetch_user_state_items, user_ids)
+        questions_future = fetch_executor.submit(fetch_questions)
+        profiles = profiles_future.result()
+        state_items = state_items_future.result()
+        questions = questions_future.result()
+
+    recommendations = {}
+    state_updates = []
+    interaction_entries = []
+    for user_id in user_ids:
+        profile = profiles.get(user_id)
+        if not profile or not profile['preferences']:
+            continue
+        state_item = state_items.get(user_id, {"user_id": {"S": user_id}})
+        user_state = {name: deserializer.deserialize(value) for name, value in state_item.items()}
+        last_feedback_type = user_state.get('last_feedback', "skipped").lower()
+        next_difficulty = target_difficulty(
+            user_state.get(MASTERY_ATTRIBUTE) or {}, profile['preferences'], profile['user_level']
+        )
+
+        seen = as_bytes(user_state.get(SEEN_ATTRIBUTE))
+        with stage("select"):
+            selected = select_questions(profile['preferences'], next_difficulty, questions, count, seen)
+        if not selected:
+            continue
+
+        recommendations[user_id] = [
+            {"question_id": question['ITEM_INT_ID'], "difficulty": difficulty, "tags": question['tags']}
+            for question, difficulty in selected
+        ]
+        for question, _ in selected:
+            seen = mark_seen(seen, question['ITEM_INT_ID'])
+        state_updates.append(session_update(user_id, selected, seen))
+        interaction_entries.extend(
+            build_interaction_entry(user_id, question, difficulty, last_feedback_type, profile['user_level'])
+            for question, difficulty in selected
+        )
+
+    with stage("state_write"):
+        list(fetch_executor.map(lambda request: dynamodb.update_item(**request), state_updates))
+    if interaction_entries:
+        try:
+            with stage("dataset_append"):
+                write_interaction_part(s3, interaction_entries)
+        except Exception as e:
+            print(f"Error appending to interaction log in S3: {e}")
+    return recommendations
+
+
+def handle_batch(event):
+    """Batch mode: {"user_ids": [...], "k": K} returns K questions per user."""
+    user_ids = event.get('user_ids') or []
+    try:
+        count = int(event.get('k', DEFAULT_BATCH_QUESTIONS))
+    except (TypeError, ValueError):
+        count = None
+    if not user_ids or len(user_ids) > MAX_BATCH_USERS or count is None or not 0 < count <= MAX_BATCH_QUESTIONS:
+        return {
+            "statusCode": 400,
+            "body": json.dumps({
+                "message": f"Batch requests need 1-{MAX_BATCH_USERS} user_ids and k between 1 and {MAX_BATCH_QUESTIONS}"
+            })
+        }
+
+    try:
+        recommendations = recommend_batch(user_ids, count)
+    except Exception as e:
+        print(f"Error building batch recommendations: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": "Failed to build batch recommendations"})
+        }
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "recommendations": recommendations,
+            "missing": [str(user_id) for user_id in user_ids if str(user_id) not in recommendations]
+        })
+    }
+
+
+@instrumented
 def lambda_handler(event, context):
-    # Log the entire event object for debugging
-    print("Received event:", json.dumps(event, indent=2))
+    if 'user_ids' in event:
+        return handle_batch(event)
 
     # Fetch user_id from the event
     user_id = event.get('user_id') or event.get('queryStringParameters', {}).get('user_id')
@@ -95,9 +377,13 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": "Missing or invalid user_id in request"})
         }
 
-    # Step 1: Fetch user preferences and interaction history
-    preferences, user_level = fetch_user_preferences(user_id)
-    interaction_history = fetch_user_interaction_history(user_id)
+    # Step 1: Fetch user preferences, the user's question state and the questions in
+    # parallel; none depends on another, so the wait is the slowest of the three
+    with stage("fetch"):
+        preferences_future = fetch_executor.submit(fetch_user_preferences, user_id)
+        user_state_future = fetch_executor.submit(fetch_user_state, user_id)
+        questions_future = fetch_executor.submit(fetch_questions)
+        preferences, user_level = preferences_future.result()
 
     if not preferences:
         return {
@@ -105,26 +391,36 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": f"No preferences found for user_id: {user_id}"})
         }
 
-    # Step 2: Determine difficulty level based on the last feedback
-    last_feedback = interaction_history[-1] if interaction_history else {}
-    last_feedback_type = last_feedback.get('FEEDBACK', "skipped").lower()
-    last_difficulty = last_feedback.get('difficulty', 'easy').lower()
-
-    if last_feedback_type == "correct":
-        if last_difficulty == "easy":
-            next_difficulty = "medium"
-        elif last_difficulty == "medium":
-            next_difficulty = "hard"
-        else:
-            next_difficulty = "easy"
-    elif last_feedback_type == "incorrect":
-        next_difficulty = "easy"
-    else:
-        next_difficulty = "easy"
+    # Step 2: Target a difficulty from the user's per-topic mastery ratings
+    with stage("fetch"):
+        user_state = user_state_future.result()
+    last_feedback_type = user_state.get('last_feedback', "skipped").lower()
+    ratings = user_state.get(MASTERY_ATTRIBUTE) or {}
+    next_difficulty = target_difficulty(ratings, preferences, user_level)
+    seen = as_bytes(user_state.get(SEEN_ATTRIBUTE))
+    engine = event.get('engine', RECOMMENDATION_ENGINE)
 
-    # Step 3: Fetch all questions and select one
-    questions = fetch_questions()
-    question = select_question(user_id, preferences, next_difficulty, questions)
+    # Step 3: Users starting a session are served the head of their precomputed
+    # list for this tier, skipping selection (and the wait for the questions)
+    question = None
+    if engine != "personalize" and not is_mid_session(user_state):
+        with stage("precomputed"):
+            popped = pop_precomputed(dynamodb, user_id, next_difficulty, preferences, user_level)
+        if popped and not is_seen(seen, popped[0]['ITEM_INT_ID']):
+            question, next_difficulty = popped
+
+    # Otherwise select a question, from the campaign if that engine is chosen and
+    # answers in time, otherwise the one best matching the user's mastery
+    if not question:
+        with stage("fetch"):
+            questions = questions_future.result()
+        with stage("select"):
+            if engine == "personalize":
+                question = select_personalized_question(user_id, next_difficulty, questions, seen)
+            if not question:
+                question = select_question(preferences, ratings, user_level, questions, seen)
+                if question:
+                    next_difficulty = question['difficulty'].lower()
 
     if not question:
         return {
@@ -134,13 +430,24 @@ def lambda_handler(event, context):
 
     # Step 4: Update UserQuestionState in DynamoDB
     try:
-        dynamodb.put_item(
-            TableName=USER_STATE_TABLE,
-            Item={
-                "user_id": {"S": str(user_id)},
-                "current_question": {"S": question['ITEM_INT_ID']}
-            }
-        )
+        # update_item rather than put_item so the answer counters and profile survive;
+        # a single recommendation also replaces any queue left by a batch prefetch
+        with stage("state_write"):
+            dynamodb.update_item(
+                TableName=USER_STATE_TABLE,
+                Key={"user_id": {"S": str(user_id)}},
+                UpdateExpression=(
+                    "SET current_question = :question, current_difficulty = :difficulty, current_tags = :tags, "
+                    "seen_questions = :seen, last_served_at = :now REMOVE queued_questions"
+                ),
+                ExpressionAttributeValues={
+                    ":question": {"S": question['ITEM_INT_ID']},
+                    ":difficulty": {"S": next_difficulty},
+                    ":tags": {"S": question['tags']},
+                    ":seen": {"B": mark_seen(seen, question['ITEM_INT_ID'])},
+                    ":now": {"N": str(int(time.time()))}
+                }
+            )
     except Exception as e:
         print(f"Error updating user state in DynamoDB: {e}")
         return {
@@ -148,41 +455,13 @@ def lambda_handler(event, context):
             "body": json.dumps({"message": "Failed to update user state in DynamoDB"})
         }
 
-    # Step 5: Append the interaction to the interaction dataset in S3
+    # Step 5: Append the interaction to the interaction log in S3
     try:
-        # Fetch existing interactions
-        response = s3.get_object(Bucket=USERS_DATASET_BUCKET, Key=INTERACTION_DATASET_KEY)
-        content = response['Body'].read().decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(content))
-        existing_data = list(csv_reader)
-
-        # Prepare the new entry
-        new_entry = {
-            "user_id": user_id,
-            "item_id": question['ITEM_INT_ID'],
-            "FEEDBACK": last_feedback_type,
-            "timestamp": str(int(datetime.now().timestamp())),
-            "difficulty": next_difficulty,
-            "topic": question['tags'],
-            "user_profile": convert_user_profile(user_level),
-            "interaction_score": calculate_interaction_score(last_feedback_type)
-        }
-
-        # Append new interaction to existing data
-        existing_data.append(new_entry)
-
-        # Save back to S3
-        updated_csv = StringIO()
-        csv_writer = csv.DictWriter(updated_csv, fieldnames=existing_data[0].keys())
-        csv_writer.writeheader()
-        csv_writer.writerows(existing_data)
-        s3.put_object(
-            Bucket=USERS_DATASET_BUCKET,
-            Key=INTERACTION_DATASET_KEY,
-            Body=updated_csv.getvalue()
-        )
+        new_entry = build_interaction_entry(user_id, question, next_difficulty, last_feedback_type, user_level)
+        with stage("dataset_append"):
+            write_interaction_part(s3, [new_entry])
     except Exception as e:
-        print(f"Error updating interaction dataset in S3: {e}")
+        print(f"Error appending to interaction log in S3: {e}")
 
     # Step 6: Return the selected question
     return {
@@ -193,3 +472,6 @@ def lambda_handler(event, context):
             "tags": question['tags']
         })
     }
+
+
+prewarm_on_init()
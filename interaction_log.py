@@ -0,0 +1,109 @@
+import csv
+import time
+import uuid
+from io import StringIO
+
+from s3_stream_writer import MultipartWriter, open_object
+
+# Consolidated interactions dataset imported by Personalize, and the prefix that
+# holds the small append-only part objects waiting to be merged into it.
+INTERACTIONS_BUCKET = "realtimerecommendation"
+INTERACTION_DATASET_KEY = "updated_interactions_with_profiles_and_scores.csv"
+INTERACTION_PARTS_PREFIX = "interaction-parts/"
+
+INTERACTION_FIELDS = [
+    "user_id", "item_id", "FEEDBACK", "timestamp",
+    "difficulty", "topic", "user_profile", "interaction_score",
+]
+
+# S3 DeleteObjects accepts at most 1000 keys per call.
+DELETE_BATCH_SIZE = 1000
+
+
+def rows_to_csv(rows, fieldnames=INTERACTION_FIELDS):
+    """Serialize interaction rows to CSV text with a header line."""
+    output = StringIO()
+    csv_writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+    csv_writer.writeheader()
+    csv_writer.writerows(rows)
+    return output.getvalue()
+
+
+def write_interaction_part(s3, rows, part_name=None):
+    """Append interactions as a new part object; generated keys sort in arrival order.
+
+    Passing a deterministic ``part_name`` makes the write idempotent: a retried
+    batch overwrites its own part instead of adding a duplicate.
+    """
+    part_name = part_name or f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex}.csv"
+    key = f"{INTERACTION_PARTS_PREFIX}{part_name}"
+    s3.put_object(Bucket=INTERACTIONS_BUCKET, Key=key, Body=rows_to_csv(rows))
+    return key
+
+
+def list_interaction_parts(s3, limit=None):
+    """List pending part keys, oldest first."""
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=INTERACTIONS_BUCKET, Prefix=INTERACTION_PARTS_PREFIX):
+        for obj in page.get('Contents', []):
+            keys.append(obj['Key'])
+            if limit and len(keys) >= limit:
+                return keys
+    return keys
+
+
+def read_interaction_part(s3, key):
+    """Read the rows of a single part object."""
+    response = s3.get_object(Bucket=INTERACTIONS_BUCKET, Key=key)
+    content = response['Body'].read().decode('utf-8')
+    return list(csv.DictReader(StringIO(content)))
+
+
+def compact_interactions(s3, max_parts=None):
+    """Merge pending parts into the consolidated dataset and delete them.
+
+    Parts are only deleted after the merged dataset has been written, so a
+    failure part-way through leaves them in place for the next run. The
+    rewrite is conditional on the ETag of the dataset that was read, so if
+    another writer replaced it meanwhile this run fails with PreconditionFailed
+    rather than dropping that writer's rows. Returns the number of parts merged.
+    """
+    part_keys = list_interaction_parts(s3, limit=max_parts)
+    if not part_keys:
+        return 0
+
+    # Stream the existing dataset into a new upload of the same key, then append
+    # the parts' rows at the end, so memory stays at about one multipart part.
+    etag, chunks = open_object(s3, INTERACTIONS_BUCKET, INTERACTION_DATASET_KEY)
+    conditions = {'if_match': etag} if etag else {'if_none_match': '*'}
+    with MultipartWriter(s3, INTERACTIONS_BUCKET, INTERACTION_DATASET_KEY, **conditions) as writer:
+        header = b''
+        last_byte = b''
+        for chunk in chunks:
+            if b'\n' not in header:
+                header += chunk
+            writer.write(chunk)
+            last_byte = chunk[-1:]
+
+        if header:
+            fieldnames = next(csv.reader([header.split(b'\n', 1)[0].decode('utf-8')]))
+            if last_byte != b'\n':
+                writer.write(b'\n')
+        else:
+            fieldnames = INTERACTION_FIELDS
+            writer.write(rows_to_csv([]).encode('utf-8'))
+
+        for key in part_keys:
+            output = StringIO()
+            csv_writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+            csv_writer.writerows(read_interaction_part(s3, key))
+            writer.write(output.getvalue().encode('utf-8'))
+
+    for start in range(0, len(part_keys), DELETE_BATCH_SIZE):
+        batch = part_keys[start:start + DELETE_BATCH_SIZE]
+        s3.delete_objects(
+            Bucket=INTERACTIONS_BUCKET,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+    return len(part_keys)
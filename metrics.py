@@ -0,0 +1,150 @@
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Handler metrics are printed as CloudWatch Embedded Metric Format records, which
+# CloudWatch Logs turns into metrics without any extra API calls.
+METRICS_NAMESPACE = "DiscoveryService"
+
+# Share of warm, successful invocations that emit a record. Cold starts and
+# errors are always emitted; each record carries the rate it was sampled at.
+METRICS_SAMPLE_RATE = 0.1
+
+_cold_start = True
+_current = None  # InvocationMetrics of the invocation in progress
+
+
+class InvocationMetrics:
+    """Stage timings and AWS call counts collected during one invocation."""
+
+    def __init__(self, handler_name):
+        self.handler_name = handler_name
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self.calls = {}
+        self._lock = threading.Lock()  # Calls are also recorded from fetch threads
+
+    def add_stage(self, name, milliseconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + milliseconds
+
+    def add_call(self, service, bytes_received):
+        with self._lock:
+            calls, sent, received = self.calls.get(service, (0, 0, 0))
+            self.calls[service] = (calls + 1, sent, received + bytes_received)
+
+    def add_bytes_sent(self, service, bytes_sent):
+        with self._lock:
+            calls, sent, received = self.calls.get(service, (0, 0, 0))
+            self.calls[service] = (calls, sent + bytes_sent, received)
+
+    def to_emf(self, status_code, cold_start, sample_rate):
+        """The invocation as one EMF log record."""
+        values = {'duration_ms': round((time.perf_counter() - self.started_at) * 1000, 3)}
+        units = {'duration_ms': "Milliseconds"}
+        for name, milliseconds in self.stages.items():
+            values[f"{name}_ms"] = round(milliseconds, 3)
+            units[f"{name}_ms"] = "Milliseconds"
+        for service, (calls, sent, received) in self.calls.items():
+            values[f"{service}_calls"] = calls
+            values[f"{service}_bytes_sent"] = sent
+            values[f"{service}_bytes_received"] = received
+            units[f"{service}_calls"] = "Count"
+            units[f"{service}_bytes_sent"] = "Bytes"
+            units[f"{service}_bytes_received"] = "Bytes"
+        values['cold_start'] = int(cold_start)
+        units['cold_start'] = "Count"
+
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [["Handler"]],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, unit in units.items()]
+                }]
+            },
+            'Handler': self.handler_name,
+            'StatusCode': status_code,
+            'SampleRate': sample_rate,
+        }
+        record.update(values)
+        return record
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current invocation; a no-op outside one."""
+    metrics = _current
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_stage(name, (time.perf_counter() - started_at) * 1000)
+
+
+def _content_length(headers):
+    """Body size from the headers; aws-chunked uploads only carry the decoded length."""
+    try:
+        return int(headers.get('Content-Length') or headers.get('X-Amz-Decoded-Content-Length') or 0)
+    except (AttributeError, ValueError):
+        return 0
+
+
+def _record_request(request=None, event_name='', **kwargs):
+    """before-send hook: count the request body bytes (retries included, as they are sent too)."""
+    metrics = _current
+    if metrics is not None and request is not None:
+        metrics.add_bytes_sent(event_name.split('.')[1], _content_length(request.headers))
+
+
+def _record_response(http_response=None, model=None, event_name='', **kwargs):
+    """after-call hook: count the call and its response bytes.
+
+    Streaming bodies (S3 GetObject) are not read yet, so they are counted by
+    their Content-Length; other bodies have already been read in full.
+    """
+    metrics = _current
+    if metrics is None or http_response is None:
+        return
+    bytes_received = _content_length(http_response.headers)
+    if not bytes_received and model is not None and not model.has_streaming_output:
+        bytes_received = len(http_response.content or b'')
+    metrics.add_call(event_name.split('.')[1], bytes_received)
+
+
+def instrument_client(client):
+    """Count a boto3 client's calls and bytes against the current invocation."""
+    client.meta.events.register('before-send', _record_request)
+    client.meta.events.register('after-call', _record_response)
+    return client
+
+
+def instrumented(handler):
+    """Wrap a lambda_handler to time it and emit its metrics as an EMF record."""
+    handler_name = handler.__module__
+
+    @wraps(handler)
+    def wrapper(event, context):
+        global _cold_start, _current
+        cold_start, _cold_start = _cold_start, False
+        _current = metrics = InvocationMetrics(handler_name)
+        status_code = 500
+        try:
+            response = handler(event, context)
+            if isinstance(response, dict):
+                status_code = response.get('statusCode', 200)
+            else:
+                status_code = 200
+            return response
+        finally:
+            _current = None
+            if cold_start or status_code >= 500 or random.random() < METRICS_SAMPLE_RATE:
+                sample_rate = 1.0 if cold_start or status_code >= 500 else METRICS_SAMPLE_RATE
+                print(json.dumps(metrics.to_emf(status_code, cold_start, sample_rate)))
+
+    return wrapper
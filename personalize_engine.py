@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.config import Config
+
+from aws_runtime import get_client, set_client
+from seen_questions import is_seen
+
+# Campaign created by personlize_training.py
+CAMPAIGN_ARN = "arn:aws:personalize:<region>:<account-id>:campaign/DiscoveryServiceCampaign"
+
+# Engine getRecommendation uses unless the request names one: "rules" or "personalize"
+RECOMMENDATION_ENGINE = "rules"
+
+# Total time a request may wait on Personalize before falling back to the rules engine
+PERSONALIZE_TIMEOUT_SECONDS = 0.2
+NUM_RESULTS = 25
+
+# A user's ranked list is reused for this long; served items are removed from it.
+# At most RESULT_CACHE_MAX_USERS lists are kept, least recently used dropped first.
+RESULT_CACHE_TTL_SECONDS = 300
+RESULT_CACHE_MAX_USERS = 10000
+
+# No retries and short socket timeouts; the fallback is cheaper than waiting
+RUNTIME_CONFIG = Config(connect_timeout=1, read_timeout=1, retries={'max_attempts': 1})
+
+_executor = ThreadPoolExecutor(max_workers=4)
+_result_cache = OrderedDict()  # user_id -> (expires_at, [item_id, ...]), oldest first
+
+
+def get_runtime():
+    """The shared personalize-runtime client, created on first use."""
+    return get_client('personalize-runtime', RUNTIME_CONFIG)
+
+
+def set_runtime(runtime):
+    """Swap the runtime client, e.g. for StubPersonalizeRuntime in offline tests."""
+    set_client('personalize-runtime', runtime)
+    _result_cache.clear()
+
+
+class StubPersonalizeRuntime:
+    """Offline stand-in for the personalize-runtime client.
+
+    Returns the configured item ids per user, optionally after ``delay``
+    seconds or by raising ``error``, to exercise the cache and fallback paths.
+    """
+
+    def __init__(self, recommendations=None, delay=0.0, error=None):
+        self.recommendations = recommendations or {}
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def get_recommendations(self, campaignArn, userId, numResults=NUM_RESULTS, **kwargs):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        item_ids = self.recommendations.get(userId, [])[:numResults]
+        return {'itemList': [{'itemId': item_id} for item_id in item_ids]}
+
+
+def fetch_recommended_item_ids(user_id):
+    """Return the user's ranked item ids from the cache or from the campaign.
+
+    Raises if Personalize fails or does not answer within the timeout budget.
+    """
+    now = time.time()
+    cached = _result_cache.pop(user_id, None)
+    if cached and cached[0] > now and cached[1]:
+        _result_cache[user_id] = cached
+        return cached[1]
+
+    future = _executor.submit(
+        get_runtime().get_recommendations,
+        campaignArn=CAMPAIGN_ARN, userId=str(user_id), numResults=NUM_RESULTS
+    )
+    response = future.result(timeout=PERSONALIZE_TIMEOUT_SECONDS)
+    item_ids = [item['itemId'] for item in response.get('itemList', [])]
+    if item_ids:
+        _result_cache[user_id] = (now + RESULT_CACHE_TTL_SECONDS, item_ids)
+        while len(_result_cache) > RESULT_CACHE_MAX_USERS:
+            _result_cache.popitem(last=False)
+    return item_ids
+
+
+def select_personalized_question(user_id, difficulty, questions, seen=b''):
+    """Pick the best-ranked unseen campaign item at the target difficulty, or None.
+
+    Any Personalize error or timeout is logged and returns None, so the caller
+    can fall back to the rules engine.
+    """
+    try:
+        item_ids = fetch_recommended_item_ids(user_id)
+    except Exception as e:
+        print(f"Personalize unavailable, falling back to rules: {e!r}")
+        return None
+
+    candidates = questions['by_difficulty'].get(difficulty.lower(), set())
+    for item_id in item_ids:
+        position = questions['by_id'].get(item_id)
+        if position is not None and position in candidates and not is_seen(seen, item_id):
+            item_ids.remove(item_id)  # Served; do not offer it again from the cached list
+            if not item_ids:
+                _result_cache.pop(user_id, None)
+            return questions['questions'][position]
+    return None
@@ -0,0 +1,376 @@
+import argparse
+import json
+import os
+import time
+import uuid
+
+import boto3
+from botocore.exceptions import ClientError
+
+# Replace with your account's ARNs and role
+DATASET_GROUP_ARN = "arn:aws:personalize:<region>:<account-id>:dataset-group/DiscoveryServiceGroup"
+RECIPE_ARN = "arn:aws:personalize:::recipe/aws-user-personalization"
+ROLE_ARN = "arn:aws:iam::<your-account-id>:role/<your-role-name>"
+S3_BUCKET_NAME = "realtimerecommendation"
+
+SOLUTION_NAME = "DiscoveryServiceSolution"
+CAMPAIGN_NAME = "DiscoveryServiceCampaign"
+
+# Pipeline stages and what each waits for. Imports are independent and are
+# submitted together; training needs all three datasets and the solution.
+STAGES = {
+    "import_interactions": {
+        "kind": "import", "depends_on": [],
+        "dataset_arn": "arn:aws:personalize:<region>:<account-id>:dataset/InteractionsDataset",
+        "data_location": f"s3://{S3_BUCKET_NAME}/updated_interactions_with_profiles_and_scores.csv",
+    },
+    "import_items": {
+        "kind": "import", "depends_on": [],
+        "dataset_arn": "arn:aws:personalize:<region>:<account-id>:dataset/ItemsDataset",
+        "data_location": f"s3://{S3_BUCKET_NAME}/updated_items (1).csv",
+    },
+    "import_users": {
+        "kind": "import", "depends_on": [],
+        "dataset_arn": "arn:aws:personalize:<region>:<account-id>:dataset/UsersDataset",
+        "data_location": f"s3://{S3_BUCKET_NAME}/updated_usersmnew.csv",
+    },
+    "solution": {"kind": "solution", "depends_on": []},
+    "solution_version": {
+        "kind": "solution_version",
+        "depends_on": ["solution", "import_interactions", "import_items", "import_users"],
+    },
+    "campaign": {"kind": "campaign", "depends_on": ["solution_version"]},
+}
+IMPORT_STAGES = ["import_interactions", "import_items", "import_users"]
+TRAINING_STAGES = ["solution", "solution_version", "campaign"]
+
+# Progress is saved here after every submission and status change, so a
+# crashed run resumes by polling what it already started.
+CHECKPOINT_PATH = "personalize_pipeline_state.json"
+
+# Status polling backs off from the first delay to the maximum while nothing changes.
+POLL_INITIAL_SECONDS = 5
+POLL_MAX_SECONDS = 60
+PIPELINE_TIMEOUT_SECONDS = 6 * 3600
+
+# Names tried per stage before giving up; a FAILED resource keeps its name, so
+# every retry is created under the next suffix.
+MAX_NAME_ATTEMPTS = 10
+
+
+class PipelineError(Exception):
+    """A stage failed or the pipeline ran out of time."""
+
+
+def _is_already_exists(error):
+    return error.response['Error']['Code'] == 'ResourceAlreadyExistsException'
+
+
+def _attempt_name(base_name, attempt):
+    return base_name if attempt == 0 else f"{base_name}-retry{attempt}"
+
+
+def _create_or_find(create, list_existing, base_name, attempt):
+    """Create a named resource, or reuse one of that name that has not FAILED.
+
+    A name already taken by a FAILED resource moves on to the next attempt's
+    name. Returns (arn, attempt used).
+    """
+    for attempt in range(attempt, attempt + MAX_NAME_ATTEMPTS):
+        name = _attempt_name(base_name, attempt)
+        try:
+            return create(name), attempt
+        except ClientError as e:
+            if not _is_already_exists(e):
+                raise
+        # Created just before a crash, or by an earlier run
+        for arn, existing_name, status in list_existing():
+            if existing_name == name and not (status or '').endswith('FAILED'):
+                return arn, attempt
+    raise PipelineError(f"No usable name for {base_name} after {MAX_NAME_ATTEMPTS} attempts")
+
+
+def submit_import(client, name, stage, arns, run_id, attempt):
+    def create(job_name):
+        return client.create_dataset_import_job(
+            jobName=job_name,
+            datasetArn=stage['dataset_arn'],
+            dataSource={"dataLocation": stage['data_location']},
+            roleArn=ROLE_ARN
+        )['datasetImportJobArn']
+
+    def list_existing():
+        jobs = client.list_dataset_import_jobs(datasetArn=stage['dataset_arn'])['datasetImportJobs']
+        return [(job['datasetImportJobArn'], job['jobName'], job.get('status')) for job in jobs]
+
+    return _create_or_find(create, list_existing, f"{name}-{run_id}", attempt)
+
+
+def submit_solution(client, name, stage, arns, run_id, attempt):
+    def create(solution_name):
+        return client.create_solution(
+            name=solution_name, datasetGroupArn=DATASET_GROUP_ARN, recipeArn=RECIPE_ARN
+        )['solutionArn']
+
+    def list_existing():
+        solutions = client.list_solutions(datasetGroupArn=DATASET_GROUP_ARN)['solutions']
+        return [(solution['solutionArn'], solution['name'], solution.get('status')) for solution in solutions]
+
+    # Retraining reuses the existing solution
+    return _create_or_find(create, list_existing, SOLUTION_NAME, attempt)
+
+
+def submit_solution_version(client, name, stage, arns, run_id, attempt):
+    return client.create_solution_version(solutionArn=arns['solution'])['solutionVersionArn'], attempt
+
+
+def submit_campaign(client, name, stage, arns, run_id, attempt):
+    try:
+        return client.create_campaign(
+            name=CAMPAIGN_NAME, solutionVersionArn=arns['solution_version'], minProvisionedTPS=1
+        )['campaignArn'], attempt
+    except ClientError as e:
+        if not _is_already_exists(e):
+            raise
+        # Point the live campaign at the new solution version
+        campaigns = client.list_campaigns(solutionArn=arns['solution'])['campaigns']
+        campaign_arn = next(campaign['campaignArn'] for campaign in campaigns if campaign['name'] == CAMPAIGN_NAME)
+        client.update_campaign(campaignArn=campaign_arn, solutionVersionArn=arns['solution_version'])
+        return campaign_arn, attempt
+
+
+def describe_import(client, arn):
+    job = client.describe_dataset_import_job(datasetImportJobArn=arn)['datasetImportJob']
+    return job['status'], job.get('failureReason')
+
+
+def describe_solution(client, arn):
+    solution = client.describe_solution(solutionArn=arn)['solution']
+    return solution['status'], solution.get('failureReason')
+
+
+def describe_solution_version(client, arn):
+    version = client.describe_solution_version(solutionVersionArn=arn)['solutionVersion']
+    return version['status'], version.get('failureReason')
+
+
+def describe_campaign(client, arn):
+    campaign = client.describe_campaign(campaignArn=arn)['campaign']
+    update = campaign.get('latestCampaignUpdate')
+    if update:
+        return update['status'], update.get('failureReason')
+    return campaign['status'], campaign.get('failureReason')
+
+
+STAGE_KINDS = {
+    "import": (submit_import, describe_import),
+    "solution": (submit_solution, describe_solution),
+    "solution_version": (submit_solution_version, describe_solution_version),
+    "campaign": (submit_campaign, describe_campaign),
+}
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically so a crash mid-write cannot corrupt it."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temporary, path)
+
+
+def start_or_resume(path, stage_names):
+    """Resume the checkpointed run unless every requested stage in it is already ACTIVE.
+
+    Failed stages are dropped from a resumed run so they are submitted again,
+    under the next attempt's name.
+    """
+    checkpoint = load_checkpoint(path)
+    if checkpoint and not all(
+        checkpoint['stages'].get(name, {}).get('status') == 'ACTIVE' for name in stage_names
+    ):
+        attempts = checkpoint.setdefault('attempts', {})
+        for name, state in list(checkpoint['stages'].items()):
+            if state['status'].endswith('FAILED'):
+                attempts[name] = state.get('attempt', 0) + 1
+                del checkpoint['stages'][name]
+        return checkpoint
+    return {'run_id': time.strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:6], 'stages': {}, 'attempts': {}}
+
+
+def run_pipeline(client, stage_names=None, checkpoint_path=CHECKPOINT_PATH, sleep=time.sleep,
+                 poll_initial=POLL_INITIAL_SECONDS, poll_max=POLL_MAX_SECONDS,
+                 timeout=PIPELINE_TIMEOUT_SECONDS):
+    """Run the requested stages, each as soon as its dependencies are ACTIVE.
+
+    Dependencies outside ``stage_names`` count as met unless this run's
+    checkpoint says otherwise. Returns {stage: arn}; raises PipelineError if a
+    stage fails or the timeout passes.
+    """
+    stage_names = list(stage_names or STAGES)
+    checkpoint = start_or_resume(checkpoint_path, stage_names)
+    stages = checkpoint['stages']
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    def is_met(name):
+        if name in stages:
+            return stages[name]['status'] == 'ACTIVE'
+        return name not in stage_names
+
+    deadline = time.time() + timeout
+    delay = poll_initial
+    while True:
+        progressed = False
+
+        # Submit every stage whose dependencies are ACTIVE
+        for name in stage_names:
+            stage = STAGES[name]
+            if name in stages or not all(is_met(dependency) for dependency in stage['depends_on']):
+                continue
+            submit, _ = STAGE_KINDS[stage['kind']]
+            arns = {other: state['arn'] for other, state in stages.items()}
+            arn, attempt = submit(client, name, stage, arns, checkpoint['run_id'], checkpoint['attempts'].get(name, 0))
+            stages[name] = {'arn': arn, 'status': 'SUBMITTED', 'attempt': attempt}
+            save_checkpoint(checkpoint_path, checkpoint)
+            print(f"Submitted {name}: {arn}")
+            progressed = True
+
+        # Poll the ones still in flight
+        for name in stage_names:
+            state = stages.get(name)
+            if not state or state['status'] == 'ACTIVE':
+                continue
+            _, describe = STAGE_KINDS[STAGES[name]['kind']]
+            status, failure_reason = describe(client, state['arn'])
+            if status != state['status']:
+                state['status'] = status
+                save_checkpoint(checkpoint_path, checkpoint)
+                print(f"{name}: {status}")
+                progressed = True
+            if status.endswith('FAILED'):
+                raise PipelineError(f"{name} failed: {failure_reason or status}")
+
+        if all(stages.get(name, {}).get('status') == 'ACTIVE' for name in stage_names):
+            return {name: stages[name]['arn'] for name in stage_names}
+        if time.time() > deadline:
+            raise PipelineError(f"Timed out waiting for {', '.join(n for n in stage_names if not is_met(n))}")
+        delay = poll_initial if progressed else min(delay * 2, poll_max)
+        sleep(delay)
+
+
+class StubPersonalizeClient:
+    """Offline stand-in for the personalize client used by run_pipeline.
+
+    Every resource turns ACTIVE after ``polls_until_active`` describe calls;
+    resources created while their kind or import stage name is listed in
+    ``fail`` end in CREATE FAILED instead, and stay FAILED. Named resources
+    raise ResourceAlreadyExistsException when created twice, like the service.
+    """
+
+    def __init__(self, polls_until_active=2, fail=()):
+        self.polls_until_active = polls_until_active
+        self.fail = set(fail)
+        self.resources = {}  # arn -> {'name', 'kind', 'polls', ...}
+        self.calls = []
+
+    def _create(self, kind, name, **attributes):
+        self.calls.append(f"create_{kind}")
+        if name is not None and any(
+            resource['kind'] == kind and resource['name'] == name for resource in self.resources.values()
+        ):
+            raise ClientError(
+                {'Error': {'Code': 'ResourceAlreadyExistsException', 'Message': f"{name} exists"}},
+                f"Create{kind}"
+            )
+        arn = f"arn:aws:personalize:stub:000000000000:{kind}/{name or uuid.uuid4().hex[:8]}"
+        fails = kind in self.fail or (name or '').split('-')[0] in self.fail
+        self.resources[arn] = dict(attributes, name=name, kind=kind, polls=0, fails=fails, status='CREATE PENDING')
+        return arn
+
+    def _status(self, kind, arn):
+        self.calls.append(f"describe_{kind}")
+        resource = self.resources[arn]
+        resource['polls'] += 1
+        if resource['polls'] < self.polls_until_active:
+            resource['status'] = 'CREATE IN_PROGRESS'
+            return {'status': resource['status']}
+        if resource['fails']:
+            resource['status'] = 'CREATE FAILED'
+            return {'status': resource['status'], 'failureReason': f"stub failure for {kind}"}
+        resource['status'] = 'ACTIVE'
+        return {'status': resource['status']}
+
+    def create_dataset_import_job(self, jobName, datasetArn, dataSource, roleArn, **kwargs):
+        return {'datasetImportJobArn': self._create('dataset_import_job', jobName, datasetArn=datasetArn)}
+
+    def list_dataset_import_jobs(self, datasetArn, **kwargs):
+        return {'datasetImportJobs': [
+            {'jobName': resource['name'], 'datasetImportJobArn': arn, 'status': resource['status']}
+            for arn, resource in self.resources.items()
+            if resource['kind'] == 'dataset_import_job' and resource['datasetArn'] == datasetArn
+        ]}
+
+    def describe_dataset_import_job(self, datasetImportJobArn):
+        return {'datasetImportJob': self._status('dataset_import_job', datasetImportJobArn)}
+
+    def create_solution(self, name, datasetGroupArn, recipeArn, **kwargs):
+        return {'solutionArn': self._create('solution', name)}
+
+    def list_solutions(self, datasetGroupArn=None, **kwargs):
+        return {'solutions': [
+            {'name': resource['name'], 'solutionArn': arn, 'status': resource['status']}
+            for arn, resource in self.resources.items() if resource['kind'] == 'solution'
+        ]}
+
+    def describe_solution(self, solutionArn):
+        return {'solution': self._status('solution', solutionArn)}
+
+    def create_solution_version(self, solutionArn, **kwargs):
+        return {'solutionVersionArn': self._create('solution_version', None, solutionArn=solutionArn)}
+
+    def describe_solution_version(self, solutionVersionArn):
+        return {'solutionVersion': self._status('solution_version', solutionVersionArn)}
+
+    def create_campaign(self, name, solutionVersionArn, **kwargs):
+        return {'campaignArn': self._create('campaign', name)}
+
+    def list_campaigns(self, solutionArn=None, **kwargs):
+        return {'campaigns': [
+            {'name': resource['name'], 'campaignArn': arn}
+            for arn, resource in self.resources.items() if resource['kind'] == 'campaign'
+        ]}
+
+    def update_campaign(self, campaignArn, solutionVersionArn, **kwargs):
+        self.calls.append("update_campaign")
+        self.resources[campaignArn]['polls'] = 0
+        return {'campaignArn': campaignArn}
+
+    def describe_campaign(self, campaignArn):
+        return {'campaign': self._status('campaign', campaignArn)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import datasets and train the Personalize campaign.")
+    parser.add_argument('--stages', default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--offline', action='store_true', help="run against StubPersonalizeClient")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        client, sleep = StubPersonalizeClient(), lambda seconds: None
+    else:
+        client, sleep = boto3.client('personalize'), time.sleep
+    arns = run_pipeline(client, args.stages.split(','), checkpoint_path=args.checkpoint, sleep=sleep)
+    for name, arn in arns.items():
+        print(f"{name}: {arn}")
+    return arns
+
+
+if __name__ == "__main__":
+    main()
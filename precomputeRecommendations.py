@@ -0,0 +1,100 @@
+import json
+
+from aws_runtime import lazy_client
+from dynamo_batch import batch_get, batch_write
+from getRecommendation import (
+    BATCH_GET_SIZE, BATCH_WRITE_SIZE, deserializer, fetch_questions, fetch_user_state_items, select_questions
+)
+from metrics import instrumented, stage
+from precomputed_recommendations import (
+    PRECOMPUTED_PER_TIER, PRECOMPUTED_TABLE, PRECOMPUTED_TIERS, needs_refresh, precomputed_item
+)
+from seen_questions import SEEN_ATTRIBUTE, as_bytes
+from user_profile_store import DynamoUserProfileStore
+
+# AWS Clients
+dynamodb = lazy_client('dynamodb')
+profile_store = DynamoUserProfileStore(dynamodb)
+
+
+def fetch_precomputed_items(user_ids):
+    """BatchGetItem the users' precomputed items; returns {user_id: low-level item}."""
+    items = {}
+    for start in range(0, len(user_ids), BATCH_GET_SIZE):
+        keys = [{"user_id": {"S": user_id}} for user_id in user_ids[start:start + BATCH_GET_SIZE]]
+        for item in batch_get(dynamodb, {PRECOMPUTED_TABLE: {"Keys": keys}}).get(PRECOMPUTED_TABLE, []):
+            items[item['user_id']['S']] = item
+    return items
+
+
+def write_precomputed_items(items):
+    """BatchWriteItem whole precomputed items, 25 per call, retrying unprocessed ones."""
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        puts = [{"PutRequest": {"Item": item}} for item in items[start:start + BATCH_WRITE_SIZE]]
+        batch_write(dynamodb, {PRECOMPUTED_TABLE: puts})
+
+
+def refresh_profiles(profiles, questions, full=False, per_tier=PRECOMPUTED_PER_TIER):
+    """Rebuild the lists of the given profiles that changed or ran low; returns how many were written."""
+    profiles = [profile for profile in profiles if profile['preferences']]
+    if not full:
+        existing = fetch_precomputed_items([profile['user_id'] for profile in profiles])
+        profiles = [
+            profile for profile in profiles
+            if needs_refresh(existing.get(profile['user_id']), profile['preferences'], profile['user_level'])
+        ]
+    if not profiles:
+        return 0
+
+    state_items = fetch_user_state_items([profile['user_id'] for profile in profiles])
+    items = []
+    for profile in profiles:
+        seen_value = state_items.get(profile['user_id'], {}).get(SEEN_ATTRIBUTE)
+        seen = as_bytes(deserializer.deserialize(seen_value)) if seen_value else b''
+        tiers = {
+            tier: select_questions(profile['preferences'], tier, questions, per_tier, seen)
+            for tier in PRECOMPUTED_TIERS
+        }
+        items.append(precomputed_item(profile['user_id'], profile['preferences'], profile['user_level'], tiers))
+    write_precomputed_items(items)
+    return len(items)
+
+
+def precompute_recommendations(full=False, per_tier=PRECOMPUTED_PER_TIER):
+    """Walk every profile and refresh precomputed lists, BATCH_GET_SIZE users at a time.
+
+    Without ``full`` only users whose level or preferences changed since their
+    lists were built, or whose lists ran low, are recomputed.
+    """
+    with stage("fetch"):
+        questions = fetch_questions()
+    scanned = refreshed = 0
+    batch = []
+    for profile in profile_store.iter_profiles():
+        batch.append(profile)
+        scanned += 1
+        if len(batch) == BATCH_GET_SIZE:
+            with stage("refresh"):
+                refreshed += refresh_profiles(batch, questions, full, per_tier)
+            batch = []
+    if batch:
+        with stage("refresh"):
+            refreshed += refresh_profiles(batch, questions, full, per_tier)
+    return scanned, refreshed
+
+
+@instrumented
+def lambda_handler(event, context):
+    """Scheduled batch: {"full": true} rebuilds every user's lists instead of only stale ones."""
+    try:
+        scanned, refreshed = precompute_recommendations(bool(event.get('full')))
+    except Exception as e:
+        print(f"Error precomputing recommendations: {e}")
+        return {"statusCode": 500, "body": json.dumps({"message": str(e)})}
+
+    print(f"Precomputed recommendations refreshed for {refreshed} of {scanned} users")
+    return {"statusCode": 200, "body": json.dumps({"scanned": scanned, "refreshed": refreshed})}
+
+
+if __name__ == "__main__":
+    print(lambda_handler({"full": False}, None))
@@ -0,0 +1,95 @@
+import hashlib
+import time
+
+from botocore.exceptions import ClientError
+
+# DynamoDB table keyed by user_id holding a ranked list of next questions per
+# difficulty tier, built by precomputeRecommendations.py. Each tier attribute
+# ("easy", "medium", "hard") is a list of {question_id, difficulty, tags} maps;
+# profile_hash records the preferences and level the lists were built for and
+# built_size the length of the shortest list when it was written.
+PRECOMPUTED_TABLE = "PrecomputedRecommendations"
+PRECOMPUTED_TIERS = ["easy", "medium", "hard"]
+PRECOMPUTED_PER_TIER = 10
+
+# The batch refills a user's lists once any tier has been popped below this
+# (or below its built size, for users with few matching questions)
+REFILL_BELOW = 3
+
+# Users served a question within this many seconds are mid-session and get live
+# recommendations; the state attribute is written on every serve.
+SESSION_IDLE_SECONDS = 30 * 60
+SERVED_AT_ATTRIBUTE = "last_served_at"
+
+
+def profile_hash(preferences, user_level):
+    """Stable digest of the profile fields the lists are built from."""
+    normalized = ",".join(sorted(pref.strip().lower() for pref in preferences))
+    return hashlib.sha1(f"{int(user_level)}|{normalized}".encode('utf-8')).hexdigest()[:16]
+
+
+def is_mid_session(user_state, now=None):
+    """True when the user was served a question within SESSION_IDLE_SECONDS."""
+    served_at = user_state.get(SERVED_AT_ATTRIBUTE)
+    if served_at is None:
+        return False
+    return (now or time.time()) - int(served_at) < SESSION_IDLE_SECONDS
+
+
+def precomputed_item(user_id, preferences, user_level, tiers):
+    """Low-level item for a user; ``tiers`` maps each tier to ranked (question, difficulty) pairs."""
+    item = {
+        'user_id': {'S': str(user_id)},
+        'profile_hash': {'S': profile_hash(preferences, user_level)},
+        'refreshed_at': {'N': str(int(time.time()))},
+        'built_size': {'N': str(min((len(selected) for selected in tiers.values()), default=0))},
+    }
+    for tier, selected in tiers.items():
+        item[tier] = {'L': [
+            {'M': {
+                'question_id': {'S': question['ITEM_INT_ID']},
+                'difficulty': {'S': difficulty},
+                'tags': {'S': question['tags']},
+            }}
+            for question, difficulty in selected
+        ]}
+    return item
+
+
+def needs_refresh(item, preferences, user_level):
+    """True when a stored item is missing, built for another profile, or running low."""
+    if not item or item.get('profile_hash', {}).get('S') != profile_hash(preferences, user_level):
+        return True
+    refill_below = min(REFILL_BELOW, int(item.get('built_size', {}).get('N', REFILL_BELOW)))
+    return any(len(item.get(tier, {}).get('L', [])) < refill_below for tier in PRECOMPUTED_TIERS)
+
+
+def pop_precomputed(client, user_id, tier, preferences, user_level, table_name=PRECOMPUTED_TABLE):
+    """Take the head of the user's list for ``tier`` in one UpdateItem.
+
+    Only lists built for the user's current profile are used. Returns
+    (question, difficulty), with the question carrying ITEM_INT_ID and tags,
+    or None when there is nothing to serve.
+    """
+    try:
+        response = client.update_item(
+            TableName=table_name,
+            Key={'user_id': {'S': str(user_id)}},
+            UpdateExpression="REMOVE #tier[0]",
+            ConditionExpression="profile_hash = :hash AND size(#tier) > :zero",
+            ExpressionAttributeNames={'#tier': tier},
+            ExpressionAttributeValues={
+                ':hash': {'S': profile_hash(preferences, user_level)},
+                ':zero': {'N': '0'},
+            },
+            ReturnValues="UPDATED_OLD"
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Error popping precomputed recommendation: {e}")
+        return None
+    entries = response.get('Attributes', {}).get(tier, {}).get('L', [])
+    if not entries:
+        return None
+    entry = entries[0]['M']
+    return {'ITEM_INT_ID': entry['question_id']['S'], 'tags': entry['tags']['S']}, entry['difficulty']['S']
@@ -0,0 +1,89 @@
+# S3 requires every multipart part except the last to be at least 5 MiB.
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
+# Size of the reads used when streaming an existing object into a rewrite.
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class MultipartWriter:
+    """Write an S3 object incrementally, holding at most one part in memory.
+
+    Data is buffered until a full part is available and then uploaded with
+    UploadPart. The multipart upload is only created once the first part is
+    full, so small objects are written with a single PutObject instead. Used
+    as a context manager, the object is completed on success and the upload is
+    aborted if the block raises.
+
+    ``if_match`` (an ETag) or ``if_none_match='*'`` make the final write
+    conditional, so a rewrite fails with PreconditionFailed instead of
+    overwriting a version of the object it did not read.
+    """
+
+    def __init__(self, s3, bucket, key, part_size=MULTIPART_PART_SIZE, if_match=None, if_none_match=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.conditions = {}
+        if if_match:
+            self.conditions['IfMatch'] = if_match
+        if if_none_match:
+            self.conditions['IfNoneMatch'] = if_none_match
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.response = None
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def _upload_part(self, data):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=data
+        )
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+    def close(self):
+        """Flush the remaining buffer and make the object visible."""
+        if self.upload_id is None:
+            return self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer), **self.conditions)
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+            self.buffer.clear()
+        return self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}, **self.conditions
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+        self.buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.response = self.close()
+        else:
+            self.abort()
+        return False
+
+
+def open_object(s3, bucket, key, chunk_size=READ_CHUNK_SIZE):
+    """Return (ETag, chunk iterator) for an object, or (None, empty iterator) if it does not exist."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        return None, iter(())
+    return response['ETag'], response['Body'].iter_chunks(chunk_size)
+
@@ -0,0 +1,50 @@
+# Per-user record of served questions, kept as a bitmap over the integer
+# ITEM_INT_IDs in the user's UserQuestionState item (binary attribute
+# "seen_questions"). Bit n is set once question n has been served, so checks
+# and updates are O(1). The bitmap costs one bit per id up to the largest id
+# served, so ids are assumed to be dense: 50,000 questions take about 6 KB,
+# well inside DynamoDB's 400 KB item limit.
+SEEN_ATTRIBUTE = "seen_questions"
+
+# Ids above this are never recorded and always count as unseen, which caps the
+# bitmap at 125 KB and leaves the rest of the item room to grow.
+MAX_SEEN_ID = 1_000_000
+
+
+def _bit(item_id):
+    """(byte index, mask) for an item id, or None for ids that are not integers in 0..MAX_SEEN_ID."""
+    try:
+        number = int(item_id)
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= number <= MAX_SEEN_ID:
+        return None
+    return number >> 3, 1 << (number & 7)
+
+
+def as_bytes(value):
+    """Normalize a stored bitmap (bytes, boto3 Binary or missing) to bytes."""
+    if value is None:
+        return b''
+    return bytes(getattr(value, 'value', value))
+
+
+def is_seen(bitmap, item_id):
+    bit = _bit(item_id)
+    if bit is None:
+        return False
+    index, mask = bit
+    return index < len(bitmap) and bool(bitmap[index] & mask)
+
+
+def mark_seen(bitmap, item_id):
+    """Return a copy of the bitmap with item_id set, grown as needed."""
+    bit = _bit(item_id)
+    if bit is None:
+        return bitmap
+    index, mask = bit
+    updated = bytearray(bitmap)
+    if index >= len(updated):
+        updated.extend(b'\0' * (index + 1 - len(updated)))
+    updated[index] |= mask
+    return bytes(updated)
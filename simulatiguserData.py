@@ -24,14 +24,15 @@ def generate_user_data(item_data, num_users):
     return pd.DataFrame(synthetic_data)
 
 # Main script
-item_file_path = '/mnt/data/updated_items (1).csv'
-item_data = load_item_data(item_file_path)
+if __name__ == "__main__":
+    item_file_path = '/mnt/data/updated_items (1).csv'
+    item_data = load_item_data(item_file_path)
 
-num_users = 100  # Number of users to simulate
-synthetic_user_data = generate_user_data(item_data, num_users)
+    num_users = 100  # Number of users to simulate
+    synthetic_user_data = generate_user_data(item_data, num_users)
 
-# Save the simulated user data to a CSV file
-synthetic_user_data.to_csv("updated_usersmnew.csv", index=False)
+    # Save the simulated user data to a CSV file
+    synthetic_user_data.to_csv("updated_usersmnew.csv", index=False)
 
-# Display the first few rows of the synthetic user dataset
-print(synthetic_user_data.head())
+    # Display the first few rows of the synthetic user dataset
+    print(synthetic_user_data.head())
@@ -1,66 +1,103 @@
-# Simulate interactions again with the user profile included
-interactions = []
+import pandas as pd
+import random
+from datetime import datetime, timedelta
 
-for user_id in users[user_id_column]:
-    profile = user_profiles[user_id]
-    profile_probabilities = profiles[profile]
-    
-    # Simulate 10 interactions per user
-    for _ in range(10):
-        item = items.sample(1).iloc[0]
-        difficulty = item[difficulty_column]
-        topic = item[topic_column]
-        
-        # Determine event type based on profile probabilities and difficulty
-        if difficulty == 'easy':
-            event_type = random.choices(
-                event_types,
-                weights=[
-                    profile_probabilities.get('easy_correct', 0.0),
-                    1 - profile_probabilities.get('easy_correct', 0.0) - profile_probabilities.get('easy_skipped', 0.0),
-                    profile_probabilities.get('easy_skipped', 0.0)
-                ]
-            )[0]
-        elif difficulty == 'medium':
-            event_type = random.choices(
-                event_types,
-                weights=[
-                    profile_probabilities.get('medium_correct', 0.0),
-                    1 - profile_probabilities.get('medium_correct', 0.0) - profile_probabilities.get('medium_skipped', 0.0),
-                    profile_probabilities.get('medium_skipped', 0.0)
-                ]
-            )[0]
-        else:  # hard
-            event_type = random.choices(
-                event_types,
-                weights=[
-                    profile_probabilities.get('hard_correct', 0.0),
-                    1 - profile_probabilities.get('hard_correct', 0.0) - profile_probabilities.get('hard_skipped_or_incorrect', 0.0),
-                    profile_probabilities.get('hard_skipped_or_incorrect', 0.0)
-                ]
-            )[0]
-        
-        # Simulate timestamp
-        timestamp = start_time + timedelta(minutes=random.randint(1, 1000))
-        
-        # Add interaction record
-        interactions.append({
-            'user_id': user_id,
-            'item_id': item[item_id_column],
-            'event_type': event_type,
-            'timestamp': timestamp,
-            'difficulty': difficulty,
-            'topic': topic,
-            'user_profile': profile  # Include the user's current profile
-        })
+# Outcomes, in the order the weights below are given
+event_types = ['correct', 'incorrect', 'skipped']
 
-# Create the updated interactions DataFrame
-interactions_df = pd.DataFrame(interactions)
+# Per-profile outcome probabilities by question difficulty
+profiles = {
+    'beginner': {
+        'easy_correct': 0.6, 'easy_skipped': 0.1,
+        'medium_correct': 0.35, 'medium_skipped': 0.2,
+        'hard_correct': 0.15, 'hard_skipped_or_incorrect': 0.5,
+    },
+    'intermediate': {
+        'easy_correct': 0.8, 'easy_skipped': 0.05,
+        'medium_correct': 0.6, 'medium_skipped': 0.1,
+        'hard_correct': 0.35, 'hard_skipped_or_incorrect': 0.35,
+    },
+    'expert': {
+        'easy_correct': 0.95, 'easy_skipped': 0.02,
+        'medium_correct': 0.85, 'medium_skipped': 0.05,
+        'hard_correct': 0.65, 'hard_skipped_or_incorrect': 0.15,
+    },
+}
 
-# Save the updated dataset
-updated_output_path = '/mnt/data/simulated_interactions_with_profiles.csv'
-interactions_df.to_csv(updated_output_path, index=False)
+# Simulate interactions with the user profile included
+def simulate_interactions(users, items, user_profiles, interactions_per_user=10, start_time=None,
+                          user_id_column='user_id', item_id_column='ITEM_INT_ID',
+                          difficulty_column='difficulty', topic_column='tags'):
+    start_time = start_time or datetime.now()
+    interactions = []
 
-import ace_tools as tools; tools.display_dataframe_to_user(name="Simulated Interaction Dataset with Profiles", dataframe=interactions_df)
+    for user_id in users[user_id_column]:
+        profile = user_profiles[user_id]
+        profile_probabilities = profiles[profile]
 
-updated_output_path
+        # Simulate interactions_per_user interactions per user
+        for _ in range(interactions_per_user):
+            item = items.sample(1).iloc[0]
+            difficulty = item[difficulty_column]
+            topic = item[topic_column]
+
+            # Determine event type based on profile probabilities and difficulty
+            if difficulty == 'easy':
+                event_type = random.choices(
+                    event_types,
+                    weights=[
+                        profile_probabilities.get('easy_correct', 0.0),
+                        1 - profile_probabilities.get('easy_correct', 0.0) - profile_probabilities.get('easy_skipped', 0.0),
+                        profile_probabilities.get('easy_skipped', 0.0)
+                    ]
+                )[0]
+            elif difficulty == 'medium':
+                event_type = random.choices(
+                    event_types,
+                    weights=[
+                        profile_probabilities.get('medium_correct', 0.0),
+                        1 - profile_probabilities.get('medium_correct', 0.0) - profile_probabilities.get('medium_skipped', 0.0),
+                        profile_probabilities.get('medium_skipped', 0.0)
+                    ]
+                )[0]
+            else:  # hard
+                event_type = random.choices(
+                    event_types,
+                    weights=[
+                        profile_probabilities.get('hard_correct', 0.0),
+                        1 - profile_probabilities.get('hard_correct', 0.0) - profile_probabilities.get('hard_skipped_or_incorrect', 0.0),
+                        profile_probabilities.get('hard_skipped_or_incorrect', 0.0)
+                    ]
+                )[0]
+
+            # Simulate timestamp
+            timestamp = start_time + timedelta(minutes=random.randint(1, 1000))
+
+            # Add interaction record
+            interactions.append({
+                'user_id': user_id,
+                'item_id': item[item_id_column],
+                'event_type': event_type,
+                'timestamp': timestamp,
+                'difficulty': difficulty,
+                'topic': topic,
+                'user_profile': profile  # Include the user's current profile
+            })
+
+    # Create the updated interactions DataFrame
+    return pd.DataFrame(interactions)
+
+# Main script
+if __name__ == "__main__":
+    items = pd.read_csv('/mnt/data/updated_items (1).csv')
+    users = pd.read_csv('/mnt/data/updated_usersmnew.csv')
+    level_names = {1: 'beginner', 2: 'intermediate', 3: 'expert'}
+    user_profiles = dict(zip(users['user_id'], users['user_level'].map(level_names)))
+
+    interactions_df = simulate_interactions(users, items, user_profiles)
+
+    # Save the updated dataset
+    updated_output_path = '/mnt/data/simulated_interactions_with_profiles.csv'
+    interactions_df.to_csv(updated_output_path, index=False)
+
+    print(interactions_df.head())
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Handler modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def lease_table(monkeypatch):
+    """A DynamoDB client on moto with the dataset lease table created."""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    from write_coordinator import DATASET_LEASE_TABLE
+
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    with moto.mock_aws():
+        client = boto3.client('dynamodb')
+        client.create_table(
+            TableName=DATASET_LEASE_TABLE,
+            KeySchema=[{'AttributeName': 'dataset', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'dataset', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield client
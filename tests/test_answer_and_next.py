@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+import answerAndNext
+from feedback_store import FeedbackStore, InMemoryFeedbackTable
+from getRecommendation import USER_STATE_TABLE, build_question_index
+from user_profile_store import USER_PROFILE_TABLE
+
+QUESTIONS = build_question_index(
+    'ITEM_INT_ID,difficulty,tags\n1,easy,java\n2,easy,java\n3,medium,java\n4,hard,java\n'
+)
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+class FakeDynamoDB:
+    """The calls answer_and_next makes: one BatchGetItem and one TransactWriteItems per round.
+
+    ``conflicts`` transactions are cancelled with ConditionalCheckFailed after
+    another answer is counted in between, as a concurrent request would.
+    """
+
+    def __init__(self, state, profile, conflicts=0):
+        self.state = state
+        self.profile = profile
+        self.conflicts = conflicts
+        self.reads = 0
+        self.transactions = []
+
+    def batch_get_item(self, RequestItems):
+        self.reads += 1
+        items = {USER_STATE_TABLE: [], USER_PROFILE_TABLE: []}
+        if self.state is not None:
+            items[USER_STATE_TABLE].append({name: serializer.serialize(value) for name, value in self.state.items()})
+        items[USER_PROFILE_TABLE].append({name: serializer.serialize(value) for name, value in self.profile.items()})
+        return {'Responses': items}
+
+    def _condition_holds(self, update):
+        values = update['ExpressionAttributeValues']
+        if update['ConditionExpression'] == "total_count = :seen_total":
+            return self.state.get('total_count') == int(values[':seen_total']['N'])
+        return 'total_count' not in self.state
+
+    def transact_write_items(self, TransactItems):
+        self.transactions.append(TransactItems)
+        state_update = TransactItems[1]['Update']
+        if self.conflicts:
+            self.conflicts -= 1
+            self.state['total_count'] = self.state.get('total_count', 0) + 1
+        if not self._condition_holds(state_update):
+            raise ClientError({
+                'Error': {'Code': 'TransactionCanceledException'},
+                'CancellationReasons': [{'Code': 'None'}, {'Code': 'ConditionalCheckFailed'}, {'Code': 'None'}],
+            }, 'TransactWriteItems')
+        set_part, _, remove_part = state_update['UpdateExpression'][len("SET "):].partition(" REMOVE ")
+        for assignment in set_part.split(", "):
+            name, value = assignment.split(" = ")
+            self.state[name] = deserializer.deserialize(state_update['ExpressionAttributeValues'][value])
+        for name in filter(None, remove_part.split(", ")):
+            self.state.pop(name, None)
+        return {}
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    def make(state, conflicts=0, history=()):
+        client = FakeDynamoDB(state, {'user_id': '1', 'preferences': ['java'], 'user_level': 1}, conflicts)
+        feedback = FeedbackStore(InMemoryFeedbackTable())
+        for question_id, answer, timestamp in history:
+            feedback.put_feedback('1', question_id, answer, timestamp)
+        monkeypatch.setattr(answerAndNext, 'dynamodb', client)
+        monkeypatch.setattr(answerAndNext, 'feedback_store', feedback)
+        monkeypatch.setattr(answerAndNext, 'fetch_questions', lambda: QUESTIONS)
+        monkeypatch.setattr(answerAndNext, 'write_interaction_part', lambda s3, entries: None)
+        return client
+    return make
+
+
+def answer(feedback='correct'):
+    response = answerAndNext.lambda_handler({'user_id': '1', 'feedback': feedback}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def served_state(**extra):
+    return dict({'user_id': '1', 'current_question': '1', 'current_difficulty': 'easy', 'current_tags': 'java'},
+                **extra)
+
+
+def test_conflicting_round_is_reread_and_retried(environment):
+    client = environment(served_state(total_count=3, correct_count=1), conflicts=1)
+    status, body = answer()
+    assert status == 200
+    assert client.reads == 2 and len(client.transactions) == 2
+    assert client.state['total_count'] == 5  # the concurrent answer and this one
+
+
+def test_gives_up_after_repeated_conflicts(environment):
+    client = environment(served_state(total_count=3), conflicts=answerAndNext.MAX_ROUND_ATTEMPTS)
+    status, body = answer()
+    assert status == 500
+    assert "Too many concurrent answers" in body['message']
+    assert len(client.transactions) == answerAndNext.MAX_ROUND_ATTEMPTS
+
+
+def test_state_without_counters_is_seeded_from_history(environment):
+    client = environment(served_state(), history=[('2', 'correct', 100), ('3', 'incorrect', 200)])
+    status, body = answer('correct')
+    assert status == 200
+    condition = client.transactions[0][1]['Update']['ConditionExpression']
+    assert condition == "attribute_exists(user_id) AND attribute_not_exists(total_count)"
+    assert (client.state['total_count'], client.state['correct_count']) == (3, 2)
+
+
+def test_prefetched_queue_is_advanced(environment):
+    queue = [{'question_id': '3', 'difficulty': 'medium', 'tags': 'java'},
+             {'question_id': '4', 'difficulty': 'hard', 'tags': 'java'}]
+    client = environment(served_state(total_count=1, queued_questions=queue))
+    assert answer()[1]['question_id'] == '3'
+    assert client.state['current_question'] == '3'
+    assert client.state['queued_questions'] == queue[1:]
+
+    assert answer()[1]['question_id'] == '4'
+    assert 'queued_questions' not in client.state
+
+
+def test_missing_state_is_not_found(environment):
+    environment(None)
+    assert answer()[0] == 404
@@ -0,0 +1,144 @@
+import csv
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+import dataset_cache
+from columnar_snapshot import ColumnarSnapshot, snapshot_key, write_snapshot
+
+CSV_KEY = "updated_items (1).csv"
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def iter_chunks(self, size):
+        for start in range(0, len(self.data), size):
+            yield self.data[start:start + size]
+
+
+class FakeS3:
+    """Just enough of S3 for the dataset cache: versioned objects with ETags."""
+
+    def __init__(self):
+        self.objects = {}
+        self.versions = 0
+        self.errors = {}  # key -> error code GetObject fails with
+        self.gets = []
+
+    def put(self, key, data):
+        self.versions += 1
+        self.objects[key] = (data, f'"v{self.versions}"')
+        return self.objects[key][1]
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.gets.append(Key)
+        if Key in self.errors:
+            raise ClientError({'Error': {'Code': self.errors[Key]}}, 'GetObject')
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        data, etag = self.objects[Key]
+        if IfNoneMatch == etag:
+            raise ClientError({'Error': {'Code': '304'}}, 'GetObject')
+        return {'Body': FakeBody(data), 'ETag': etag}
+
+    def head_object(self, Bucket, Key):
+        return {'ETag': self.objects[Key][1]}
+
+
+def encode(fieldnames, rows, source_etag=None):
+    output = io.BytesIO()
+    count = write_snapshot(output, fieldnames, rows, ["difficulty"], source_etag)
+    return count, ColumnarSnapshot(output.getvalue())
+
+
+def test_rows_match_dict_reader():
+    text = 'ITEM_INT_ID,difficulty,tags\n1,easy,"java, loops"\n\n2,hard,python\n'
+    reader = csv.reader(io.StringIO(text))
+    count, snapshot = encode(next(reader), reader)
+    assert count == len(snapshot) == 2
+    assert [snapshot[i] for i in range(count)] == list(csv.DictReader(io.StringIO(text)))
+
+
+def test_row_of_wrong_length_is_rejected():
+    with pytest.raises(ValueError, match="Row 2 has 2 fields, expected 3"):
+        encode(["ITEM_INT_ID", "difficulty", "tags"], [["1", "easy", "java"], ["2", "hard"]])
+
+
+def test_header_records_source_etag():
+    _, snapshot = encode(["ITEM_INT_ID"], [["1"]], '"abc"')
+    assert snapshot.source_etag == '"abc"'
+
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_cache, 'SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setattr(dataset_cache, '_cache', {})
+    return FakeS3()
+
+
+def put_snapshot(s3, source_etag):
+    output = io.BytesIO()
+    write_snapshot(output, ["ITEM_INT_ID"], [["1"], ["2"]], (), source_etag)
+    s3.put(snapshot_key(CSV_KEY), output.getvalue())
+
+
+def test_snapshot_of_current_csv_is_used(s3):
+    put_snapshot(s3, s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n"))
+    assert dataset_cache.get_snapshot_dataset(s3, "bucket", CSV_KEY, len) == 2
+
+
+def test_stale_snapshot_falls_back_to_csv(s3):
+    put_snapshot(s3, s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n"))
+    s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n3\n")
+    assert dataset_cache.get_snapshot_dataset(s3, "bucket", CSV_KEY, len) is None
+
+
+def test_stale_snapshot_is_noticed_after_ttl(s3):
+    put_snapshot(s3, s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n"))
+    assert dataset_cache.get_snapshot_dataset(s3, "bucket", CSV_KEY, len, ttl=0) == 2
+    s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n3\n")
+    assert dataset_cache.get_snapshot_dataset(s3, "bucket", CSV_KEY, len, ttl=0) is None
+
+
+def test_missing_snapshot_returns_none(s3):
+    s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n")
+    assert dataset_cache.get_snapshot_dataset(s3, "bucket", CSV_KEY, len) is None
+
+
+def count_snapshot_rows(snapshot):
+    return 'snapshot', len(snapshot)
+
+
+def count_csv_rows(content):
+    return 'csv', len(content.splitlines()) - 1
+
+
+def fetch_rows(s3):
+    return dataset_cache.get_dataset_preferring_snapshot(
+        s3, "bucket", CSV_KEY, snapshot_parser=count_snapshot_rows, parser=count_csv_rows
+    )
+
+
+def test_denied_snapshot_falls_back_to_csv_and_is_not_retried(s3):
+    s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n3\n")
+    s3.errors[snapshot_key(CSV_KEY)] = 'AccessDenied'
+    assert fetch_rows(s3) == ('csv', 3)
+    assert fetch_rows(s3) == ('csv', 3)
+    assert s3.gets.count(snapshot_key(CSV_KEY)) == 1
+
+
+def test_failing_snapshot_read_falls_back_to_csv(s3):
+    s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n3\n")
+    s3.errors[snapshot_key(CSV_KEY)] = 'InternalError'
+    assert fetch_rows(s3) == ('csv', 3)
+
+
+def test_snapshot_is_preferred_when_current(s3):
+    put_snapshot(s3, s3.put(CSV_KEY, b"ITEM_INT_ID\n1\n2\n"))
+    assert fetch_rows(s3) == ('snapshot', 2)
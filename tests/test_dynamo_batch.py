@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import dynamo_batch
+import getRecommendation
+from dynamo_batch import BACKOFF_CAP_SECONDS, MAX_BATCH_ATTEMPTS, batch_get, batch_write
+
+
+class ThrottlingClient:
+    """Processes at most ``per_call`` keys or puts per batch call, like a throttled table."""
+
+    def __init__(self, per_call):
+        self.per_call = per_call
+        self.calls = 0
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        (table_name, request), = RequestItems.items()
+        keys = request['Keys']
+        response = {'Responses': {table_name: [dict(key) for key in keys[:self.per_call]]}}
+        if keys[self.per_call:]:
+            response['UnprocessedKeys'] = {table_name: dict(request, Keys=keys[self.per_call:])}
+        return response
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        (table_name, puts), = RequestItems.items()
+        return {'UnprocessedItems': {table_name: puts[self.per_call:]} if puts[self.per_call:] else {}}
+
+
+def keys(count):
+    return [{'user_id': {'S': str(n)}} for n in range(count)]
+
+
+def test_get_retries_unprocessed_keys_with_growing_capped_delays():
+    client = ThrottlingClient(per_call=1)
+    delays = []
+    found = batch_get(client, {'Table': {'Keys': keys(5)}}, sleep=delays.append)
+    assert found == {'Table': keys(5)}
+    assert client.calls == 5
+    assert len(delays) == 4
+    assert all(0 <= delay <= BACKOFF_CAP_SECONDS for delay in delays)
+
+
+def test_write_retries_unprocessed_items():
+    client = ThrottlingClient(per_call=2)
+    batch_write(client, {'Table': [{'PutRequest': {'Item': key}} for key in keys(5)]}, sleep=lambda s: None)
+    assert client.calls == 3
+
+
+def test_gives_up_after_max_attempts():
+    client = ThrottlingClient(per_call=0)
+    with pytest.raises(RuntimeError, match="still unprocessed"):
+        batch_get(client, {'Table': {'Keys': keys(1)}}, sleep=lambda s: None)
+    assert client.calls == MAX_BATCH_ATTEMPTS
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(dynamo_batch.random, 'uniform', lambda low, high: high)
+    delays = [dynamo_batch.backoff_delay(attempt) for attempt in range(1, 12)]
+    assert delays == sorted(delays)
+    assert delays[-1] == BACKOFF_CAP_SECONDS
+
+
+@pytest.mark.parametrize("k", ["abc", None, [], 0, 21])
+def test_batch_request_with_invalid_k_is_rejected(k):
+    response = getRecommendation.handle_batch({"user_ids": ["1"], "k": k})
+    assert response['statusCode'] == 400
+    assert "k between 1 and" in json.loads(response['body'])['message']
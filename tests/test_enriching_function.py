@@ -0,0 +1,42 @@
+import enrichingFunction
+from feedback_store import FeedbackStore, InMemoryFeedbackTable
+from user_profile_store import InMemoryUserProfileStore
+
+
+class CountingProfileStore(InMemoryUserProfileStore):
+    def __init__(self, profiles):
+        super().__init__(profiles)
+        self.lookups = []
+
+    def get_profile(self, user_id):
+        self.lookups.append(('get_profile', user_id))
+        return super().get_profile(user_id)
+
+    def get_profiles(self, user_ids):
+        self.lookups.append(('get_profiles', list(user_ids)))
+        return {str(user_id): self.profiles[str(user_id)] for user_id in user_ids if str(user_id) in self.profiles}
+
+
+def answers(*feedback):
+    return [{'feedback': value, 'timestamp': n} for n, value in enumerate(feedback)]
+
+
+def test_profiles_are_read_in_one_batch_with_history_fallback(monkeypatch):
+    store = CountingProfileStore([
+        {'user_id': '1', 'preferences': ['java'], 'user_level': 3},
+        {'user_id': '2', 'preferences': ['java'], 'user_level': 2},
+    ])
+    history = FeedbackStore(InMemoryFeedbackTable())
+    for timestamp, feedback in enumerate(['incorrect', 'incorrect', 'correct']):
+        history.put_feedback('3', f'q{timestamp}', feedback, 100 + timestamp)
+    monkeypatch.setattr(enrichingFunction, 'profile_store', store)
+    monkeypatch.setattr(enrichingFunction, 'feedback_store', history)
+    feedback_by_user = {
+        '1': answers('incorrect'),
+        '2': answers('correct'),
+        '3': answers('correct'),  # only the latest answer is in this run's window
+    }
+    assert enrichingFunction.lookup_user_profiles(feedback_by_user) == {
+        '1': 'expert', '2': 'intermediate', '3': 'beginner'
+    }
+    assert store.lookups == [('get_profiles', ['1', '2', '3'])]
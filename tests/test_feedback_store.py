@@ -0,0 +1,80 @@
+import enrichingFunction
+from feedback_store import FeedbackStore, InMemoryFeedbackTable, feedback_day
+
+DAY = 86400
+START = 1_700_000_000  # 2023-11-14 22:13:20 UTC
+
+
+class CountingTable(InMemoryFeedbackTable):
+    """Counts the query and scan pages FeedbackStore asks for."""
+
+    def __init__(self):
+        super().__init__()
+        self.pages = 0
+
+    def query(self, **request):
+        self.pages += 1
+        return super().query(**request)
+
+    def scan(self, **request):
+        self.pages += 1
+        return super().scan(**request)
+
+
+def make_store(answers, page_size=None):
+    """A store over a fresh table holding ``answers`` as (user_id, question_id, timestamp)."""
+    store = FeedbackStore(CountingTable(), page_size=page_size)
+    for user_id, question_id, timestamp in answers:
+        store.put_feedback(user_id, question_id, 'correct', timestamp)
+    return store
+
+
+def test_feedback_day_is_the_utc_date():
+    assert feedback_day(START) == '2023-11-14'
+    assert feedback_day(START + 2 * 3600) == '2023-11-15'
+
+
+def test_query_user_feedback_returns_one_user_in_timestamp_order():
+    store = make_store([('1', 'q3', START + 30), ('2', 'q1', START + 10), ('1', 'q1', START + 10)])
+    assert [(f['question_id'], f['timestamp']) for f in store.query_user_feedback('1')] == [
+        ('q1', START + 10), ('q3', START + 30)
+    ]
+
+
+def test_query_user_feedback_since_is_exclusive():
+    store = make_store([('1', f'q{n}', START + n) for n in range(5)])
+    assert [f['timestamp'] for f in store.query_user_feedback('1', since=START + 2)] == [START + 3, START + 4]
+
+
+def test_pages_are_followed_to_the_end():
+    store = make_store([('1', f'q{n}', START + n) for n in range(7)], page_size=3)
+    assert len(list(store.query_user_feedback('1'))) == 7
+    assert store.client.pages == 3
+    store.client.pages = 0
+    assert len(list(store.iter_feedback())) == 7
+    assert store.client.pages == 3
+
+
+def test_query_feedback_between_spans_day_partitions():
+    answers = [('1', 'q0', START), ('2', 'q1', START + DAY), ('1', 'q2', START + 2 * DAY), ('3', 'q3', START + 3 * DAY)]
+    store = make_store(answers, page_size=1)
+    found = list(store.query_feedback_between(START, START + 2 * DAY))
+    assert [f['question_id'] for f in found] == ['q1', 'q2']
+
+
+def test_checkpoint_windows_read_every_answer_exactly_once():
+    answers = [(str(n % 3), f'q{n}', START + n * 7200) for n in range(30)]
+    store = make_store(answers, page_size=4)
+    high_water_mark, seen = START - 1, []
+    for until in range(START + DAY // 2, START + 3 * DAY, DAY // 2):
+        seen.extend(f['question_id'] for f in store.query_feedback_between(high_water_mark, until))
+        high_water_mark = until
+    assert sorted(seen) == sorted(question_id for _, question_id, _ in answers)
+
+
+def test_enrichment_reads_the_first_window_by_scan_and_later_ones_by_index(monkeypatch):
+    store = make_store([('1', 'q0', START), ('1', 'q1', START + 100), ('2', 'q2', START + 200)], page_size=2)
+    monkeypatch.setattr(enrichingFunction, 'feedback_store', store)
+    first = [f['question_id'] for f in enrichingFunction.fetch_new_feedback(None, START + 100)]
+    assert sorted(first) == ['q0', 'q1']
+    assert [f['question_id'] for f in enrichingFunction.fetch_new_feedback(START + 100, START + 200)] == ['q2']
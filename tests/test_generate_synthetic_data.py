@@ -0,0 +1,23 @@
+import generate_synthetic_data
+from generate_synthetic_data import INTERACTIONS_FILE, ITEMS_FILE, USERS_FILE
+
+
+def generate(output_dir, *extra):
+    generate_synthetic_data.main([
+        '--items', '20', '--users', '30', '--interactions', '200', '--seed', '7',
+        '--output-dir', str(output_dir), *extra,
+    ])
+    return {name: (output_dir / name).read_text() for name in (ITEMS_FILE, USERS_FILE, INTERACTIONS_FILE)}
+
+
+def test_same_seed_reproduces_the_same_files(tmp_path):
+    assert generate(tmp_path / "first") == generate(tmp_path / "second")
+
+
+def test_start_time_moves_only_the_timestamps(tmp_path):
+    default = generate(tmp_path / "default")
+    later = generate(tmp_path / "later", '--start-time', '2024-01-02')
+    assert default[ITEMS_FILE] == later[ITEMS_FILE]
+    default_rows = [line.split(',') for line in default[INTERACTIONS_FILE].splitlines()[1:]]
+    later_rows = [line.split(',') for line in later[INTERACTIONS_FILE].splitlines()[1:]]
+    assert [int(b[3]) - int(a[3]) for a, b in zip(default_rows, later_rows)] == [86400] * len(default_rows)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import compactInteractions
+from interaction_log import (
+    INTERACTION_DATASET_KEY, INTERACTION_FIELDS, INTERACTION_PARTS_PREFIX, compact_interactions,
+    write_interaction_part
+)
+from s3_stream_writer import MultipartWriter
+
+
+class FakeBody:
+    def __init__(self, data, on_read=None):
+        self.data = data
+        self.on_read = on_read
+
+    def read(self):
+        return self.data
+
+    def iter_chunks(self, size):
+        for start in range(0, len(self.data), size):
+            yield self.data[start:start + size]
+            if self.on_read:
+                self.on_read()
+
+
+class FakeS3:
+    """In-memory S3 that enforces IfMatch / IfNoneMatch on PutObject and CompleteMultipartUpload."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+        self.on_dataset_read = None
+
+    def _check(self, key, IfMatch=None, IfNoneMatch=None):
+        current = self.objects.get(key)
+        if (IfMatch and (current is None or current[1] != IfMatch)) or (IfNoneMatch == '*' and current):
+            raise ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject')
+
+    def _store(self, key, data):
+        self.objects[key] = (bytes(data), f'"{hashlib.md5(data).hexdigest()}"')
+        return {'ETag': self.objects[key][1]}
+
+    def put_object(self, Bucket, Key, Body, **conditions):
+        self.calls.append(('PutObject', conditions))
+        self._check(Key, **conditions)
+        return self._store(Key, Body.encode('utf-8') if isinstance(Body, str) else Body)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        data, etag = self.objects[Key]
+        on_read = self.on_dataset_read if Key == INTERACTION_DATASET_KEY else None
+        return {'Body': FakeBody(data, on_read), 'ETag': etag}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {'ETag': f'"part-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **conditions):
+        self.calls.append(('CompleteMultipartUpload', conditions))
+        parts = self.uploads.pop(UploadId)
+        self._check(Key, **conditions)
+        return self._store(Key, b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts']))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append(('AbortMultipartUpload', {}))
+        del self.uploads[UploadId]
+
+    def get_paginator(self, operation):
+        s3 = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {'Contents': [{'Key': key} for key in sorted(s3.objects) if key.startswith(Prefix)]}
+        return Paginator()
+
+    def delete_objects(self, Bucket, Delete):
+        for entry in Delete['Objects']:
+            self.objects.pop(entry['Key'], None)
+
+
+def row(n):
+    return {'user_id': str(n), 'item_id': str(n), 'FEEDBACK': 'correct', 'timestamp': str(n),
+            'difficulty': 'easy', 'topic': 'java', 'user_profile': 'beginner', 'interaction_score': '1'}
+
+
+def dataset(s3):
+    return s3.objects[INTERACTION_DATASET_KEY][0].decode('utf-8')
+
+
+def parts(s3):
+    return [key for key in s3.objects if key.startswith(INTERACTION_PARTS_PREFIX)]
+
+
+def test_small_object_is_written_with_one_conditional_put():
+    s3 = FakeS3()
+    with MultipartWriter(s3, 'bucket', 'key', part_size=10, if_none_match='*') as writer:
+        writer.write(b'abc')
+    assert s3.calls == [('PutObject', {'IfNoneMatch': '*'})]
+    assert s3.objects['key'][0] == b'abc'
+
+
+def test_large_object_is_uploaded_in_parts_and_completed_conditionally():
+    s3 = FakeS3()
+    etag = s3.put_object(Bucket='bucket', Key='key', Body=b'old')['ETag']
+    with MultipartWriter(s3, 'bucket', 'key', part_size=4, if_match=etag) as writer:
+        for chunk in (b'abcde', b'fghij', b'k'):
+            writer.write(chunk)
+    assert s3.calls[-1] == ('CompleteMultipartUpload', {'IfMatch': etag})
+    assert s3.objects['key'][0] == b'abcdefghijk'
+
+
+def test_failed_block_aborts_the_upload():
+    s3 = FakeS3()
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(s3, 'bucket', 'key', part_size=4) as writer:
+            writer.write(b'abcdefgh')
+            raise RuntimeError("failed mid-write")
+    assert s3.calls == [('AbortMultipartUpload', {})]
+    assert 'key' not in s3.objects and not s3.uploads
+
+
+def test_first_compaction_creates_the_dataset_only_if_absent():
+    s3 = FakeS3()
+    write_interaction_part(s3, [row(1), row(2)], part_name="1.csv")
+    assert compact_interactions(s3) == 1
+    assert s3.calls[-1] == ('PutObject', {'IfNoneMatch': '*'})
+    assert dataset(s3).splitlines() == [",".join(INTERACTION_FIELDS), "1,1,correct,1,easy,java,beginner,1",
+                                        "2,2,correct,2,easy,java,beginner,1"]
+    assert parts(s3) == []
+
+
+def test_compaction_appends_to_the_dataset_it_read():
+    s3 = FakeS3()
+    s3.put_object(Bucket='bucket', Key=INTERACTION_DATASET_KEY, Body=",".join(INTERACTION_FIELDS) + "\n0,0,x,0,easy,java,beginner,0")
+    etag = s3.objects[INTERACTION_DATASET_KEY][1]
+    write_interaction_part(s3, [row(1)], part_name="1.csv")
+    write_interaction_part(s3, [row(2)], part_name="2.csv")
+    assert compact_interactions(s3) == 2
+    assert s3.calls[-1] == ('PutObject', {'IfMatch': etag})
+    assert [line.split(',')[0] for line in dataset(s3).splitlines()[1:]] == ['0', '1', '2']
+
+
+@pytest.fixture
+def compaction(lease_table, monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(compactInteractions, 's3', s3)
+    monkeypatch.setattr(compactInteractions, 'dynamodb', lease_table)
+    return s3
+
+
+def test_handler_returns_409_and_keeps_parts_when_the_dataset_changed(compaction):
+    s3 = compaction
+    s3.put_object(Bucket='bucket', Key=INTERACTION_DATASET_KEY, Body=",".join(INTERACTION_FIELDS) + "\n")
+    write_interaction_part(s3, [row(1)], part_name="1.csv")
+
+    def concurrent_rewrite():
+        s3.on_dataset_read = None
+        s3._store(INTERACTION_DATASET_KEY, b"rewritten by another writer\n")
+    s3.on_dataset_read = concurrent_rewrite
+
+    response = compactInteractions.lambda_handler({}, None)
+    assert response['statusCode'] == 409
+    assert dataset(s3) == "rewritten by another writer\n"
+    assert parts(s3) == [INTERACTION_PARTS_PREFIX + "1.csv"]
+
+
+def test_handler_merges_parts(compaction):
+    write_interaction_part(compaction, [row(1)], part_name="1.csv")
+    response = compactInteractions.lambda_handler({}, None)
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['message'] == "Merged 1 interaction parts in 1 passes"
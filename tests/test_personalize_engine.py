@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+import personalize_engine
+from getRecommendation import build_question_index
+from personalize_engine import StubPersonalizeRuntime, select_personalized_question, set_runtime
+from seen_questions import mark_seen
+
+QUESTIONS = build_question_index(
+    'ITEM_INT_ID,difficulty,tags\n1,easy,java\n2,easy,python\n3,hard,java\n4,easy,"java, loops"\n'
+)
+
+
+@pytest.fixture
+def runtime():
+    stub = StubPersonalizeRuntime({'u1': ['3', '2', '4', '1']})
+    set_runtime(stub)
+    return stub
+
+
+def selected_id(user_id='u1', difficulty='easy', seen=b''):
+    question = select_personalized_question(user_id, difficulty, QUESTIONS, seen)
+    return question and question['ITEM_INT_ID']
+
+
+def test_picks_the_best_ranked_item_at_the_difficulty(runtime):
+    assert selected_id() == '2'
+    assert selected_id(difficulty='hard') == '3'
+
+
+def test_seen_items_are_skipped(runtime):
+    assert selected_id(seen=mark_seen(b'', '2')) == '4'
+
+
+def test_ranked_list_is_cached_and_served_items_dropped(runtime):
+    assert [selected_id() for _ in range(4)] == ['2', '4', '1', None]
+    assert runtime.calls == 1
+
+
+def test_expired_list_is_fetched_again(runtime, monkeypatch):
+    monkeypatch.setattr(personalize_engine, 'RESULT_CACHE_TTL_SECONDS', 0)
+    selected_id()
+    selected_id()
+    assert runtime.calls == 2
+
+
+def test_empty_result_is_not_cached(runtime):
+    assert selected_id(user_id='new') is None
+    assert selected_id(user_id='new') is None
+    assert runtime.calls == 2
+
+
+def test_error_falls_back(runtime):
+    runtime.error = RuntimeError("campaign unavailable")
+    assert selected_id() is None
+
+
+def test_slow_campaign_falls_back_within_the_timeout():
+    set_runtime(StubPersonalizeRuntime({'u1': ['2']}, delay=personalize_engine.PERSONALIZE_TIMEOUT_SECONDS * 3))
+    started_at = time.perf_counter()
+    assert selected_id() is None
+    assert time.perf_counter() - started_at < personalize_engine.PERSONALIZE_TIMEOUT_SECONDS * 2
+
+
+def test_cache_keeps_at_most_max_users(runtime, monkeypatch):
+    monkeypatch.setattr(personalize_engine, 'RESULT_CACHE_MAX_USERS', 2)
+    runtime.recommendations = {user_id: ['1', '2', '4'] for user_id in ('a', 'b', 'c')}
+    selected_id('a')
+    selected_id('b')
+    selected_id('a')  # a is now the most recently used
+    selected_id('c')
+    assert list(personalize_engine._result_cache) == ['a', 'c']
+
+
+def test_expired_and_emptied_lists_are_dropped(runtime, monkeypatch):
+    runtime.recommendations['u2'] = ['1']
+    assert selected_id('u2') == '1'
+    assert 'u2' not in personalize_engine._result_cache  # list used up
+    selected_id('u3')  # nothing recommended
+    assert 'u3' not in personalize_engine._result_cache
+    monkeypatch.setattr(personalize_engine, 'RESULT_CACHE_TTL_SECONDS', 0)
+    selected_id('u1')
+    selected_id('u1')
+    assert runtime.calls == 4
+    assert list(personalize_engine._result_cache) == ['u1']  # the expired list was replaced
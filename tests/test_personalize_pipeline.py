@@ -0,0 +1,81 @@
+import pytest
+
+import personalize_pipeline
+from personalize_pipeline import PipelineError, StubPersonalizeClient, run_pipeline
+
+
+def run(client, tmp_path, stage_names=None):
+    return run_pipeline(client, stage_names, checkpoint_path=str(tmp_path / "checkpoint.json"), sleep=lambda s: None)
+
+
+def created(client, kind):
+    return [resource for resource in client.resources.values() if resource['kind'] == kind]
+
+
+def test_full_run_reaches_active(tmp_path):
+    client = StubPersonalizeClient()
+    arns = run(client, tmp_path)
+    assert set(arns) == set(personalize_pipeline.STAGES)
+    assert all(resource['status'] == 'ACTIVE' for resource in client.resources.values())
+
+
+def test_failed_resource_stays_failed():
+    client = StubPersonalizeClient(polls_until_active=1, fail={'solution_version'})
+    arn = client.create_solution_version(solutionArn='arn')['solutionVersionArn']
+    client.fail.clear()
+    for _ in range(3):
+        assert client.describe_solution_version(arn)['solutionVersion']['status'] == 'CREATE FAILED'
+
+
+@pytest.mark.parametrize("failing_stage, kind", [
+    ("import_items", "dataset_import_job"),
+    ("solution", "solution"),
+    ("solution_version", "solution_version"),
+])
+def test_resume_after_failure_resubmits_under_a_new_name(tmp_path, failing_stage, kind):
+    client = StubPersonalizeClient(fail={failing_stage})
+    with pytest.raises(PipelineError):
+        run(client, tmp_path)
+
+    client.fail.clear()
+    arns = run(client, tmp_path)
+
+    attempts = created(client, kind)
+    failed = [resource for resource in attempts if resource['status'] == 'CREATE FAILED']
+    assert len(failed) == 1
+    retried = client.resources[arns[failing_stage]]
+    assert retried['status'] == 'ACTIVE'
+    if retried['name'] is not None:
+        assert retried['name'] != failed[0]['name']
+        assert retried['name'].endswith('-retry1')
+
+
+def test_resume_reuses_work_already_done(tmp_path):
+    client = StubPersonalizeClient(fail={'solution_version'})
+    with pytest.raises(PipelineError):
+        run(client, tmp_path)
+    client.fail.clear()
+    run(client, tmp_path)
+    assert client.calls.count('create_dataset_import_job') == 3
+    assert client.calls.count('create_solution') == 1
+
+
+def test_failed_solution_from_an_earlier_run_is_not_reused(tmp_path):
+    client = StubPersonalizeClient(fail={'solution'})
+    with pytest.raises(PipelineError):
+        run(client, tmp_path, personalize_pipeline.TRAINING_STAGES)
+    (tmp_path / "checkpoint.json").unlink()  # A fresh run, starting again from attempt 0
+
+    client.fail.clear()
+    arns = run(client, tmp_path, personalize_pipeline.TRAINING_STAGES)
+    assert client.resources[arns['solution']]['status'] == 'ACTIVE'
+
+
+def test_retraining_updates_the_existing_campaign(tmp_path):
+    client = StubPersonalizeClient()
+    first = run(client, tmp_path, personalize_pipeline.TRAINING_STAGES)
+    second = run(client, tmp_path, personalize_pipeline.TRAINING_STAGES)
+    assert second['solution'] == first['solution']
+    assert second['campaign'] == first['campaign']
+    assert second['solution_version'] != first['solution_version']
+    assert client.calls.count('update_campaign') == 1
@@ -0,0 +1,30 @@
+from seen_questions import MAX_SEEN_ID, as_bytes, is_seen, mark_seen
+
+
+def test_marked_ids_are_seen():
+    bitmap = mark_seen(mark_seen(b'', '3'), 17)
+    assert is_seen(bitmap, '3') and is_seen(bitmap, '17')
+    assert not is_seen(bitmap, '4') and not is_seen(bitmap, '1000')
+    assert len(bitmap) == 3
+
+
+def test_non_integer_and_negative_ids_are_ignored():
+    assert mark_seen(b'', 'abc') == b''
+    assert mark_seen(b'', '-1') == b''
+    assert not is_seen(b'\xff', 'abc')
+
+
+def test_bitmap_is_capped_at_max_seen_id():
+    bitmap = mark_seen(b'', MAX_SEEN_ID)
+    assert is_seen(bitmap, MAX_SEEN_ID)
+    assert len(bitmap) == MAX_SEEN_ID // 8 + 1
+    assert mark_seen(bitmap, MAX_SEEN_ID + 1) == bitmap
+    assert not is_seen(bitmap, MAX_SEEN_ID + 1)
+    assert mark_seen(b'', 3_500_000) == b''
+
+
+def test_as_bytes_accepts_stored_values():
+    class Binary:
+        value = b'\x01'
+    assert as_bytes(None) == b''
+    assert as_bytes(Binary()) == b'\x01'
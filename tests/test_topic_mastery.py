@@ -0,0 +1,114 @@
+import pytest
+
+from getRecommendation import build_question_index, select_question
+from seen_questions import mark_seen
+from topic_mastery import (
+    INITIAL_RATINGS, answer_updates, expected_score, nearest_rated, sort_by_rating, target_difficulty,
+    target_rating, update_ratings
+)
+
+# position -> rating
+RATINGS = {0: 1300, 1: 1500, 2: 1500, 3: 1700, 4: 1300, 5: 1900}
+RATED = sort_by_rating(list(RATINGS), RATINGS)
+
+
+def accept_all(position):
+    return True
+
+
+def test_sort_by_rating_orders_positions():
+    ratings, positions = RATED
+    assert ratings == sorted(RATINGS.values())
+    assert [RATINGS[position] for position in positions] == ratings
+
+
+@pytest.mark.parametrize("target, distance, positions", [
+    (1490, 10, {1, 2}),      # nearest run returned whole
+    (1280, 20, {0, 4}),
+    (1000, 300, {0, 4}),     # below every rating
+    (2500, 600, {5}),        # above every rating
+    (1700, 0, {3}),          # exact match
+])
+def test_nearest_rated_returns_the_nearest_run(target, distance, positions):
+    found_distance, found = nearest_rated(RATED, target, accept_all)
+    assert (found_distance, set(found)) == (distance, positions)
+
+
+def test_nearest_rated_prefers_the_lower_run_on_a_tie():
+    distance, found = nearest_rated(RATED, 1600, accept_all)
+    assert (distance, set(found)) == (100, {1, 2})
+
+
+def test_nearest_rated_walks_outward_past_rejected_runs():
+    # 1500 run rejected on one side; 1300 and 1700 are equally far on both sides
+    distance, found = nearest_rated(RATED, 1500, lambda position: position not in (1, 2))
+    assert (distance, set(found)) == (200, {0, 4})
+    distance, found = nearest_rated(RATED, 1500, lambda position: position in (3, 5))
+    assert (distance, set(found)) == (200, {3})
+
+
+def test_nearest_rated_finds_nothing_when_everything_is_rejected():
+    assert nearest_rated(RATED, 1500, lambda position: False) == (None, [])
+
+
+def test_elo_update_moves_each_tag_in_the_direction_of_the_answer():
+    ratings = {'java': 1500}
+    correct = update_ratings(ratings, ['java', 'loops'], 1500, 'correct', user_level=1)
+    incorrect = update_ratings(ratings, ['java', 'loops'], 1500, 'incorrect', user_level=1)
+    assert correct['java'] == 1516 and incorrect['java'] == 1484
+    assert correct['loops'] > INITIAL_RATINGS[1] > incorrect['loops']
+    assert ratings == {'java': 1500}
+
+
+def test_harder_questions_move_ratings_further_on_a_correct_answer():
+    easy = update_ratings({}, ['java'], 1300, 'correct', user_level=2)['java']
+    hard = update_ratings({}, ['java'], 1700, 'correct', user_level=2)['java']
+    assert INITIAL_RATINGS[2] < easy < hard
+
+
+def test_answer_updates_rates_the_served_question_tags():
+    state = {'current_tags': 'Java, loops', 'current_difficulty': 'hard', 'topic_ratings': {'java': 1500}}
+    assert set(answer_updates(state, 'correct', 1)['topic_ratings']) == {'java', 'loops'}
+    assert answer_updates({}, 'correct', 1) == {}
+
+
+def test_target_rating_hits_the_target_success_rate():
+    assert expected_score(1500, target_rating(1500, 0.6)) == pytest.approx(0.6)
+
+
+@pytest.mark.parametrize("ratings, user_level, difficulty", [
+    ({}, 1, 'easy'),
+    ({}, 3, 'hard'),
+    ({'java': 1900}, 1, 'medium'),       # sql still starts from level 1
+    ({'java': 1900, 'sql': 1900}, 1, 'hard'),
+    ({'java': 1900, 'sql': 1100}, 1, 'medium'),
+])
+def test_target_difficulty_follows_preferred_topic_ratings(ratings, user_level, difficulty):
+    assert target_difficulty(ratings, ['java', 'sql'], user_level) == difficulty
+
+
+QUESTIONS = build_question_index(
+    'ITEM_INT_ID,difficulty,tags\n1,easy,java\n2,medium,java\n3,medium,java\n4,hard,java\n5,hard,python\n'
+)
+
+
+def selected_ids(ratings, seen=b'', runs=30):
+    return {select_question(['java'], ratings, 1, QUESTIONS, seen)['ITEM_INT_ID'] for _ in range(runs)}
+
+
+def test_select_question_targets_the_user_rating():
+    assert selected_ids({}) == {'1'}
+    assert selected_ids({'java': 1580}) == {'2', '3'}  # ties at the nearest rating are shuffled
+    assert selected_ids({'java': 1900}) == {'4'}
+
+
+def test_select_question_skips_seen_then_repeats():
+    seen = mark_seen(b'', '1')
+    assert selected_ids({}, seen) == {'2', '3'}
+    for item_id in ('2', '3', '4'):
+        seen = mark_seen(seen, item_id)
+    assert selected_ids({}, seen) == {'1'}
+
+
+def test_select_question_without_matching_topics():
+    assert select_question(['rust'], {}, 1, QUESTIONS) is None
@@ -0,0 +1,49 @@
+import io
+
+from user_profile_store import InMemoryUserProfileStore, export_profiles_csv, import_profiles_csv
+
+PROFILES = [
+    {'user_id': '1', 'preferences': ['java', 'loops'], 'user_level': 1},
+    {'user_id': '2', 'preferences': ['python'], 'user_level': 3},
+]
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Bucket, Key] = Body
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[Bucket, Key].encode('utf-8'))}
+
+
+def test_get_profile_returns_a_copy():
+    store = InMemoryUserProfileStore(PROFILES)
+    profile = store.get_profile(1)
+    profile['preferences'].append('sql')
+    profile['user_level'] = 2
+    assert store.get_profile('1') == PROFILES[0]
+
+
+def test_missing_users_are_left_out():
+    store = InMemoryUserProfileStore(PROFILES)
+    assert store.get_profile('3') is None
+    assert store.get_profiles(['2', '3', 1]) == {'1': PROFILES[0], '2': PROFILES[1]}
+
+
+def test_update_level_keeps_preferences_and_creates_unknown_users():
+    store = InMemoryUserProfileStore(PROFILES)
+    store.update_level('1', 2)
+    store.update_level('9', 3)
+    assert store.get_profile('1') == dict(PROFILES[0], user_level=2)
+    assert store.get_profile('9') == {'user_id': '9', 'preferences': [], 'user_level': 3}
+
+
+def test_csv_export_and_import_round_trip():
+    s3 = FakeS3()
+    assert export_profiles_csv(InMemoryUserProfileStore(PROFILES), s3, bucket='b', key='users.csv') == 2
+    restored = InMemoryUserProfileStore()
+    assert import_profiles_csv(restored, s3, bucket='b', key='users.csv') == 2
+    assert list(restored.iter_profiles()) == PROFILES
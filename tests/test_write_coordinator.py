@@ -0,0 +1,89 @@
+import pytest
+
+from write_coordinator import (
+    LEASE_SECONDS, acquire_lease, complete_pass, completed_requests, release_lease, request_rewrite,
+    run_coalesced, run_coalesced_and_wait
+)
+
+DATASET = "dataset.csv"
+
+
+def test_lease_is_exclusive_until_released(lease_table):
+    request_rewrite(lease_table, DATASET)
+    assert acquire_lease(lease_table, DATASET, 'a') == 1
+    assert acquire_lease(lease_table, DATASET, 'b') is None
+    assert release_lease(lease_table, DATASET, 'b') is False
+    assert release_lease(lease_table, DATASET, 'a', covered=1) is True
+    assert completed_requests(lease_table, DATASET) == 1
+    assert acquire_lease(lease_table, DATASET, 'b') == 1
+
+
+def test_expired_lease_can_be_taken_over(lease_table):
+    assert acquire_lease(lease_table, DATASET, 'crashed', now=1000) == 0
+    assert acquire_lease(lease_table, DATASET, 'b', now=1000 + LEASE_SECONDS - 1) is None
+    assert acquire_lease(lease_table, DATASET, 'b', now=1000 + LEASE_SECONDS + 1) == 0
+
+
+def test_release_with_covered_fails_while_a_request_is_pending(lease_table):
+    request_rewrite(lease_table, DATASET)
+    covered = acquire_lease(lease_table, DATASET, 'a')
+    request_rewrite(lease_table, DATASET)
+    assert release_lease(lease_table, DATASET, 'a', covered=covered) is False
+    assert complete_pass(lease_table, DATASET, 'a', covered) == 2
+    assert completed_requests(lease_table, DATASET) == 1
+    assert release_lease(lease_table, DATASET, 'a', covered=2) is True
+
+
+def test_single_caller_rewrites_once(lease_table):
+    assert run_coalesced(lease_table, DATASET, lambda: 'pass') == ['pass']
+    assert completed_requests(lease_table, DATASET) == 1
+
+
+def test_second_caller_hands_off_and_causes_exactly_one_extra_pass(lease_table):
+    handed_off = []
+
+    def rewrite():
+        if not handed_off:
+            # A second caller arrives while the first pass is running
+            handed_off.append(run_coalesced(lease_table, DATASET, lambda: pytest.fail("second caller rewrote")))
+        return len(handed_off)
+
+    assert run_coalesced(lease_table, DATASET, rewrite) == [1, 1]
+    assert handed_off == [None]
+    assert completed_requests(lease_table, DATASET) == 2
+
+
+def test_gives_up_after_max_passes_and_frees_the_lease(lease_table):
+    def rewrite():
+        request_rewrite(lease_table, DATASET)  # Requests keep arriving
+        return 'pass'
+
+    assert run_coalesced(lease_table, DATASET, rewrite, max_passes=2) == ['pass', 'pass']
+    assert completed_requests(lease_table, DATASET) == 2
+    assert acquire_lease(lease_table, DATASET, 'next') == 3
+
+
+def test_wait_returns_once_the_holder_covers_the_request(lease_table):
+    request_rewrite(lease_table, DATASET)
+    acquire_lease(lease_table, DATASET, 'holder')
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            complete_pass(lease_table, DATASET, 'holder', 2)
+            release_lease(lease_table, DATASET, 'holder', covered=2)
+
+    assert run_coalesced_and_wait(lease_table, DATASET, lambda: pytest.fail("rewrote"), sleep=sleep) == []
+    assert len(sleeps) == 2
+
+
+def test_wait_times_out_while_the_holder_is_stuck(lease_table):
+    request_rewrite(lease_table, DATASET)
+    acquire_lease(lease_table, DATASET, 'holder')
+    with pytest.raises(TimeoutError, match="request 2"):
+        run_coalesced_and_wait(lease_table, DATASET, lambda: 'pass', timeout=0, sleep=lambda s: None)
+
+
+def test_wait_runs_the_rewrite_itself_when_the_lease_is_free(lease_table):
+    assert run_coalesced_and_wait(lease_table, DATASET, lambda: 'pass') == ['pass']
@@ -0,0 +1,110 @@
+import math
+from bisect import bisect_left, bisect_right
+
+# Per-topic mastery as Elo ratings, kept in the user's UserQuestionState item as
+# a map of topic -> rating ("topic_ratings"). Every answer moves the ratings of
+# the served question's topics by at most K_FACTOR, so an update costs O(topics
+# on the question) and never needs the user's history.
+MASTERY_ATTRIBUTE = "topic_ratings"
+
+# Tags of the question being answered, written when it is served
+SERVED_TAGS_ATTRIBUTE = "current_tags"
+
+# Question ratings by difficulty, and the starting rating of an unrated topic by user level
+DIFFICULTY_RATINGS = {"easy": 1300, "medium": 1500, "hard": 1700}
+INITIAL_RATINGS = {1: 1300, 2: 1500, 3: 1700}
+DEFAULT_RATING = 1500
+
+K_FACTOR = 32
+
+# Questions are targeted at this chance of a correct answer: hard enough to
+# teach something, easy enough to keep the user going.
+TARGET_SUCCESS = 0.6
+
+ANSWER_SCORES = {"correct": 1.0, "incorrect": 0.0, "skipped": 0.0}
+
+
+def split_tags(tags):
+    """Split a comma-separated tag string into normalized individual tags."""
+    return [tag.strip().lower() for tag in tags.split(',') if tag.strip()]
+
+
+def question_rating(difficulty):
+    return DIFFICULTY_RATINGS.get((difficulty or '').lower(), DEFAULT_RATING)
+
+
+def topic_rating(ratings, topic, user_level):
+    """The user's rating for a topic, starting from their level for topics not yet rated."""
+    if topic in ratings:
+        return int(ratings[topic])
+    return INITIAL_RATINGS.get(int(user_level), DEFAULT_RATING)
+
+
+def expected_score(user_rating, rating):
+    """Elo probability that a user at ``user_rating`` answers a question at ``rating`` correctly."""
+    return 1 / (1 + 10 ** ((rating - user_rating) / 400))
+
+
+def target_rating(user_rating, success=TARGET_SUCCESS):
+    """Question rating the user is expected to answer correctly with probability ``success``."""
+    return user_rating + 400 * math.log10(1 / success - 1)
+
+
+def update_ratings(ratings, topics, rating, feedback, user_level, k=K_FACTOR):
+    """Return a copy of ``ratings`` after one answer to a question at ``rating`` on ``topics``."""
+    updated = {topic: int(value) for topic, value in ratings.items()}
+    score = ANSWER_SCORES.get(feedback.lower(), 0.0)
+    for topic in topics:
+        current = topic_rating(updated, topic, user_level)
+        updated[topic] = round(current + k * (score - expected_score(current, rating)))
+    return updated
+
+
+def answer_updates(user_state, feedback, user_level):
+    """State attributes to set after the user answers the question they were served ({} if untracked)."""
+    tags = user_state.get(SERVED_TAGS_ATTRIBUTE)
+    if not tags:
+        return {}
+    return {MASTERY_ATTRIBUTE: update_ratings(
+        user_state.get(MASTERY_ATTRIBUTE) or {}, split_tags(tags),
+        question_rating(user_state.get('current_difficulty')), feedback, user_level
+    )}
+
+
+def target_difficulty(ratings, preferences, user_level):
+    """Difficulty whose rating is nearest the target for the user's average preferred-topic rating."""
+    topics = [pref.strip().lower() for pref in preferences] or [None]
+    average = sum(topic_rating(ratings, topic, user_level) for topic in topics) / len(topics)
+    target = target_rating(average)
+    return min(DIFFICULTY_RATINGS, key=lambda difficulty: abs(DIFFICULTY_RATINGS[difficulty] - target))
+
+
+def sort_by_rating(positions, ratings_by_position):
+    """(ratings, positions) of a question set, sorted by rating, for nearest_rated."""
+    ordered = sorted(positions, key=ratings_by_position.__getitem__)
+    return [ratings_by_position[position] for position in ordered], ordered
+
+
+def nearest_rated(rated, target, accept):
+    """Accepted positions sharing the rating nearest ``target``, and their distance from it.
+
+    ``rated`` is a (ratings, positions) pair from sort_by_rating. The search
+    bisects to ``target`` and walks outward one run of equal ratings at a time,
+    so it costs O(log n) plus the runs it has to look through.
+    """
+    ratings, positions = rated
+    right = bisect_left(ratings, target)
+    left = right - 1
+    while left >= 0 or right < len(ratings):
+        if right >= len(ratings) or (left >= 0 and target - ratings[left] <= ratings[right] - target):
+            rating = ratings[left]
+            start = bisect_left(ratings, rating, 0, left + 1)
+            run, left = range(start, left + 1), start - 1
+        else:
+            rating = ratings[right]
+            end = bisect_right(ratings, rating, right)
+            run, right = range(right, end), end
+        accepted = [positions[index] for index in run if accept(positions[index])]
+        if accepted:
+            return abs(rating - target), accepted
+    return None, []
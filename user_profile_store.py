@@ -0,0 +1,145 @@
+import boto3
+import csv
+from io import StringIO
+
+from dynamo_batch import batch_get
+
+# DynamoDB table keyed by user_id holding each user's preferences and level.
+USER_PROFILE_TABLE = "UserProfiles"
+
+# Users dataset in S3, regenerated from the table for Personalize imports.
+USERS_DATASET_BUCKET = "realtimerecommendation"
+USERS_DATASET_KEY = "updated_usersmnew.csv"
+USERS_DATASET_FIELDS = ["user_id", "preferences", "user_level"]
+
+# BatchGetItem accepts at most 100 keys per call.
+BATCH_GET_SIZE = 100
+
+
+def profile_from_item(item):
+    """Convert a low-level DynamoDB item into a profile dict."""
+    return {
+        'user_id': item['user_id']['S'],
+        'preferences': [pref['S'] for pref in item.get('preferences', {}).get('L', [])],
+        'user_level': int(item.get('user_level', {}).get('N', 1)),
+    }
+
+
+class DynamoUserProfileStore:
+    """User profiles stored one item per user in DynamoDB."""
+
+    def __init__(self, client, table_name=USER_PROFILE_TABLE):
+        self.client = client
+        self.table_name = table_name
+
+    def get_profile(self, user_id):
+        response = self.client.get_item(TableName=self.table_name, Key={'user_id': {'S': str(user_id)}})
+        item = response.get('Item')
+        return profile_from_item(item) if item else None
+
+    def get_profiles(self, user_ids):
+        """Fetch many profiles with BatchGetItem; returns {user_id: profile} for users found."""
+        profiles = {}
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        for start in range(0, len(user_ids), BATCH_GET_SIZE):
+            keys = [{'user_id': {'S': user_id}} for user_id in user_ids[start:start + BATCH_GET_SIZE]]
+            for item in batch_get(self.client, {self.table_name: {'Keys': keys}}).get(self.table_name, []):
+                profile = profile_from_item(item)
+                profiles[profile['user_id']] = profile
+        return profiles
+
+    def put_profile(self, user_id, preferences, user_level):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                'user_id': {'S': str(user_id)},
+                'preferences': {'L': [{'S': pref} for pref in preferences]},
+                'user_level': {'N': str(int(user_level))}
+            }
+        )
+
+    def level_update(self, user_id, user_level):
+        """update_item arguments that set a user's level, also usable inside a transaction."""
+        return {
+            'TableName': self.table_name,
+            'Key': {'user_id': {'S': str(user_id)}},
+            'UpdateExpression': "SET user_level = :level",
+            'ExpressionAttributeValues': {':level': {'N': str(int(user_level))}}
+        }
+
+    def update_level(self, user_id, user_level):
+        self.client.update_item(**self.level_update(user_id, user_level))
+
+    def iter_profiles(self):
+        """Yield every profile, following scan pagination."""
+        request = {'TableName': self.table_name}
+        while True:
+            response = self.client.scan(**request)
+            for item in response.get('Items', []):
+                yield profile_from_item(item)
+            if 'LastEvaluatedKey' not in response:
+                return
+            request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class InMemoryUserProfileStore:
+    """Process-local stand-in for DynamoUserProfileStore, for tests and local runs."""
+
+    def __init__(self, profiles=None):
+        self.profiles = {}
+        for profile in profiles or []:
+            self.put_profile(profile['user_id'], profile['preferences'], profile['user_level'])
+
+    def get_profile(self, user_id):
+        profile = self.profiles.get(str(user_id))
+        return dict(profile, preferences=list(profile['preferences'])) if profile else None
+
+    def get_profiles(self, user_ids):
+        return {str(user_id): self.get_profile(user_id) for user_id in user_ids if str(user_id) in self.profiles}
+
+    def put_profile(self, user_id, preferences, user_level):
+        self.profiles[str(user_id)] = {
+            'user_id': str(user_id),
+            'preferences': list(preferences),
+            'user_level': int(user_level),
+        }
+
+    def update_level(self, user_id, user_level):
+        profile = self.profiles.setdefault(
+            str(user_id), {'user_id': str(user_id), 'preferences': [], 'user_level': 1}
+        )
+        profile['user_level'] = int(user_level)
+
+    def iter_profiles(self):
+        for user_id in list(self.profiles):
+            yield self.get_profile(user_id)
+
+
+def export_profiles_csv(store, s3, bucket=USERS_DATASET_BUCKET, key=USERS_DATASET_KEY):
+    """Write every profile to the users CSV that dataset_import.py hands to Personalize."""
+    output = StringIO()
+    csv_writer = csv.DictWriter(output, fieldnames=USERS_DATASET_FIELDS)
+    csv_writer.writeheader()
+    count = 0
+    for profile in store.iter_profiles():
+        csv_writer.writerow(dict(profile, preferences=", ".join(profile['preferences'])))
+        count += 1
+    s3.put_object(Bucket=bucket, Key=key, Body=output.getvalue())
+    return count
+
+
+def import_profiles_csv(store, s3, bucket=USERS_DATASET_BUCKET, key=USERS_DATASET_KEY):
+    """Seed the store from the existing users CSV in S3."""
+    response = s3.get_object(Bucket=bucket, Key=key)
+    content = response['Body'].read().decode('utf-8')
+    count = 0
+    for row in csv.DictReader(StringIO(content)):
+        store.put_profile(row['user_id'], row['preferences'].split(', '), int(row['user_level']))
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # One-off migration of the S3 users dataset into the profile table.
+    store = DynamoUserProfileStore(boto3.client('dynamodb'))
+    print("Profiles imported:", import_profiles_csv(store, boto3.client('s3')))
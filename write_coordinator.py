@@ -0,0 +1,170 @@
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+# One item per shared S3 dataset, keyed by the dataset's S3 key:
+#   requested        - count of rewrite requests ever made (atomic ADD)
+#   completed        - value of requested covered by the last finished rewrite
+#   lease_owner      - invocation currently allowed to rewrite the dataset
+#   lease_expires_at - epoch seconds after which a crashed owner's lease can be taken over
+DATASET_LEASE_TABLE = "DatasetWriteLeases"
+
+# Longer than the 15 minute Lambda limit, so a live owner never loses its lease.
+LEASE_SECONDS = 16 * 60
+
+# Rewrites one lease holder runs for requests that arrive while it is working;
+# anything left over is picked up by the next request.
+MAX_REWRITE_PASSES = 3
+
+# How long run_coalesced_and_wait waits for another invocation's rewrite, and how
+# often it checks. Past the wait the lease holder has likely given up or crashed.
+REWRITE_WAIT_SECONDS = 10 * 60
+REWRITE_POLL_SECONDS = 5
+
+
+def _is_condition_failure(error):
+    return error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def request_rewrite(client, dataset):
+    """Record that ``dataset`` needs rewriting; returns the new request count."""
+    response = client.update_item(
+        TableName=DATASET_LEASE_TABLE,
+        Key={'dataset': {'S': dataset}},
+        UpdateExpression="ADD requested :one",
+        ExpressionAttributeValues={':one': {'N': '1'}},
+        ReturnValues="UPDATED_NEW"
+    )
+    return int(response['Attributes']['requested']['N'])
+
+
+def acquire_lease(client, dataset, owner, now=None):
+    """Take the dataset's lease if it is free or expired.
+
+    Returns the request count at the time of acquisition, or None if another
+    invocation holds the lease.
+    """
+    now = int(now if now is not None else time.time())
+    try:
+        response = client.update_item(
+            TableName=DATASET_LEASE_TABLE,
+            Key={'dataset': {'S': dataset}},
+            UpdateExpression="SET lease_owner = :owner, lease_expires_at = :expires",
+            ConditionExpression="attribute_not_exists(lease_owner) OR lease_expires_at < :now",
+            ExpressionAttributeValues={
+                ':owner': {'S': owner},
+                ':expires': {'N': str(now + LEASE_SECONDS)},
+                ':now': {'N': str(now)}
+            },
+            ReturnValues="ALL_NEW"
+        )
+    except ClientError as e:
+        if not _is_condition_failure(e):
+            raise
+        return None
+    return int(response['Attributes'].get('requested', {}).get('N', 0))
+
+
+def complete_pass(client, dataset, owner, covered):
+    """Mark requests up to ``covered`` as done; returns the request count the next pass covers."""
+    response = client.update_item(
+        TableName=DATASET_LEASE_TABLE,
+        Key={'dataset': {'S': dataset}},
+        UpdateExpression="SET completed = :covered",
+        ConditionExpression="lease_owner = :owner",
+        ExpressionAttributeValues={':covered': {'N': str(covered)}, ':owner': {'S': owner}},
+        ReturnValues="ALL_NEW"
+    )
+    return int(response['Attributes'].get('requested', {}).get('N', 0))
+
+
+def release_lease(client, dataset, owner, covered=None):
+    """Give up the lease, marking requests up to ``covered`` as completed.
+
+    With ``covered`` the release only succeeds if no request arrived after it,
+    so a request that lost the race for the lease is never left unserved.
+    Returns False when such a request is pending.
+    """
+    request = {
+        'TableName': DATASET_LEASE_TABLE,
+        'Key': {'dataset': {'S': dataset}},
+        'UpdateExpression': "REMOVE lease_owner, lease_expires_at",
+        'ConditionExpression': "lease_owner = :owner",
+        'ExpressionAttributeValues': {':owner': {'S': owner}}
+    }
+    if covered is not None:
+        request['UpdateExpression'] = "SET completed = :covered " + request['UpdateExpression']
+        request['ConditionExpression'] += " AND requested = :covered"
+        request['ExpressionAttributeValues'][':covered'] = {'N': str(covered)}
+    try:
+        client.update_item(**request)
+    except ClientError as e:
+        if not _is_condition_failure(e):
+            raise
+        return False
+    return True
+
+
+def completed_requests(client, dataset):
+    """Request count covered by the dataset's last finished rewrite (0 if none)."""
+    response = client.get_item(
+        TableName=DATASET_LEASE_TABLE, Key={'dataset': {'S': dataset}}, ConsistentRead=True
+    )
+    return int(response.get('Item', {}).get('completed', {}).get('N', 0))
+
+
+def _run_coalesced(client, dataset, rewrite, max_passes):
+    """run_coalesced, also returning this invocation's request count."""
+    requested = request_rewrite(client, dataset)
+    owner = uuid.uuid4().hex
+    covered = acquire_lease(client, dataset, owner)
+    if covered is None:
+        return requested, None
+
+    results = []
+    try:
+        for _ in range(max_passes):
+            results.append(rewrite())
+            if release_lease(client, dataset, owner, covered=covered):
+                return requested, results
+            covered = complete_pass(client, dataset, owner, covered)
+    except Exception:
+        release_lease(client, dataset, owner)
+        raise
+    # Still busy after max_passes: leave the backlog to the next request
+    release_lease(client, dataset, owner)
+    return requested, results
+
+
+def run_coalesced(client, dataset, rewrite, max_passes=MAX_REWRITE_PASSES):
+    """Request a rewrite of ``dataset`` and perform it unless another invocation already is.
+
+    Concurrent callers all record their request, but only the lease holder
+    calls ``rewrite()``. Requests that arrive while it runs are folded into a
+    single further pass, so N concurrent callers cause at most two rewrites.
+    Callers must request only after their own input is in place (e.g. parts
+    written), since a pass serves the requests counted before it started.
+    Returns the results of the passes this invocation ran, or None if its
+    request was handed to the current lease holder.
+    """
+    return _run_coalesced(client, dataset, rewrite, max_passes)[1]
+
+
+def run_coalesced_and_wait(client, dataset, rewrite, max_passes=MAX_REWRITE_PASSES,
+                           timeout=REWRITE_WAIT_SECONDS, poll_seconds=REWRITE_POLL_SECONDS, sleep=time.sleep):
+    """run_coalesced for callers that read the dataset next and need their request served first.
+
+    When the request is handed to the current lease holder, polls until a
+    finished rewrite covers it. Returns the results of the passes this
+    invocation ran ([] if another invocation's rewrite served it); raises
+    TimeoutError if that does not happen within ``timeout`` seconds, or if this
+    invocation gave up with requests still pending.
+    """
+    requested, results = _run_coalesced(client, dataset, rewrite, max_passes)
+    deadline = time.time() + timeout
+    while completed_requests(client, dataset) < requested:
+        if results is not None or time.time() >= deadline:
+            raise TimeoutError(f"Rewrite of {dataset} has not caught up with request {requested}")
+        sleep(poll_seconds)
+    return results or []